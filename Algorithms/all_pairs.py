@@ -0,0 +1,273 @@
+import argparse
+import heapq
+import math
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from numpy.lib.format import open_memmap
+from analyze_graph import load_graph
+from instrumentation import phase
+
+# Shortest paths from many sources at once over load_graph's CSR, so
+# "distances from every depot" is one call instead of one GUI-to-video run
+# per source. Results are a distance matrix (inf when unreachable) and a
+# predecessor matrix (-1 for the source itself and unreachable vertices),
+# one row per source, produced in row chunks that can be streamed to .npy
+# files. As in the single-source scripts, arcs of weight 0 are not arcs.
+#
+#   python all_pairs.py graph.json --sources 0 4 7 --out depots
+#
+# Dense graphs use Floyd-Warshall on the whole matrix; sparse ones run one
+# heap Dijkstra per source across a process pool, reweighted by Johnson's
+# potentials when some arc is negative.
+
+# Floyd-Warshall is used when at least this fraction of all vertex pairs are arcs
+DENSE_FRACTION = 0.1
+# ... and the graph is no larger than this (it holds two n x n matrices)
+FLOYD_MAX_VERTICES = 4096
+# Source rows per chunk of output (and per task sent to a worker)
+ROW_CHUNK = 256
+# Matrix entries updated at once in a Floyd-Warshall step
+FLOYD_BLOCK = 2 ** 20
+
+_worker_arcs = None
+
+
+def nonzero_arcs(graph):
+    """Tails, heads and weights of the nonzero-weight arcs of the CSR, in row order."""
+    csr = graph["csr"]
+    n = len(graph["vertices"])
+    keep = csr["weights"] != 0
+    tails = np.repeat(np.arange(n), np.diff(csr["offsets"]))[keep]
+    return tails, csr["targets"][keep].astype(np.int64), csr["weights"][keep].astype(float)
+
+
+def johnson_potentials(n, tails, heads, weights):
+    """Potentials h with w(u, v) + h[u] - h[v] >= 0 on every arc.
+
+    h is the distance from a virtual source joined to every vertex by a
+    zero-weight arc, found with NumPy Bellman-Ford passes as in
+    label_correcting_vectorized.
+
+    Raises:
+        ValueError: if the graph has a negative-weight cycle
+    """
+    h = np.zeros(n)
+    for _ in range(n):
+        best = h.copy()
+        np.minimum.at(best, heads, h[tails] + weights)
+        if np.array_equal(best, h):
+            return h
+        h = best
+    raise ValueError("the graph has a negative-weight cycle")
+
+
+def floyd_warshall(n, tails, heads, weights, block=FLOYD_BLOCK):
+    """All-pairs distances and predecessors by Floyd-Warshall over NumPy arrays.
+
+    Step k relaxes every pair through vertex k in place, a block of rows at
+    a time so the temporaries stay at about block entries; blocks with no
+    row reaching k are skipped. Negative arcs are fine.
+
+    Raises:
+        ValueError: if the graph has a negative-weight cycle
+    """
+    dist = np.full((n, n), np.inf)
+    np.minimum.at(dist, (tails, heads), weights)
+    diagonal = np.arange(n)
+    dist[diagonal, diagonal] = np.minimum(dist[diagonal, diagonal], 0)
+    pred = np.where(np.isfinite(dist), diagonal[:, None], -1)
+    pred[diagonal, diagonal] = -1
+
+    rows_per_block = max(1, block // max(n, 1))
+    for k in range(n):
+        row, row_pred = dist[k].copy(), pred[k].copy()
+        for start in range(0, n, rows_per_block):
+            block_dist = dist[start:start + rows_per_block]
+            through_k = block_dist[:, k, None]
+            if np.isinf(through_k).all():
+                continue
+            candidate = through_k + row
+            better = candidate < block_dist
+            np.copyto(block_dist, candidate, where=better)
+            np.copyto(pred[start:start + rows_per_block], row_pred, where=better)
+    if (dist[diagonal, diagonal] < 0).any():
+        raise ValueError("the graph has a negative-weight cycle")
+    return dist, pred
+
+
+def _adjacency(n, tails, heads, weights):
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tails, minlength=n), out=offsets[1:])
+    return offsets.tolist(), heads.tolist(), weights.tolist()
+
+
+def dijkstra_rows(arcs, sources, potentials=None):
+    """Distance and predecessor rows from each source by binary-heap Dijkstra.
+
+    arcs is (offsets, heads, weights) as lists, grouped by tail. With
+    potentials the weights are Johnson-reweighted (non-negative) and the
+    distances are shifted back before returning.
+    """
+    offsets, heads, weights = arcs
+    n = len(offsets) - 1
+    dist = np.full((len(sources), n), np.inf)
+    pred = np.full((len(sources), n), -1, dtype=np.int64)
+    for r, s in enumerate(sources):
+        d = [math.inf] * n
+        p = [-1] * n
+        settled = [False] * n
+        d[s] = 0
+        heap = [(0, s)]
+        while heap:
+            du, u = heapq.heappop(heap)
+            if settled[u]:
+                continue
+            settled[u] = True
+            for i in range(offsets[u], offsets[u + 1]):
+                v = heads[i]
+                nd = du + weights[i]
+                if nd < d[v]:
+                    d[v] = nd
+                    p[v] = u
+                    heapq.heappush(heap, (nd, v))
+        dist[r] = d
+        pred[r] = p
+    if potentials is not None:
+        dist += potentials[None, :] - potentials[np.asarray(sources, dtype=np.int64)][:, None]
+    return dist, pred
+
+
+def _init_worker(arcs, potentials):
+    global _worker_arcs
+    _worker_arcs = (arcs, potentials)
+
+
+def _worker_rows(sources):
+    arcs, potentials = _worker_arcs
+    return dijkstra_rows(arcs, sources, potentials)
+
+
+def choose_method(n, arcs, sources):
+    """"floyd" for dense graphs when most rows are wanted, else "dijkstra"."""
+    if n <= FLOYD_MAX_VERTICES and arcs >= DENSE_FRACTION * n * n and 2 * sources > n:
+        return "floyd"
+    return "dijkstra"
+
+
+def shortest_path_rows(graph, sources=None, method="auto", workers=None, chunk=ROW_CHUNK):
+    """Yield (sources, distances, predecessors) row blocks, in source order.
+
+    Args:
+        graph (GraphData): From load_graph; its CSR fixes the direction of arcs
+        sources (list): Source vertices (default: every vertex, i.e. all pairs)
+        method (str): "floyd", "dijkstra" or "auto" (see choose_method)
+        workers (int): Dijkstra processes (default: one per CPU)
+        chunk (int): Rows per block
+
+    Raises:
+        ValueError: on a negative-weight cycle or an unknown source
+    """
+    n = len(graph["vertices"])
+    sources = list(range(n)) if sources is None else [int(s) for s in sources]
+    bad = [s for s in sources if not 0 <= s < n]
+    if bad:
+        raise ValueError(f"source {bad[0]} is not a vertex of a graph with {n} vertices")
+    tails, heads, weights = nonzero_arcs(graph)
+    if method == "auto":
+        method = choose_method(n, len(tails), len(sources))
+    blocks = [sources[i:i + chunk] for i in range(0, len(sources), chunk)]
+
+    if method == "floyd":
+        with phase("algorithm"):
+            dist, pred = floyd_warshall(n, tails, heads, weights)
+        for block in blocks:
+            yield block, dist[block], pred[block]
+        return
+    if method != "dijkstra":
+        raise ValueError(f"unknown method {method!r}")
+
+    potentials = None
+    if (weights < 0).any():
+        with phase("algorithm"):
+            potentials = johnson_potentials(n, tails, heads, weights)
+        weights = np.maximum(weights + potentials[tails] - potentials[heads], 0)
+    arcs = _adjacency(n, tails, heads, weights)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers <= 1 or len(blocks) <= 1:
+        for block in blocks:
+            with phase("algorithm"):
+                dist, pred = dijkstra_rows(arcs, block, potentials)
+            yield block, dist, pred
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(arcs, potentials)) as pool:
+        # Bound the backlog like FrameRenderer, so finished blocks are written out as they arrive
+        pending = []
+        for block in blocks:
+            if len(pending) >= 4 * workers:
+                done, future = pending.pop(0)
+                with phase("algorithm"):
+                    result = future.result()
+                yield (done, *result)
+            pending.append((block, pool.submit(_worker_rows, block)))
+        for done, future in pending:
+            with phase("algorithm"):
+                result = future.result()
+            yield (done, *result)
+
+
+def shortest_path_matrix(graph, sources=None, **kwargs):
+    """(distances, predecessors) as in-memory len(sources) x n arrays; see shortest_path_rows."""
+    n = len(graph["vertices"])
+    rows = n if sources is None else len(sources)
+    dist = np.empty((rows, n))
+    pred = np.empty((rows, n), dtype=np.int64)
+    at = 0
+    for block, d, p in shortest_path_rows(graph, sources, **kwargs):
+        dist[at:at + len(block)], pred[at:at + len(block)] = d, p
+        at += len(block)
+    return dist, pred
+
+
+def write_shortest_path_matrix(prefix, graph, sources=None, **kwargs):
+    """Stream the matrices to <prefix>_dist.npy and <prefix>_pred.npy one row block at a time.
+
+    Open them with np.load(path, mmap_mode="r") to read rows without
+    loading the whole matrix. Returns the two paths.
+    """
+    n = len(graph["vertices"])
+    rows = n if sources is None else len(sources)
+    dist_path, pred_path = f"{prefix}_dist.npy", f"{prefix}_pred.npy"
+    dist = open_memmap(dist_path, mode="w+", dtype=np.float64, shape=(rows, n))
+    pred = open_memmap(pred_path, mode="w+", dtype=np.int64, shape=(rows, n))
+    at = 0
+    for block, d, p in shortest_path_rows(graph, sources, **kwargs):
+        dist[at:at + len(block)], pred[at:at + len(block)] = d, p
+        at += len(block)
+    dist.flush()
+    pred.flush()
+    del dist, pred
+    return dist_path, pred_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="All-pairs / multi-source shortest paths of a graph file.")
+    parser.add_argument("graph", nargs="?", default="graph.json")
+    parser.add_argument("--sources", type=int, nargs="+", help="source vertices (default: all)")
+    parser.add_argument("--undirected", action="store_true", help="edges go both ways (as in Dijkstra's script)")
+    parser.add_argument("--method", choices=("auto", "floyd", "dijkstra"), default="auto")
+    parser.add_argument("--workers", type=int, help="Dijkstra processes (default: one per CPU)")
+    parser.add_argument("--chunk", type=int, default=ROW_CHUNK, help="source rows per block")
+    parser.add_argument("--out", default="shortest_paths", help="writes <out>_dist.npy and <out>_pred.npy")
+    args = parser.parse_args(argv)
+
+    graph = load_graph(args.graph, directed=not args.undirected)
+    paths = write_shortest_path_matrix(args.out, graph, args.sources, method=args.method,
+                                       workers=args.workers, chunk=args.chunk)
+    print(f"✅ Distances saved to {paths[0]}, predecessors to {paths[1]}")
+
+
+if __name__ == "__main__":
+    main()
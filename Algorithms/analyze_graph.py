@@ -1,31 +1,143 @@
 import json
+import os
+import struct
 import pandas as pd
 import numpy as np
+from instrumentation import phase
+
+# Binary graph file layout: GRAPH_MAGIC, uint32 header length, JSON header
+# padded to 8 bytes, then the vertex array (n x 2 little-endian float64) and
+# the edge records (edge_dtype), both opened with np.memmap on load.
+GRAPH_MAGIC = b"PFGRAPH1"
+BINARY_EXTENSION = ".pfg"
+# graph.json files larger than this are streamed into arrays, not json.load-ed
+STREAM_JSON_BYTES = 32 * 2 ** 20
+
+
+def edge_dtype(n):
+    """Record type of one stored edge; 32-bit endpoints unless n needs more."""
+    index = "<i4" if n < 2 ** 31 else "<i8"
+    return np.dtype([("v1", index), ("v2", index), ("weight", "<f8")])
+
+
+class GraphData(dict):
+    """Graph dictionary whose dense views are only built when asked for.
+
+    ``graph["adj_matrix"]`` (O(n^2) memory) and ``graph["edge_df"]`` are
+    materialized on first access and cached, so callers that stick to
+    ``graph["csr"]`` never pay for them.
+    """
+
+    def __init__(self, *args, directed=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.directed = directed
+
+    def __missing__(self, key):
+        if key == "adj_matrix":
+            value = dense_adjacency(len(self["vertices"]), self["edges"], self.directed)
+        elif key == "edge_df":
+            value = pd.DataFrame(self["edges"], columns=["v1", "v2", "weight"])
+        else:
+            raise KeyError(key)
+        self[key] = value
+        return value
+
+
+def edge_arrays(edges):
+    """Split an edge list of (v1, v2, weight), or stored edge records, into NumPy arrays."""
+    if getattr(edges, "dtype", None) is not None and edges.dtype.names:
+        return edges["v1"].astype(np.int64), edges["v2"].astype(np.int64), edges["weight"].astype(float)
+    if len(edges) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    arr = np.asarray(edges, dtype=float).reshape(-1, 3)
+    return arr[:, 0].astype(np.int64), arr[:, 1].astype(np.int64), arr[:, 2].copy()
 
-def load_graph(path="graph.json", directed=False):
-    """Load graph from file and return structured data.
+
+def build_csr(n, src, dst, weight, directed=False, reverse=False):
+    """Build a compressed sparse row adjacency from edge arrays.
+
+    Duplicate arcs keep the weight written last, matching what the dense
+    matrix would hold, and targets are sorted within each row so iterating
+    a row visits neighbours in the same order as scanning ``adj_matrix[u]``.
 
     Args:
-        path (str): Path to graph.json file
+        n (int): Number of vertices
+        src, dst, weight (np.ndarray): Edge endpoints and weights
         directed (bool): Whether to treat edges as directed
+        reverse (bool): Also build the incoming-arc index
 
     Returns:
         dict: {
-            "vertices": List of (x, y),
-            "edges": List of (v1, v2, weight),
-            "edge_df": Pandas DataFrame,
-            "adj_matrix": NumPy adjacency matrix
+            "offsets": Row start of each vertex (length n + 1),
+            "targets": Head vertex of each arc,
+            "weights": Weight of each arc,
+            "edge_ids": Index of the input edge each arc came from,
+            "rev_offsets", "rev_sources", "rev_weights", "rev_slots":
+                Incoming arcs grouped by head, with their forward slot
+                (only when reverse=True)
         }
     """
-    with open(path, "r") as f:
-        graph = json.load(f)
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    weight = np.asarray(weight, dtype=float)
+    ids = np.arange(len(src), dtype=np.int64)
+    order = ids * 2
 
-    vertices = graph["vertices"]
-    edges = graph["edges"]
+    if not directed:
+        src, dst = np.concatenate([src, dst]), np.concatenate([dst, src])
+        weight = np.concatenate([weight, weight])
+        ids = np.concatenate([ids, ids])
+        order = np.concatenate([order, order + 1])
 
-    df_edges = pd.DataFrame(edges, columns=["v1", "v2", "weight"])
+    key = src * n + dst
+    perm = np.lexsort((order, key))
+    key = key[perm]
+    last = np.ones(len(key), dtype=bool)
+    last[:-1] = key[1:] != key[:-1]
+    perm = perm[last]
 
-    n = len(vertices)
+    index_type = np.int32 if n < 2 ** 31 else np.int64
+    src = src[perm]
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+
+    csr = {
+        "offsets": offsets,
+        "targets": dst[perm].astype(index_type),
+        "weights": weight[perm],
+        "edge_ids": ids[perm],
+    }
+
+    if reverse:
+        targets = csr["targets"]
+        rperm = np.lexsort((src, targets))
+        rev_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=n), out=rev_offsets[1:])
+        csr["rev_offsets"] = rev_offsets
+        csr["rev_sources"] = src[rperm].astype(index_type)
+        csr["rev_weights"] = csr["weights"][rperm]
+        csr["rev_slots"] = rperm.astype(np.int64)
+
+    return csr
+
+
+def neighbors(csr, u):
+    """Return (targets, weights) views of the arcs leaving u."""
+    start, end = csr["offsets"][u], csr["offsets"][u + 1]
+    return csr["targets"][start:end], csr["weights"][start:end]
+
+
+def edge_weight(csr, u, v):
+    """Weight of arc (u, v), or 0 when absent (same as the dense matrix)."""
+    targets, weights = neighbors(csr, u)
+    i = np.searchsorted(targets, v)
+    if i < len(targets) and targets[i] == v:
+        return float(weights[i])
+    return 0
+
+
+def dense_adjacency(n, edges, directed=False):
+    """Build the dense n x n adjacency matrix used by the original scripts."""
     adj_matrix = np.zeros((n, n))
 
     for v1, v2, w in edges:
@@ -33,9 +145,298 @@ def load_graph(path="graph.json", directed=False):
         if not directed:
             adj_matrix[v2][v1] = w
 
-    return {
+    return adj_matrix
+
+
+def write_binary_graph(path, vertices, edges):
+    """Save vertices and edges in the binary graph format.
+
+    Args:
+        path (str): Output file, conventionally ending in BINARY_EXTENSION
+        vertices: Sequence or array of (x, y)
+        edges: Edge list, (m, 3) array or edge records of (v1, v2, weight)
+    """
+    coords = np.asarray(vertices, dtype="<f8").reshape(-1, 2)
+    n = len(coords)
+    src, dst, weight = edge_arrays(edges)
+    records = np.empty(len(src), dtype=edge_dtype(n))
+    records["v1"], records["v2"], records["weight"] = src, dst, weight
+
+    header = json.dumps({"n": n, "m": len(records), "edge_dtype": records.dtype.descr}).encode("utf-8")
+    header += b" " * (-(len(GRAPH_MAGIC) + 4 + len(header)) % 8)
+    with open(path, "wb") as f:
+        f.write(GRAPH_MAGIC + struct.pack("<I", len(header)) + header)
+        coords.tofile(f)
+        records.tofile(f)
+
+
+def read_binary_graph(path):
+    """Open a binary graph file without parsing it.
+
+    Returns:
+        tuple: (vertices as an n x 2 memmap, edge records memmap with
+        fields v1, v2, weight)
+    """
+    with open(path, "rb") as f:
+        if f.read(len(GRAPH_MAGIC)) != GRAPH_MAGIC:
+            raise ValueError(f"{path} is not a binary graph file")
+        (header_len,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    n, m = header["n"], header["m"]
+    records = np.dtype([tuple(field) for field in header["edge_dtype"]])
+    offset = len(GRAPH_MAGIC) + 4 + header_len
+
+    def view(dtype, shape, offset):
+        if not np.prod(shape):
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+    vertices = view("<f8", (n, 2), offset)
+    edges = view(records, (m,), offset + n * 16)
+    return vertices, edges
+
+
+def is_binary_graph(path):
+    with open(path, "rb") as f:
+        return f.read(len(GRAPH_MAGIC)) == GRAPH_MAGIC
+
+
+class _RowBuffer:
+    """Growable array of fixed-width rows filled from a flat run of numbers.
+
+    Rows are written straight into the final array (plain float64 rows, or
+    edge records when fields are given), which grows by half when full and
+    is trimmed in place at the end.
+    """
+
+    def __init__(self, width, capacity, fields=None):
+        self.width = width
+        self.fields = fields
+        self.dtype = edge_dtype(0) if fields else np.dtype(float)
+        self.data = self._empty(max(capacity, 1024))
+        self.size = 0
+        self.pending = np.empty(0)
+
+    def _empty(self, rows):
+        return np.empty(rows, dtype=self.dtype) if self.fields else np.empty((rows, self.width))
+
+    def extend(self, values):
+        values = np.concatenate([self.pending, values]) if len(self.pending) else values
+        complete = len(values) - len(values) % self.width
+        rows, self.pending = values[:complete].reshape(-1, self.width), values[complete:]
+        if self.fields and len(rows) and np.abs(rows[:, :2]).max() >= 2 ** 31 \
+                and self.dtype != edge_dtype(2 ** 31):
+            self.dtype = edge_dtype(2 ** 31)
+            self.data = self.data.astype(self.dtype)
+        end = self.size + len(rows)
+        if end > len(self.data):
+            grown = self._empty(max(end, len(self.data) * 3 // 2))
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        if self.fields:
+            for i, field in enumerate(self.fields):
+                self.data[field][self.size:end] = rows[:, i]
+        else:
+            self.data[self.size:end] = rows
+        self.size = end
+
+    def array(self):
+        self.data.resize((self.size,) + self.data.shape[1:], refcheck=False)
+        return self.data
+
+
+_BRACKETS_TO_SPACES = bytes.maketrans(b"[],", b"   ")
+
+
+class _JsonStream:
+    """Byte-level reader over a JSON file, refilled one chunk at a time."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = b""
+        self.pos = 0
+
+    def _fill(self):
+        data = self.f.read(self.chunk_size)
+        if not data:
+            raise ValueError("unexpected end of JSON input")
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+
+    def _byte(self):
+        if self.pos >= len(self.buf):
+            self._fill()
+        c = self.buf[self.pos]
+        self.pos += 1
+        return c
+
+    def next(self):
+        """Consume and return the next non-whitespace byte."""
+        while True:
+            c = self._byte()
+            if c not in b" \t\r\n":
+                return c
+
+    def string(self):
+        """Read a string whose opening quote was already consumed."""
+        raw = bytearray(b'"')
+        while True:
+            c = self._byte()
+            raw.append(c)
+            if c == ord("\\"):
+                raw.append(self._byte())
+            elif c == ord('"'):
+                return json.loads(raw.decode("utf-8"))
+
+    def skip_value(self, first):
+        """Skip the value that starts with the already consumed byte first."""
+        if first == ord('"'):
+            self.string()
+            return
+        if first not in b"[{":
+            while self._byte() not in b",]} \t\r\n":
+                pass
+            self.pos -= 1
+            return
+        depth = 1
+        while depth:
+            c = self._byte()
+            if c == ord('"'):
+                self.string()
+            elif c in b"[{":
+                depth += 1
+            elif c in b"]}":
+                depth -= 1
+
+    def number_rows(self, out):
+        """Read an array of number arrays (opening bracket consumed) into out.
+
+        Brackets are tracked with NumPy over whole chunks and the numbers
+        are parsed in bulk, so no Python object is made per value.
+
+        Returns:
+            int: Number of inner arrays
+        """
+        depth = 0
+        rows = 0
+        carry = b""
+        while True:
+            if self.pos >= len(self.buf):
+                self._fill()
+            chunk = self.buf[self.pos:]
+            codes = np.frombuffer(chunk, dtype=np.uint8)
+            step = (codes == ord("[")).astype(np.int64) - (codes == ord("]"))
+            level = depth + np.cumsum(step)
+            closed = np.flatnonzero(level < 0)
+            end = closed[0] if len(closed) else len(chunk)
+            rows += int(np.count_nonzero((codes[:end] == ord("[")) & (level[:end] == 1)))
+
+            text = carry + chunk[:end]
+            if len(closed):
+                carry = b""
+            else:
+                # Keep a number cut off at the chunk boundary for the next chunk
+                cut = max(text.rfind(c) for c in (b" ", b"\n", b"\t", b"\r", b",", b"[", b"]")) + 1
+                text, carry = text[:cut], text[cut:]
+            if text.strip(b" \t\r\n[],"):
+                out.extend(np.fromstring(text.translate(_BRACKETS_TO_SPACES), sep=" "))
+
+            if len(closed):
+                self.pos += end + 1
+                return rows
+            depth = int(level[-1])
+            self.pos = len(self.buf)
+
+
+def stream_graph_json(path, chunk_size=2 ** 20):
+    """Read graph.json in one pass straight into typed arrays.
+
+    Only the "vertices" and "edges" arrays are kept; other keys are
+    skipped. Numbers are parsed a chunk of text at a time and written
+    straight into the output arrays, so peak memory stays near the size of
+    those arrays rather than a multiple of the file as with json.load.
+
+    Returns:
+        tuple: (vertices as an n x 2 float64 array, edge records with
+        fields v1, v2, weight, as in read_binary_graph)
+    """
+    layouts = {"vertices": (2, None), "edges": (3, ("v1", "v2", "weight"))}
+    capacity = os.path.getsize(path) // 64
+    arrays = {}
+    with open(path, "rb") as f:
+        reader = _JsonStream(f, chunk_size)
+        if reader.next() != ord("{"):
+            raise ValueError(f"{path}: expected a JSON object")
+        while True:
+            c = reader.next()
+            if c == ord("}"):
+                break
+            if c == ord(","):
+                continue
+            if c != ord('"'):
+                raise ValueError(f"{path}: malformed JSON object")
+            key = reader.string()
+            if reader.next() != ord(":"):
+                raise ValueError(f"{path}: malformed JSON object")
+            c = reader.next()
+            if key in layouts and c == ord("["):
+                width, fields = layouts[key]
+                out = _RowBuffer(width, capacity, fields)
+                rows = reader.number_rows(out)
+                if len(out.pending) or out.size != rows:
+                    raise ValueError(f"{path}: every entry of {key!r} must hold {width} numbers")
+                arrays[key] = out.array()
+            else:
+                reader.skip_value(c)
+
+    return arrays["vertices"], arrays["edges"]
+
+
+def load_graph(path="graph.json", directed=False, reverse=False, stream=None):
+    """Load graph from file and return structured data.
+
+    Binary graph files (see write_binary_graph) are memory-mapped instead
+    of parsed, and JSON files above STREAM_JSON_BYTES are streamed with
+    stream_graph_json; vertices and edges are then NumPy arrays rather
+    than lists.
+
+    Args:
+        path (str): Path to graph.json or a binary graph file
+        directed (bool): Whether to treat edges as directed
+        reverse (bool): Also index incoming arcs in the CSR form
+        stream (bool): Force (True) or rule out (False) streaming a JSON
+            file; by default only large files are streamed
+
+    Returns:
+        GraphData: {
+            "vertices": List of (x, y),
+            "edges": List of (v1, v2, weight),
+            "csr": Compressed sparse adjacency (see build_csr),
+            "edge_df": Pandas DataFrame (built on first access),
+            "adj_matrix": NumPy adjacency matrix (built on first access)
+        }
+    """
+    with phase("load_graph"):
+        if is_binary_graph(path):
+            vertices, edges = read_binary_graph(path)
+        elif stream or (stream is None and os.path.getsize(path) > STREAM_JSON_BYTES):
+            vertices, edges = stream_graph_json(path)
+        else:
+            with open(path, "r") as f:
+                graph = json.load(f)
+            vertices, edges = graph["vertices"], graph["edges"]
+        return graph_from_data(vertices, edges, directed=directed, reverse=reverse)
+
+
+def graph_from_data(vertices, edges, directed=False, reverse=False):
+    """Build the same GraphData as load_graph from in-memory vertices and edges."""
+    n = len(vertices)
+    src, dst, weight = edge_arrays(edges)
+    csr = build_csr(n, src, dst, weight, directed=directed, reverse=reverse)
+
+    return GraphData({
         "vertices": vertices,
         "edges": edges,
-        "edge_df": df_edges,
-        "adj_matrix": adj_matrix
-    }
+        "csr": csr
+    }, directed=directed)
@@ -0,0 +1,234 @@
+import argparse
+import glob
+import json
+import math
+import os
+import shutil
+import sys
+import time
+from analyze_graph import BINARY_EXTENSION
+from frame_renderer import FRAME_BUDGET, VIDEO_FRAMERATE
+from instrumentation import PROFILE_MEMORY, Profiler, write_report
+from result_cache import cached_run, default_cache, digest, run_key
+
+# Shared command line for the algorithm scripts. Run without graph paths a
+# script keeps its interactive flow (GUI, then graph.json); given files or
+# directories it solves each graph in turn inside one process, with no
+# GUI, and can write frames, a video or nothing at all per graph.
+#
+#   python label_correcting_algorithms.py graphs/ --render none --results out.json
+#   python djikstra's_algorithm.py graphs/ --profile profile.json
+#
+# Results and output files are cached (see result_cache): a graph solved
+# before with the same contents and options is restored, not re-run.
+
+# Options that only decide where output goes or how it is made; the cache
+# keys every other option as a solver parameter
+OUTPUT_OPTIONS = {"graphs", "out", "workers", "results", "profile", "profile_memory", "no_cache",
+                  "render", "max_frames", "video_seconds"}
+
+
+def _positive(kind):
+    def parse(value):
+        number = kind(value)
+        if number <= 0:
+            raise argparse.ArgumentTypeError(f"{value} is not a positive number")
+        return number
+    return parse
+
+
+def build_parser(description, sink=False, planar=False):
+    """Argument parser with the options every script understands.
+
+    Scripts add their own options (e.g. --mode) to the returned parser.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("graphs", nargs="*",
+                        help="graph files (JSON or binary) or directories of them; omit to use the GUI")
+    if planar:
+        parser.add_argument("--dual", help="dual graph for a single primal graph "
+                            "(default: <name>_dual.json, or dual_graph.json next to graph.json; "
+                            "built from the drawing when missing)")
+    else:
+        parser.add_argument("--source", type=int, default=0, help="source vertex (default 0)")
+    if sink:
+        parser.add_argument("--sink", type=int, help="sink vertex (default: last vertex)")
+    parser.add_argument("--render", choices=("frames", "video", "none"), default="frames",
+                        help="write PNG frames, stream an mp4 through ffmpeg, or only solve")
+    parser.add_argument("--out", default="batch_output",
+                        help="directory for frames (<out>/<graph>/) and videos (<out>/<graph>.mp4)")
+    parser.add_argument("--workers", type=int, help="render processes (default: RENDER_WORKERS)")
+    budget = parser.add_mutually_exclusive_group()
+    budget.add_argument("--max-frames", type=_positive(int),
+                        help="draw at most this many frames, keeping key events (default: FRAME_BUDGET)")
+    budget.add_argument("--video-seconds", type=_positive(float),
+                        help="frame budget given as a target video length")
+    parser.add_argument("--results", help="write every graph's result to this JSON file")
+    parser.add_argument("--profile", help="write per-graph phase timings and operation counts to this JSON file")
+    parser.add_argument("--profile-memory", action="store_true", default=PROFILE_MEMORY,
+                        help="with --profile, also record allocation peaks (tracemalloc; slower)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always solve and draw instead of reusing cached results and frames")
+    return parser
+
+
+def is_dual_file(path):
+    name = os.path.basename(path)
+    return name == "dual_graph.json" or name.endswith("_dual.json")
+
+
+def dual_path_for(path):
+    """Dual graph file paired with a primal graph file."""
+    head, name = os.path.split(path)
+    if name in ("graph.json", "graph" + BINARY_EXTENSION):
+        return os.path.join(head, "dual_graph.json")
+    return os.path.join(head, os.path.splitext(name)[0] + "_dual.json")
+
+
+def graph_files(paths):
+    """Expand directories into their *.json and binary graphs (dual graphs excluded), in sorted order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = glob.glob(os.path.join(path, "*.json")) + glob.glob(os.path.join(path, "*" + BINARY_EXTENSION))
+            files.extend(sorted(p for p in found if not is_dual_file(p)))
+        else:
+            files.append(path)
+    return files
+
+
+def graph_name(path):
+    """Output name for a graph: its file stem, or its directory for a plain graph.json/.pfg."""
+    head, name = os.path.split(os.path.abspath(path))
+    if name in ("graph.json", "graph" + BINARY_EXTENSION):
+        return os.path.basename(head)
+    return os.path.splitext(name)[0]
+
+
+def prepare_output(args, path):
+    """Create this graph's output location.
+
+    Returns:
+        tuple: (frame directory, video path or None when frames are written)
+    """
+    name = graph_name(path)
+    img_dir = os.path.join(args.out, name)
+    os.makedirs(args.out, exist_ok=True)
+    if args.render == "video":
+        return img_dir, os.path.join(args.out, name + ".mp4")
+    shutil.rmtree(img_dir, ignore_errors=True)
+    os.makedirs(img_dir)
+    return img_dir, None
+
+
+def frame_budget(args):
+    """Frame budget from --max-frames / --video-seconds, or FRAME_BUDGET (None: draw every frame)."""
+    if args.max_frames is not None:
+        return args.max_frames
+    if args.video_seconds is not None:
+        return max(1, math.floor(args.video_seconds * VIDEO_FRAMERATE))
+    return FRAME_BUDGET
+
+
+def output_files(args, path):
+    """Files a solved graph left under args.out, as {path relative to args.out: path}."""
+    name = graph_name(path)
+    if args.render == "video":
+        names = [name + ".mp4"]
+    elif args.render == "frames":
+        names = [os.path.join(name, f) for f in sorted(os.listdir(os.path.join(args.out, name)))]
+    else:
+        names = []
+    return {rel: os.path.join(args.out, rel) for rel in names}
+
+
+def cached_solve(cache, path, args, solve_graph):
+    """solve_graph(path, args), or its cached result and output files.
+
+    Runs are keyed on the code of the script and the modules it imports,
+    the graph (and dual) file contents, the solver options and the render
+    settings. On a miss, frames are still reused one by one from earlier
+    runs over the same graph files, code and solver options.
+    """
+    inputs = [path]
+    if hasattr(args, "dual"):
+        inputs.append(args.dual or dual_path_for(path))
+    params = {k: v for k, v in vars(args).items() if k not in OUTPUT_OPTIONS}
+    frames_key = run_key(solve_graph.__code__.co_filename, inputs, **params)
+    key = digest(frames_key, args.render, frame_budget(args))
+
+    entry = cache.get(key)
+    if entry is not None:
+        if args.render != "none":
+            prepare_output(args, path)
+        if all(cache.restore_file(obj, os.path.join(args.out, rel)) for rel, obj in entry["files"].items()):
+            print(f"♻️  {path}: reused cached result")
+            return entry["result"]
+
+    with cached_run(cache, frames_key):
+        result = solve_graph(path, args)
+        files = {rel: cache.put_file(p) for rel, p in output_files(args, path).items()}
+        cache.put(key, {"result": result, "files": files})
+    return result
+
+
+def vertex_argument(value, n, default, flag):
+    """Resolve a --source/--sink value against the graph size."""
+    vertex = default if value is None else value
+    if not 0 <= vertex < n:
+        raise ValueError(f"{flag} {vertex} is not a vertex of a graph with {n} vertices")
+    return vertex
+
+
+def jsonable(value):
+    """Make solver output JSON safe: infinities become null, tuple keys strings."""
+    if isinstance(value, dict):
+        return {(",".join(map(str, k)) if isinstance(k, tuple) else k): jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [jsonable(v) for v in value]
+    if isinstance(value, float) and math.isinf(value):
+        return None
+    if hasattr(value, "item"):
+        return jsonable(value.item())
+    return value
+
+
+def run_batch(args, solve_graph):
+    """Solve every graph named on the command line with solve_graph(path, args).
+
+    A failing graph is reported and skipped so one bad file does not stop
+    the batch. Returns the process exit status (1 if any graph failed).
+    """
+    records = []
+    profiles = []
+    failed = False
+    cache = None if args.no_cache else default_cache()
+    solve = solve_graph if cache is None else (lambda p, a: cached_solve(cache, p, a, solve_graph))
+    for path in graph_files(args.graphs):
+        start = time.perf_counter()
+        profiler = Profiler(memory=args.profile_memory) if args.profile else None
+        try:
+            if profiler is None:
+                result = solve(path, args)
+            else:
+                with profiler:
+                    result = solve(path, args)
+        except Exception as exc:
+            failed = True
+            print(f"❌ {path}: {exc}")
+            records.append({"graph": path, "error": str(exc)})
+            continue
+        finally:
+            if profiler is not None:
+                profiles.append(profiler.report(graph=path))
+        elapsed = time.perf_counter() - start
+        print(f"✅ {path}: solved in {elapsed:.3f}s")
+        records.append(dict(graph=path, seconds=elapsed, **jsonable(result)))
+
+    if args.results:
+        with open(args.results, "w") as f:
+            json.dump(records, f, indent=2)
+        print(f"📝 Results saved to: {args.results}")
+    if args.profile:
+        write_report(args.profile, {"script": os.path.basename(sys.argv[0]), "argv": sys.argv[1:], "runs": profiles})
+    return 1 if failed else 0
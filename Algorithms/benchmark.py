@@ -0,0 +1,271 @@
+import os
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import argparse
+import csv
+import importlib.util
+import json
+import multiprocessing
+import platform
+import resource
+import time
+from synthetic_graphs import FAMILIES, synthetic_graph
+
+# Headless benchmarks of the algorithm cores on synthetic graphs. Every case
+# runs in its own process so peak RSS is per case and a slow case can be
+# killed at the timeout without losing the rest of the sweep.
+#
+#   python benchmark.py --sizes 1000,100000 --json results.json --csv results.csv
+
+DEFAULT_SIZES = (10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)
+DEFAULT_TIMEOUT = 600
+
+
+def load_script(filename):
+    """Import one of the algorithm scripts by file name (some are not valid module names)."""
+    name = os.path.splitext(filename)[0].replace("'", "")
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _reached(dd):
+    return None if dd is None else sum(d != float("inf") for d in dd.values())
+
+
+# Each benchmark imports its script up front, prepares its inputs from
+# (primal, dual) and then solves. Only solve is timed as the algorithm;
+# solve(inputs, trace) returns a scalar summary (vertices reached, max
+# flow, cut value) that should stay the same between runs, so it doubles
+# as a regression check.
+
+class DijkstraBench:
+    traced = True
+
+    def __init__(self):
+        self.core = load_script("djikstra's_algorithm.py")
+
+    def prepare(self, primal, dual):
+        from analyze_graph import graph_from_data
+        return graph_from_data(primal["vertices"], primal["edges"])
+
+    def solve(self, graph, trace):
+        dd, _ = self.core.dijkstra_heap(graph["csr"], len(graph["vertices"]), trace=trace)
+        return _reached(dd)
+
+
+class LabelCorrectingBench:
+    def __init__(self, mode):
+        self.mode = mode
+        self.traced = mode != "vectorized"
+        self.core = load_script("label_correcting_algorithms.py")
+
+    def prepare(self, primal, dual):
+        from analyze_graph import graph_from_data
+        return graph_from_data(primal["vertices"], primal["edges"])
+
+    def solve(self, graph, trace):
+        if self.mode == "vectorized":
+            dd, _ = self.core.label_correcting_vectorized(graph)
+        else:
+            dd, _ = self.core.LABEL_CORRECTING_MODES[self.mode](graph, trace=trace)
+        return _reached(dd)
+
+
+class MaxFlowBench:
+    traced = True
+
+    def __init__(self, method):
+        self.method = method
+        self.core = load_script("ford_fulkerson_algorithm.py")
+
+    def prepare(self, primal, dual):
+        from analyze_graph import graph_from_data
+        # Both directions of every edge, as the GUI saves undirected edges
+        edges = primal["edges"]
+        both = edges.copy()
+        both[:, [0, 1]] = edges[:, [1, 0]]
+        return graph_from_data(primal["vertices"], edges.tolist() + both.tolist(), directed=True)
+
+    def solve(self, graph, trace):
+        network = self.core.ResidualNetwork.from_graph(graph)
+        total_flow, _ = self.core.MAX_FLOW_METHODS[self.method](network, 0, len(graph["vertices"]) - 1, trace=trace)
+        return total_flow
+
+
+class PlanarCutBench:
+    traced = True
+    needs_dual = True
+
+    def __init__(self):
+        self.core = load_script("planar_graph_flow_cut_algorithm.py")
+
+    def prepare(self, primal, dual):
+        self.core.dual_edge_arrays(primal, dual)
+        return primal, dual
+
+    def solve(self, inputs, trace):
+        primal, dual = inputs
+        distances, _, min_cut_dual_edges = self.core.dijkstra_dual_with_path(
+            dual["dual_vertices"], dual["dual_edges"], dual["s_hat"], dual["t_hat"], trace=trace)
+        self.core.get_primal_cut_edges(primal, dual, min_cut_dual_edges)
+        self.core.flow_arrays(primal, dual, distances)
+        return distances[dual["t_hat"]]
+
+
+BENCHMARKS = {
+    "dijkstra": DijkstraBench,
+    "label_correcting_passes": lambda: LabelCorrectingBench("passes"),
+    "label_correcting_fifo": lambda: LabelCorrectingBench("fifo"),
+    "label_correcting_vectorized": lambda: LabelCorrectingBench("vectorized"),
+    "edmonds_karp": lambda: MaxFlowBench("edmonds-karp"),
+    "dinic": lambda: MaxFlowBench("dinic"),
+    "push_relabel": lambda: MaxFlowBench("push-relabel"),
+    "planar_cut": PlanarCutBench,
+}
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2 ** 20 if platform.system() == "Darwin" else 2 ** 10), 1)
+
+
+def _run_case(conn, algorithm, family, size, seed, count_ops):
+    """Child process body: build the graph, time one solve, optionally count ops."""
+    from event_trace import EventCounter
+    record = {"base_rss_mb": _peak_rss_mb()}
+    try:
+        bench = BENCHMARKS[algorithm]()
+        start = time.perf_counter()
+        primal, dual = synthetic_graph(family, size, seed)
+        record["generate_s"] = time.perf_counter() - start
+        record["vertices"] = len(primal["vertices"])
+        record["edges"] = len(primal["edges"])
+
+        start = time.perf_counter()
+        inputs = bench.prepare(primal, dual)
+        record["build_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        record["result"] = bench.solve(inputs, None)
+        record["wall_s"] = time.perf_counter() - start
+        record["peak_rss_mb"] = _peak_rss_mb()
+
+        if count_ops and bench.traced:
+            counter = EventCounter()
+            bench.solve(inputs, counter)
+            record["ops"] = counter.as_dict()
+        record["status"] = "ok"
+    except Exception as exc:
+        record["status"] = f"error: {type(exc).__name__}: {exc}"
+    conn.send(record)
+    conn.close()
+
+
+def run_case(algorithm, family, size, seed=0, timeout=DEFAULT_TIMEOUT, count_ops=True):
+    """Run one benchmark case in a fresh process and return its result record."""
+    record = {"algorithm": algorithm, "family": family, "target_edges": size, "seed": seed}
+    context = multiprocessing.get_context("fork" if hasattr(os, "fork") else "spawn")
+    parent, child = context.Pipe(duplex=False)
+    proc = context.Process(target=_run_case, args=(child, algorithm, family, size, seed, count_ops))
+    proc.start()
+    child.close()
+    if parent.poll(timeout):
+        record.update(parent.recv())
+    else:
+        proc.terminate()
+        record["status"] = "timeout"
+    proc.join()
+    return record
+
+
+def cases(algorithms, families, sizes):
+    for algorithm in algorithms:
+        planar_only = getattr(BENCHMARKS[algorithm], "needs_dual", False)
+        for family in families:
+            if planar_only and family == "geometric":
+                continue
+            for size in sizes:
+                yield algorithm, family, size
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def write_json(path, records):
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "results": records}, f, indent=2)
+
+
+def write_csv(path, records):
+    """One row per case; each operation count becomes an ops_<name> column."""
+    op_names = sorted({name for r in records for name in r.get("ops", {})})
+    columns = ["algorithm", "family", "target_edges", "seed", "vertices", "edges", "status",
+               "result", "generate_s", "build_s", "wall_s", "base_rss_mb", "peak_rss_mb"]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns + [f"ops_{name}" for name in op_names])
+        for r in records:
+            ops = r.get("ops", {})
+            writer.writerow([r.get(c, "") for c in columns] + [ops.get(name, "") for name in op_names])
+
+
+def _format(record):
+    if record["status"] != "ok":
+        return (f"{record['algorithm']:<28} {record['family']:<14} {record['target_edges']:>8}  "
+                f"{record['status']}")
+    ops = " ".join(f"{k}={v}" for k, v in record.get("ops", {}).items())
+    return (f"{record['algorithm']:<28} {record['family']:<14} {record['edges']:>8}  "
+            f"{record['wall_s']:>9.3f}s {record['peak_rss_mb']:>8.1f}MB  {ops}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the algorithm cores on synthetic graphs.")
+    parser.add_argument("--algorithms", default=",".join(BENCHMARKS),
+                        help="comma separated subset of: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--families", default=",".join(FAMILIES),
+                        help="comma separated subset of: " + ", ".join(FAMILIES))
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma separated target edge counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="seconds per case before it is killed")
+    parser.add_argument("--no-ops", action="store_true",
+                        help="skip the second, instrumented run that counts operations")
+    parser.add_argument("--json", help="write results to this JSON file")
+    parser.add_argument("--csv", help="write results to this CSV file")
+    args = parser.parse_args()
+
+    algorithms = args.algorithms.split(",")
+    families = args.families.split(",")
+    for name in algorithms:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown algorithm {name!r}")
+    for name in families:
+        if name not in FAMILIES:
+            parser.error(f"unknown family {name!r}")
+    sizes = [int(float(s)) for s in args.sizes.split(",")]
+
+    records = []
+    for algorithm, family, size in cases(algorithms, families, sizes):
+        record = run_case(algorithm, family, size, args.seed, args.timeout, not args.no_ops)
+        records.append(record)
+        print(_format(record), flush=True)
+        # Rewrite after every case so a long sweep keeps its partial results
+        if args.json:
+            write_json(args.json, records)
+        if args.csv:
+            write_csv(args.csv, records)
+
+
+if __name__ == "__main__":
+    main()
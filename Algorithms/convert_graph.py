@@ -0,0 +1,45 @@
+import argparse
+import json
+import os
+from analyze_graph import BINARY_EXTENSION, is_binary_graph, read_binary_graph, write_binary_graph
+
+# Convert between graph.json and the binary graph format. The direction is
+# picked from the input file, so the same command converts either way:
+#
+#   python convert_graph.py graph.json            -> graph.pfg
+#   python convert_graph.py big.pfg big.json      -> big.json
+
+
+def json_to_binary(src, dst):
+    with open(src, "r") as f:
+        graph = json.load(f)
+    write_binary_graph(dst, graph["vertices"], graph["edges"])
+
+
+def binary_to_json(src, dst):
+    vertices, edges = read_binary_graph(src)
+    with open(dst, "w") as f:
+        json.dump({
+            "vertices": vertices.tolist(),
+            "edges": [list(e) for e in zip(edges["v1"].tolist(), edges["v2"].tolist(), edges["weight"].tolist())]
+        }, f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert graphs between JSON and the binary format.")
+    parser.add_argument("input", help="graph.json or binary graph file")
+    parser.add_argument("output", nargs="?",
+                        help=f"output file (default: input with {BINARY_EXTENSION} or .json swapped in)")
+    args = parser.parse_args(argv)
+
+    binary = is_binary_graph(args.input)
+    output = args.output or os.path.splitext(args.input)[0] + (".json" if binary else BINARY_EXTENSION)
+    if binary:
+        binary_to_json(args.input, output)
+    else:
+        json_to_binary(args.input, output)
+    print(f"✅ Graph saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,20 @@ import json
 import time
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import subprocess
 import sys
-from analyze_graph import load_graph
+import heapq
+import math
+from analyze_graph import load_graph, edge_arrays, edge_weight
+from event_trace import TraceWriter, read_trace, iter_events, SETTLE, SCAN, NO_VALUE
+from frame_renderer import FrameRenderer, STREAM_VIDEO, FRAME_BUDGET, persistent_figure, save_frame, rendered_files
+from batch_cli import build_parser, frame_budget, prepare_output, run_batch, vertex_argument
+from snapshot_store import SnapshotStore
+from graph_artists import HIDDEN, Segments, label_points, note_hidden, points, show_labels
+from instrumentation import counted, phase, profile_run
+from result_cache import cached_result, default_cache, run_key
 
 # Set directories
 IMG_DIR = "../visualizationImages"
@@ -22,92 +32,257 @@ def setup_directories():
 
 def run_gui_and_load_graph():
     print("Launching graph GUI... Close it after pressing 's' to save.")
-    subprocess.run(["python", "graph_generating_script.py", "undirected"])
-    time.sleep(1)
+    with phase("gui"):
+        subprocess.run(["python", "graph_generating_script.py", "undirected"])
+        time.sleep(1)
     return load_graph(directed=False)
 
-def draw_frame(graph, F, Pr, current_edge, frame_number):
-    coords = graph["vertices"]
-    edges = graph["edges"]
-
-    fig, axs = plt.subplots(1, 2, figsize=(14, 6))
-
-    # Left plot: original graph + progress
-    for i, (x, y) in enumerate(coords):
-        color = 'green' if i in F else 'gray'
-        axs[0].scatter(x, y, color=color)
-        axs[0].text(x, y - 10, f"v{i}", ha='center', fontsize=9)
-
-    for v1, v2, w in edges:
-        x1, y1 = coords[v1]
-        x2, y2 = coords[v2]
-        edge_color = 'blue'
-        if current_edge == (v1, v2) or current_edge == (v2, v1):
-            edge_color = 'red'
-        axs[0].plot([x1, x2], [y1, y2], color=edge_color)
-        axs[0].text((x1 + x2)/2, (y1 + y2)/2, str(w), color='red', fontsize=8)
-
-    axs[0].set_title("Original Graph - Progress")
-    axs[0].invert_yaxis()
-    axs[0].axis("equal")
-
-    # Right plot: current tree
-    for i, (x, y) in enumerate(coords):
-        axs[1].scatter(x, y, color='black')
-        axs[1].text(x, y - 10, f"v{i}", ha='center', fontsize=9)
-
-    for child, parent in Pr.items():
-        if parent is not None:
-            x1, y1 = coords[parent]
-            x2, y2 = coords[child]
-            w = graph["adj_matrix"][parent][child]
-            axs[1].plot([x1, x2], [y1, y2], color='green')
-            axs[1].text((x1 + x2)/2, (y1 + y2)/2, str(w), color='red', fontsize=8)
-
-    axs[1].set_title("Shortest Path Tree (F)")
-    axs[1].invert_yaxis()
-    axs[1].axis("equal")
-
-    plt.tight_layout()
-    plt.savefig(os.path.join(IMG_DIR, f"frame_{frame_number:03d}.png"))
-    plt.close()
+class DijkstraFigure:
+    """Two-panel Dijkstra figure built once per graph and updated in place.
+
+    Vertices, edges and tree edges are one collection each; labels are
+    only drawn for graphs within LABEL_LIMIT.
+    """
+
+    def __init__(self, graph):
+        coords = points(graph["vertices"])
+        n = len(coords)
+        src, dst, _ = edge_arrays(graph["edges"])
+        self.coords = coords
+        self.csr = graph["csr"]
+        self.fig = Figure(figsize=(14, 6))
+        FigureCanvasAgg(self.fig)
+        axs = self.fig.subplots(1, 2)
+        self.axs = axs
+        names = [f"v{i}" for i in range(n)]
+
+        # Left plot: original graph + progress
+        # Settled vertices are a second, green scatter on top: one color per
+        # scatter keeps Agg on its fast marker path
+        axs[0].scatter(coords[:, 0], coords[:, 1], color='gray')
+        self.settled_dots = axs[0].scatter(coords[:0, 0], coords[:0, 1], color='green')
+        label_points(axs[0], coords, names, -10, ha='center', fontsize=9)
+
+        self.edge_lines = Segments(axs[0], coords[src], coords[dst], 'blue')
+        self.edge_index = {}
+        for i, edge in enumerate(zip(src.tolist(), dst.tolist())):
+            self.edge_index.setdefault(frozenset(edge), []).append(i)
+        if show_labels(len(src)):
+            for v1, v2, w in graph["edges"]:
+                (x1, y1), (x2, y2) = coords[v1], coords[v2]
+                axs[0].text((x1 + x2)/2, (y1 + y2)/2, str(w), color='red', fontsize=8)
+        note_hidden(axs[0], vertex=n, edge=len(src))
+
+        axs[0].set_title("Original Graph - Progress")
+        axs[0].invert_yaxis()
+        axs[0].axis("equal")
+
+        # Right plot: current tree, filled in by update(); vertex i's tree
+        # edge is segment i, hidden while i has no parent
+        axs[1].scatter(coords[:, 0], coords[:, 1], color='black')
+        label_points(axs[1], coords, names, -10, ha='center', fontsize=9)
+        self.tree_lines = Segments(axs[1], coords, coords, HIDDEN)
+        self.tree_labels = label_points(axs[1], coords, [""] * n, color='red', fontsize=8)
+        note_hidden(axs[1], vertex=n)
+
+        axs[1].set_title("Shortest Path Tree (F)")
+        axs[1].invert_yaxis()
+        axs[1].axis("equal")
+        self.fig.tight_layout()
+
+        self.settled = np.zeros(n, dtype=bool)
+        self.parent = np.full(n, -1)
+        self.current_edge = None
+
+    def edges_of(self, edge):
+        return [] if edge is None else self.edge_index.get(frozenset(edge), [])
+
+    def update(self, F, Pr, current_edge, changes=None):
+        """Show the frame's state. changes (the SnapshotStore delta since the
+        frame drawn before) limits the work to the vertices and edges it
+        names; None redraws everything from F and Pr."""
+        full = changes is None
+        if full:
+            self.edge_lines.set_colors('blue')
+            self.settled[:] = False
+            self.parent[:] = -1
+            changes = {"F": F, "Pr": Pr}
+        else:
+            self.edge_lines.recolor(self.edges_of(self.current_edge), 'blue')
+        self.edge_lines.recolor(self.edges_of(current_edge), 'red')
+        self.current_edge = current_edge
+
+        settled = list(changes.get("F", ()))
+        if settled or full:
+            self.settled[settled] = True
+            self.settled_dots.set_offsets(self.coords[self.settled].reshape(-1, 2))
+
+        moved = []
+        for child, parent in changes.get("Pr", {}).items():
+            parent = -1 if parent is None else parent
+            if parent == self.parent[child] and not full:
+                continue
+            self.parent[child] = parent
+            moved.append(child)
+            if self.tree_labels is None:
+                continue
+            text = self.tree_labels[child]
+            if parent < 0:
+                text.set_text("")
+                continue
+            text.set_position((self.coords[parent] + self.coords[child]) / 2)
+            text.set_text(str(edge_weight(self.csr, parent, child)))
+        if moved:
+            moved = np.array(moved)
+            parents = self.parent[moved]
+            self.tree_lines.move(moved, self.coords[np.where(parents >= 0, parents, moved)], self.coords[moved])
+            self.tree_lines.recolor(moved[parents >= 0], 'green')
+            self.tree_lines.recolor(moved[parents < 0], HIDDEN)
+
+def draw_frame(graph, F, Pr, current_edge, frame_number, changes=None, img_dir=IMG_DIR):
+    figure = persistent_figure(DijkstraFigure, graph)
+    figure.update(F, Pr, current_edge, changes)
+    return save_frame(figure.fig, os.path.join(img_dir, f"frame_{frame_number:03d}.png"))
 
 def save_video():
     output_path = os.path.join(VID_DIR, VIDEO_NAME)
-    subprocess.run([
-        "ffmpeg", "-y", "-framerate", "0.5",
-        "-i", os.path.join(IMG_DIR, "frame_%03d.png"),
-        "-c:v", "libx264", "-pix_fmt", "yuv420p", output_path
-    ])
+    with phase("ffmpeg"):
+        subprocess.run([
+            "ffmpeg", "-y", "-framerate", "0.5",
+            "-i", os.path.join(IMG_DIR, "frame_%03d.png"),
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", output_path
+        ])
     print(f"🎞️  Video saved to: {output_path}")
 
-def dijkstra_with_visualization(graph):
-    F = []
-    dd = {i: (0 if i == 0 else float("inf")) for i in range(len(graph["vertices"]))}
-    Pr = {i: None for i in range(len(graph["vertices"]))}
-
-    frame_number = 0
-    draw_frame(graph, F, Pr, None, frame_number)
-    frame_number += 1
-
-    while any(v not in F and dd[v] < float("inf") for v in range(len(graph["vertices"]))):
-        unvisited = [v for v in range(len(graph["vertices"])) if v not in F]
-        v = min(unvisited, key=lambda x: dd[x])
-        F.append(v)
-
-        for w in range(len(graph["vertices"])):
-            if w not in F and graph["adj_matrix"][v][w] > 0:
-                current_edge = (v, w)
-                if dd[v] + graph["adj_matrix"][v][w] < dd[w]:
-                    dd[w] = dd[v] + graph["adj_matrix"][v][w]
+def dijkstra_heap(csr, n, source=0, on_scan=None, trace=None):
+    """Binary-heap Dijkstra over the CSR adjacency from load_graph.
+
+    Vertices are settled in (distance, index) order and each row is scanned
+    in ascending target order, so the relaxation sequence matches the
+    original dense-matrix loop. Arcs of weight 0 are skipped, as before.
+
+    Args:
+        csr (dict): Adjacency from load_graph(...)["csr"]
+        n (int): Number of vertices
+        source (int): Start vertex
+        on_scan (callable): Called as on_scan(F, Pr, (v, w)) after each arc
+            scan, where F is the set of settled vertices
+        trace (TraceWriter): Receives SETTLE and SCAN events
+
+    Returns:
+        tuple: (dd, Pr) dicts of distances and parents
+    """
+    dd = {i: (0 if i == source else float("inf")) for i in range(n)}
+    Pr = {i: None for i in range(n)}
+    F = set()
+    heap = [(0, source)] if n else []
+    offsets, targets, weights = csr["offsets"], csr["targets"], csr["weights"]
+
+    while heap:
+        d, v = heapq.heappop(heap)
+        if v in F or d > dd[v]:
+            continue
+        F.add(v)
+        if trace is not None:
+            trace.emit(SETTLE, v)
+
+        start, end = offsets[v], offsets[v + 1]
+        for w, length in zip(targets[start:end].tolist(), weights[start:end].tolist()):
+            if length > 0 and w not in F:
+                improved = d + length < dd[w]
+                if improved:
+                    dd[w] = d + length
                     Pr[w] = v
-                draw_frame(graph, F, Pr, current_edge, frame_number)
-                frame_number += 1
+                    heapq.heappush(heap, (dd[w], w))
+                if trace is not None:
+                    trace.emit(SCAN, v, w, dd[w] if improved else NO_VALUE)
+                if on_scan is not None:
+                    on_scan(F, Pr, (v, w))
+
+    return dd, Pr
+
+class DijkstraSnapshots:
+    """Trace stand-in that records SETTLE/SCAN events as SnapshotStore frames.
+
+    Live runs pass it to dijkstra_heap as trace= and replays feed it the
+    recorded events, so both produce the same frames.
+    """
+
+    def __init__(self, n):
+        self.store = SnapshotStore(F={}, Pr={i: None for i in range(n)})
+        self.store.record(current_edge=None)
+        self.settled = {}
+
+    def emit(self, kind, u=-1, v=-1, value=NO_VALUE):
+        if kind == SETTLE:
+            self.settled[u] = True
+        elif kind == SCAN:
+            changes = {"F": self.settled}
+            improved = not math.isnan(value)
+            if improved:
+                changes["Pr"] = {v: u}
+            self.store.record(changes, key_event=improved or bool(self.settled), current_edge=(u, v))
+            self.settled = {}
 
-    draw_frame(graph, F, Pr, None, frame_number)
+    def finish(self):
+        self.store.record({"F": self.settled}, key_event=True, current_edge=None)
+        self.settled = {}
+        return self.store
+
+def dijkstra_with_visualization(graph, source=0, workers=None, video_path=None, max_frames=FRAME_BUDGET,
+                                img_dir=IMG_DIR):
+    n = len(graph["vertices"])
+    snapshots = DijkstraSnapshots(n)
+    with phase("algorithm"):
+        dd, Pr = dijkstra_heap(graph["csr"], n, source=source, trace=counted(snapshots))
+
+    store = snapshots.finish()
+    with FrameRenderer(draw_frame, static_args=(graph,), workers=workers, video_path=video_path,
+                       img_dir=img_dir) as renderer:
+        renderer.render_store(store, "frame_number", store.sample(max_frames), "changes")
     return dd, Pr
 
-def main():
+def record_trace(graph, trace_path, source=0):
+    """Run Dijkstra without rendering, writing its events to trace_path."""
+    with TraceWriter(trace_path, "dijkstra", n=len(graph["vertices"]), source=source) as trace:
+        return dijkstra_heap(graph["csr"], len(graph["vertices"]), source=source, trace=trace)
+
+def replay_trace(graph, trace_path, start=0, stop=None, workers=None, video_path=None, max_frames=FRAME_BUDGET,
+                 img_dir=IMG_DIR):
+    """Render frames [start, stop) of a recorded run; same frames as a live run."""
+    header, events = read_trace(trace_path)
+    n = header["n"]
+    dd = {i: (0 if i == header["source"] else float("inf")) for i in range(n)}
+    snapshots = DijkstraSnapshots(n)
+    for kind, u, v, value in iter_events(events):
+        if kind == SCAN and not math.isnan(value):
+            dd[v] = value
+        snapshots.emit(kind, u, v, value)
+    store = snapshots.finish()
+
+    with FrameRenderer(draw_frame, static_args=(graph,), workers=workers, video_path=video_path,
+                       img_dir=img_dir) as renderer:
+        renderer.render_store(store, "frame_number", store.sample(max_frames, start, stop), "changes")
+    return dd, store.current["Pr"]
+
+def solve_graph(path, args):
+    """Batch mode: solve one graph file and optionally render it."""
+    graph = load_graph(path, directed=False)
+    n = len(graph["vertices"])
+    source = vertex_argument(args.source, n, 0, "--source")
+    if (graph["csr"]["weights"] < 0).any():
+        raise ValueError("all edge weights must be non-negative for Dijkstra's algorithm")
+
+    if args.render == "none":
+        with phase("algorithm"):
+            dd, Pr = dijkstra_heap(graph["csr"], n, source=source, trace=counted())
+    else:
+        img_dir, video_path = prepare_output(args, path)
+        dd, Pr = dijkstra_with_visualization(graph, source, workers=args.workers, video_path=video_path,
+                                             max_frames=frame_budget(args), img_dir=img_dir)
+    return {"source": source, "distances": dd, "parents": Pr}
+
+def interactive():
     print("The first node placed will be considered node s")
     setup_directories()
     graph = run_gui_and_load_graph()
@@ -117,15 +292,28 @@ def main():
         sys.exit(1)
 
     print("✅ All edge weights are non-negative.")
-    dd, Pr = dijkstra_with_visualization(graph)
+    source = 0
+    video_path = os.path.join(VID_DIR, VIDEO_NAME) if STREAM_VIDEO else None
+    dd, Pr = cached_result(default_cache(), run_key(__file__, ["graph.json"], source=source),
+                           lambda: dijkstra_with_visualization(graph, source, video_path=video_path),
+                           lambda: rendered_files(IMG_DIR, video_path), FRAME_BUDGET, video_path)
 
-    print("\n📊 Shortest distances from v0:")
+    print(f"\n📊 Shortest distances from v{source}:")
     for i in range(len(graph["vertices"])):
         d = dd[i]
         status = f"{d}" if d != float("inf") else "unreachable"
         print(f"v{i}: {status}")
 
-    save_video()
+    if video_path is None:
+        save_video()
+
+def main(argv=None):
+    args = build_parser("Dijkstra's algorithm with a shortest-path tree visualization.").parse_args(argv)
+    if not args.graphs:
+        with profile_run():
+            interactive()
+        return
+    sys.exit(run_batch(args, solve_graph))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
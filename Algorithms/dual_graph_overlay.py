@@ -4,6 +4,7 @@ import json
 import os
 import sys
 from analyze_graph import load_graph
+from graph_canvas import SpatialGrid, graph_items, draw_in_batches, fit_scroll_region, bind_scrolling
 
 PRIMAL_GRAPH_PATH = "graph.json"
 DUAL_GRAPH_PATH = "dual_graph.json"
@@ -16,6 +17,7 @@ class DualGraphOverlay:
         self.canvas.pack()
 
         self.dual_vertices = []
+        self.dual_index = SpatialGrid()
         self.dual_edges = []
         self.dual_to_primal_map = {}
         self.edge_selection = []
@@ -27,6 +29,7 @@ class DualGraphOverlay:
         self.print_instructions()
 
         self.canvas.bind("<Button-1>", self.on_click)
+        bind_scrolling(self.canvas)
         for widget in [self.root, self.canvas]:
             widget.bind("<Key>", self.key_handler)
             widget.focus_set()
@@ -59,31 +62,25 @@ class DualGraphOverlay:
             self.root.quit()
 
     def draw_primal_graph(self):
-        coords = self.primal_graph["vertices"]
-        edges = self.primal_graph["edges"]
-        for i, (x, y) in enumerate(coords):
-            self.canvas.create_oval(x-5, y-5, x+5, y+5, fill='gray')
-            self.canvas.create_text(x, y - 10, text=f"v{i}", fill='black')
-        for v1, v2, w in edges:
-            x1, y1 = coords[v1]
-            x2, y2 = coords[v2]
-            self.canvas.create_line(x1, y1, x2, y2, fill='lightblue')
-            self.canvas.create_text((x1 + x2)//2, (y1 + y2)//2, text=f"{w}", fill='red')
+        items = graph_items(self.canvas, self.primal_graph["vertices"], self.primal_graph["edges"],
+                            vertex_fill='gray', edge_fill='lightblue')
+        draw_in_batches(self.canvas, items, done=lambda: fit_scroll_region(self.canvas))
 
     def on_click(self, event):
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
         if self.mode == 'dual_vertex':
-            self.add_dual_vertex(event.x, event.y)
+            self.add_dual_vertex(int(x), int(y))
         elif self.mode == 'dual_edge':
-            self.select_for_dual_edge(event.x, event.y)
+            self.select_for_dual_edge(x, y)
         elif self.mode == 's_hat':
-            idx = self.get_dual_vertex_near(event.x, event.y)
+            idx = self.get_dual_vertex_near(x, y)
             if idx is not None:
                 self.s_hat = idx
                 x, y = self.dual_vertices[idx]
                 self.canvas.create_text(x, y + 15, text="s_hat", fill='green', font=('Arial', 10, 'bold'))
                 print(f"✔️ s_hat set to dual vertex {idx}")
         elif self.mode == 't_hat':
-            idx = self.get_dual_vertex_near(event.x, event.y)
+            idx = self.get_dual_vertex_near(x, y)
             if idx is not None:
                 self.t_hat = idx
                 x, y = self.dual_vertices[idx]
@@ -95,6 +92,7 @@ class DualGraphOverlay:
         self.canvas.create_oval(x - 5, y - 5, x + 5, y + 5, fill='purple')
         self.canvas.create_text(x, y - 10, text=f"d{idx}", fill='purple')
         self.dual_vertices.append((x, y))
+        self.dual_index.add(x, y)
 
     def select_for_dual_edge(self, x, y):
         idx = self.get_dual_vertex_near(x, y)
@@ -118,10 +116,7 @@ class DualGraphOverlay:
                 self.edge_selection.clear()
 
     def get_dual_vertex_near(self, x, y, radius=10):
-        for idx, (vx, vy) in enumerate(self.dual_vertices):
-            if (vx - x) ** 2 + (vy - y) ** 2 <= radius ** 2:
-                return idx
-        return None
+        return self.dual_index.nearest(x, y, radius)
 
     def prompt_for_length(self):
         weight_str = simpledialog.askstring("Dual Edge Length", "Enter length (default 0):")
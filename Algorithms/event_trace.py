@@ -0,0 +1,119 @@
+import os
+import json
+import struct
+import numpy as np
+
+# Trace file layout: MAGIC, uint32 header length, JSON header, then a flat
+# run of EVENT_DTYPE records appended in order.
+MAGIC = b"PFTRACE1"
+EVENT_DTYPE = np.dtype([("kind", "u1"), ("u", "<i8"), ("v", "<i8"), ("value", "<f8")])
+
+# Event kinds. u/v/value meaning is given per kind.
+SETTLE = 1          # u = vertex permanently labeled
+SCAN = 2            # arc (u, v) scanned; value = new label of v, NaN if not improved
+NEGATIVE_CYCLE = 3  # negative cycle detected, run aborted
+DISCOVER = 4        # BFS discovered residual arc (u, v)
+PATH_VERTEX = 5     # u = next vertex of the augmenting path being recorded
+AUGMENT = 6         # push value units along the recorded path; (u, v) = bottleneck arc
+REACHABLE = 7       # u is on the source side of the final cut
+RELAX = 8           # dual vertex v improved to value via u
+CUT_EDGE = 9        # dual arc (u, v) lies on the min-cut path
+LEVEL_GRAPH = 10    # Dinic phase starts; value = BFS level of the sink, its DISCOVERs follow
+PUSH = 11           # push value units of excess along residual arc (u, v)
+RELABEL = 12        # u relabeled to value; DISCOVERs of its admissible arcs precede it
+GLOBAL_RELABEL = 13 # labels reset to sink distances; value = vertices that reach the sink
+GAP = 14            # no vertex is left at label value; u and the vertices above it are cut off
+DISCHARGE = 15      # u is done discharging; its PUSHes and RELABELs since the last DISCHARGE precede it
+
+NO_VALUE = float("nan")
+
+EVENT_NAMES = {
+    SETTLE: "settle", SCAN: "scan", NEGATIVE_CYCLE: "negative_cycle",
+    DISCOVER: "discover", PATH_VERTEX: "path_vertex", AUGMENT: "augment",
+    REACHABLE: "reachable", RELAX: "relax", CUT_EDGE: "cut_edge",
+    LEVEL_GRAPH: "level_graph", PUSH: "push", RELABEL: "relabel",
+    GLOBAL_RELABEL: "global_relabel", GAP: "gap", DISCHARGE: "discharge",
+}
+
+
+class TraceWriter:
+    """Append-only writer for algorithm event traces.
+
+    Events are buffered as tuples and flushed to disk in blocks, so
+    emitting one costs a list append inside the solver loop.
+    """
+
+    def __init__(self, path, algorithm, flush_every=65536, **meta):
+        self.path = path
+        self.flush_every = flush_every
+        self.buffer = []
+        self.count = 0
+        self.file = open(path, "wb")
+        header = json.dumps(dict(meta, algorithm=algorithm)).encode("utf-8")
+        self.file.write(MAGIC + struct.pack("<I", len(header)) + header)
+
+    def emit(self, kind, u=-1, v=-1, value=NO_VALUE):
+        self.buffer.append((kind, u, v, value))
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            np.array(self.buffer, dtype=EVENT_DTYPE).tofile(self.file)
+            self.count += len(self.buffer)
+            self.buffer = []
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EventCounter:
+    """Stand-in for TraceWriter that only counts events by kind.
+
+    Passing one as trace= gives operation counts (settles, scans,
+    augmentations, ...) without writing anything to disk.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (max(EVENT_NAMES) + 1)
+
+    def emit(self, kind, u=-1, v=-1, value=NO_VALUE):
+        self.counts[kind] += 1
+
+    def as_dict(self):
+        return {name: self.counts[kind] for kind, name in EVENT_NAMES.items() if self.counts[kind]}
+
+
+def read_trace(path):
+    """Open a trace written by TraceWriter.
+
+    Returns:
+        tuple: (header dict, memory-mapped EVENT_DTYPE record array)
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an event trace")
+        (header_len,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    offset = len(MAGIC) + 4 + header_len
+    if os.path.getsize(path) - offset < EVENT_DTYPE.itemsize:
+        return header, np.empty(0, dtype=EVENT_DTYPE)
+    return header, np.memmap(path, dtype=EVENT_DTYPE, mode="r", offset=offset)
+
+
+def iter_events(events, chunk=65536):
+    """Yield (kind, u, v, value) tuples as Python scalars, chunk by chunk."""
+    for start in range(0, len(events), chunk):
+        block = events[start:start + chunk]
+        yield from zip(block["kind"].tolist(), block["u"].tolist(),
+                       block["v"].tolist(), block["value"].tolist())
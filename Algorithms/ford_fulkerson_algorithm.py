@@ -1,16 +1,29 @@
 import os
+import sys
 import json
 import time
 import numpy as np
-import matplotlib.pyplot as plt
-import networkx as nx
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import subprocess
 from analyze_graph import load_graph
+from event_trace import (TraceWriter, read_trace, iter_events, DISCOVER, PATH_VERTEX, AUGMENT, REACHABLE,
+                         LEVEL_GRAPH, PUSH, RELABEL, GLOBAL_RELABEL, GAP, DISCHARGE)
+from frame_renderer import FrameRenderer, STREAM_VIDEO, FRAME_BUDGET, persistent_figure, save_frame, rendered_files
+from batch_cli import build_parser, frame_budget, prepare_output, run_batch, vertex_argument
+from snapshot_store import SnapshotStore
+from graph_artists import HIDDEN, Arrows, colors, label_points, note_hidden, points, show_labels, shrink_for
+from instrumentation import counted, phase, profile_run
+from result_cache import cached_result, default_cache, run_key
 from collections import deque
 
 IMG_DIR = "../visualizationImages"
 VID_DIR = "../visualizationVideos"
 VIDEO_NAME = "ford_fulkerson_visualization.mp4"
+# Solver used unless --method says otherwise (a MAX_FLOW_METHODS key)
+MAX_FLOW_METHOD = os.environ.get("MAX_FLOW_METHOD", "edmonds-karp")
+# Push-relabel relabels between global relabels, as a multiple of the vertex count
+GLOBAL_RELABEL_EVERY = 1.0
 
 # Ensure frame and video directories are clean
 def setup_directories():
@@ -22,150 +35,820 @@ def setup_directories():
 # Launch GUI and load directed graph
 def run_gui_and_load_graph():
     print("Launching graph GUI... Close it after pressing 's' to save.")
-    subprocess.run(["python", "graph_generating_script.py", "directed"])
-    time.sleep(1)
+    with phase("gui"):
+        subprocess.run(["python", "graph_generating_script.py", "directed"])
+        time.sleep(1)
     return load_graph(directed=True)
 
-# BFS to find path from source to sink, returns parent map and path as a list
-def bfs(capacity, flow, source, sink):
-    n = len(capacity)
-    parent = [-1] * n
-    visited = [False] * n
-    queue = deque([source])
-    visited[source] = True
-    discovered_edges = set()
-    while queue:
-        u = queue.popleft()
-        for v in range(n):
-            if not visited[v] and capacity[u][v] - flow[u][v] > 0:
-                parent[v] = u
-                visited[v] = True
-                discovered_edges.add((u, v))
-                queue.append(v)
-                if v == sink:
-                    path = []
-                    while v != source:
-                        path.append(v)
-                        v = parent[v]
-                    path.append(source)
-                    return list(reversed(path)), discovered_edges
-    return None, discovered_edges
-
-# Compute reachable set from source in residual graph
-def get_reachable(capacity, flow, source):
-    n = len(capacity)
-    visited = [False] * n
-    queue = deque([source])
-    visited[source] = True
-    while queue:
-        u = queue.popleft()
-        for v in range(n):
-            if not visited[v] and capacity[u][v] - flow[u][v] > 0:
-                visited[v] = True
-                queue.append(v)
-    return visited
-
-# Draw frame with all four subplots
-def draw_frame(pos, capacity, flow, original_edges, path, bottleneck, reachable, discovered_edges, frame_idx, total_flow, source, sink, final_frame_idx):
-    fig, axs = plt.subplots(2, 2, figsize=(14, 10))
-
-    # Top Left - Original Graph with Capacities
-    ax_orig = axs[0, 0]
-    G_orig = nx.DiGraph()
-    G_orig.add_nodes_from(range(len(pos)))
-    for u, v, w in original_edges:
-        G_orig.add_edge(u, v, capacity=w)
-    edge_labels = {(u, v): f"{capacity[u][v]:.0f}" for u, v, _ in original_edges}
-    nx.draw(G_orig, pos, ax=ax_orig, node_color='lightblue', with_labels=True, arrows=True)
-    nx.draw_networkx_edge_labels(G_orig, pos, edge_labels=edge_labels, ax=ax_orig, font_color='red')
-    ax_orig.set_title("Original Graph with Capacities")
-
-    # Top Right - Min Cut Coloring
-    ax_cut = axs[0, 1]
-    G_cut = nx.DiGraph()
-    G_cut.add_nodes_from(range(len(pos)))
-    for u, v, _ in original_edges:
-        G_cut.add_edge(u, v)
-    node_colors = []
-    for i in range(len(pos)):
-        if frame_idx == final_frame_idx:
-            node_colors.append('green' if reachable[i] else 'red')
-        else:
-            if i == source:
+# Sparse residual network. Every arc 2i (forward, capacity c) is paired
+# with arc 2i + 1 (reverse, capacity 0), so pushing flow on one arc frees
+# the same amount on its partner. Arcs out of each vertex are stored
+# contiguously and sorted by head, so a BFS costs O(n + m) and explores
+# neighbours in the same order as the old range(n) scan.
+class ResidualNetwork:
+    def __init__(self, n, tails, heads, capacities):
+        m = len(tails)
+        self.n = n
+        arc_tail = np.empty(2 * m, dtype=np.int64)
+        arc_head = np.empty(2 * m, dtype=np.int64)
+        residual = np.zeros(2 * m)
+        arc_tail[0::2], arc_tail[1::2] = tails, heads
+        arc_head[0::2], arc_head[1::2] = heads, tails
+        residual[0::2] = capacities
+
+        order = np.lexsort((np.arange(2 * m), arc_head, arc_tail))
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(arc_tail, minlength=n), out=offsets[1:])
+
+        self.capacity = residual.tolist()
+        self.residual = residual.tolist()
+        self.tail = arc_tail.tolist()
+        self.head = arc_head.tolist()
+        self.offsets = offsets.tolist()
+        self.arcs = order.tolist()
+
+    # Build from the CSR form of a directed graph (duplicate arcs keep the last capacity)
+    @classmethod
+    def from_graph(cls, graph):
+        csr = graph["csr"]
+        n = len(graph["vertices"])
+        tails = np.repeat(np.arange(n), np.diff(csr["offsets"]))
+        return cls(n, tails, csr["targets"], csr["weights"])
+
+    def out_arcs(self, u):
+        return self.arcs[self.offsets[u]:self.offsets[u + 1]]
+
+    # BFS for a shortest augmenting path; returns (path, path_arcs, discovered_edges)
+    def bfs(self, source, sink):
+        parent_arc = [-1] * self.n
+        visited = [False] * self.n
+        visited[source] = True
+        queue = deque([source])
+        discovered_edges = set()
+        head, residual = self.head, self.residual
+        while queue:
+            u = queue.popleft()
+            for a in self.out_arcs(u):
+                v = head[a]
+                if not visited[v] and residual[a] > 0:
+                    parent_arc[v] = a
+                    visited[v] = True
+                    discovered_edges.add((u, v))
+                    queue.append(v)
+                    if v == sink:
+                        path_arcs = []
+                        while v != source:
+                            a = parent_arc[v]
+                            path_arcs.append(a)
+                            v = self.tail[a]
+                        path_arcs.reverse()
+                        path = [source] + [head[a] for a in path_arcs]
+                        return path, path_arcs, discovered_edges
+        return None, None, discovered_edges
+
+    # BFS levels for a Dinic phase; returns (level, level_arcs) where level is
+    # -1 for vertices not reached and level_arcs are the residual arcs (u, v)
+    # with level[v] == level[u] + 1. Vertices at the sink's level or beyond
+    # are not expanded, since no shortest augmenting path passes them.
+    def levels(self, source, sink):
+        level = [-1] * self.n
+        level[source] = 0
+        queue = deque([source])
+        level_arcs = set()
+        head, residual = self.head, self.residual
+        while queue:
+            u = queue.popleft()
+            if level[sink] >= 0 and level[u] >= level[sink]:
+                break
+            for a in self.out_arcs(u):
+                v = head[a]
+                if residual[a] > 0:
+                    if level[v] < 0:
+                        level[v] = level[u] + 1
+                        queue.append(v)
+                    if level[v] == level[u] + 1:
+                        level_arcs.add((u, v))
+        return level, level_arcs
+
+    # Augmenting paths of one Dinic phase, found by a DFS that only climbs
+    # one level per arc and keeps a current-arc pointer per vertex, so an arc
+    # that is saturated or leads to a dead end is never looked at again in
+    # this phase. Yields each path's arcs; the caller pushes its bottleneck
+    # before the search resumes from the tail of the first saturated arc.
+    def blocking_paths(self, source, sink, level):
+        arcs, head, tail, residual = self.arcs, self.head, self.tail, self.residual
+        current = self.offsets[:-1]
+        end = self.offsets[1:]
+        path_arcs = []
+        u = source
+        while True:
+            if u == sink:
+                yield list(path_arcs)
+                cut = next((i for i, a in enumerate(path_arcs) if residual[a] <= 0), 0)
+                del path_arcs[cut:]
+                u = head[path_arcs[-1]] if path_arcs else source
+                continue
+            while current[u] < end[u]:
+                a = arcs[current[u]]
+                if residual[a] > 0 and level[head[a]] == level[u] + 1:
+                    break
+                current[u] += 1
+            if current[u] < end[u]:
+                a = arcs[current[u]]
+                path_arcs.append(a)
+                u = head[a]
+            elif u == source:
+                return
+            else:
+                u = tail[path_arcs.pop()]
+                current[u] += 1
+
+    # Smallest residual capacity along the path and the first arc attaining it
+    def bottleneck(self, path_arcs):
+        bottleneck_val = float('inf')
+        bottleneck_arc = None
+        for a in path_arcs:
+            if self.residual[a] < bottleneck_val:
+                bottleneck_val = self.residual[a]
+                bottleneck_arc = a
+        return bottleneck_val, (self.tail[bottleneck_arc], self.head[bottleneck_arc])
+
+    def push(self, path_arcs, value):
+        for a in path_arcs:
+            self.residual[a] -= value
+            self.residual[a ^ 1] += value
+
+    # Arcs BFS would take along a vertex path, for replaying a recorded run
+    def path_arcs(self, path):
+        arcs = []
+        for u, v in zip(path, path[1:]):
+            arcs.append(next(a for a in self.out_arcs(u) if self.head[a] == v and self.residual[a] > 0))
+        return arcs
+
+    # Vertices reachable from source in the residual network
+    def reachable(self, source):
+        visited = [False] * self.n
+        visited[source] = True
+        queue = deque([source])
+        head, residual = self.head, self.residual
+        while queue:
+            u = queue.popleft()
+            for a in self.out_arcs(u):
+                v = head[a]
+                if not visited[v] and residual[a] > 0:
+                    visited[v] = True
+                    queue.append(v)
+        return visited
+
+    # Flow carried by each input arc, as {(u, v): flow}
+    def arc_flows(self):
+        flows = {}
+        for a in range(0, len(self.residual), 2):
+            f = self.capacity[a] - self.residual[a]
+            if f:
+                flows[(self.tail[a], self.head[a])] = flows.get((self.tail[a], self.head[a]), 0) + f
+        return flows
+
+# Vertices with their numbers, drawn as one scatter like networkx's nodes
+def draw_vertices(ax, xy, node_color):
+    nodes = ax.scatter(xy[:, 0], xy[:, 1], s=300, c=colors(node_color, len(xy)), zorder=2)
+    label_points(ax, xy, [str(i) for i in range(len(xy))], ha='center', va='center', fontsize=12, zorder=3)
+    note_hidden(ax, vertex=len(xy))
+    ax.set_axis_off()
+    return nodes
+
+# Arc labels at the midpoints of their arcs, boxed like networkx edge labels
+def arc_label(ax, xy, arc, label, color, zorder=4):
+    u, v = arc
+    return ax.text(*((xy[u] + xy[v]) / 2), label, color=color, fontsize=10, ha='center', va='center',
+                   bbox=dict(boxstyle='round', ec='white', fc='white'), zorder=zorder)
+
+# Panel drawing any subset of a fixed set of arcs as one Quiver; arcs that
+# are not shown are transparent, and labels are only kept for small graphs.
+# Labels of opposite arcs share a midpoint, so they are stacked by arc
+# rather than by when they appeared, and a frame looks the same whichever
+# render worker draws it.
+class ArcPanel:
+    def __init__(self, ax, xy, node_color, font_color, arcs):
+        self.ax = ax
+        self.xy = xy
+        self.font_color = font_color
+        draw_vertices(ax, xy, node_color)
+        self.index = {arc: i for i, arc in enumerate(arcs)}
+        tails, heads = np.array(arcs, dtype=np.int64).reshape(-1, 2).T
+        self.arrows = Arrows(ax, xy[tails], xy[heads], HIDDEN, shrink_for(xy))
+        self.labeled = show_labels(len(arcs))
+        note_hidden(ax, arc=len(arcs))
+        self.arcs = {}
+        self.texts = {}
+
+    def update(self, arcs, full=True):
+        """arcs maps (u, v) -> (color, label), or None to hide the arc. With
+        full, arcs left out are hidden; otherwise they stay as they are."""
+        if full:
+            arcs = {**{arc: None for arc in self.arcs if arc not in arcs}, **arcs}
+        recolored = {}
+        for arc, shown in arcs.items():
+            before = self.arcs.get(arc)
+            if shown == before:
+                continue
+            recolored.setdefault(HIDDEN if shown is None else shown[0], []).append(self.index[arc])
+            if shown is None:
+                del self.arcs[arc]
+            else:
+                self.arcs[arc] = shown
+            if not self.labeled:
+                continue
+            if shown is None:
+                self.texts.pop(arc).remove()
+            elif before is None:
+                self.texts[arc] = arc_label(self.ax, self.xy, arc, shown[1], self.font_color,
+                                            4 + self.index[arc] / len(self.index))
+            elif before[1] != shown[1]:
+                self.texts[arc].set_text(shown[1])
+        for color, indices in recolored.items():
+            self.arrows.recolor(indices, color)
+
+# Four-panel figure built once per graph and updated in place per frame
+class FordFulkersonFigure:
+    def __init__(self, pos, original_edges, source, sink):
+        xy = points(pos)
+        self.pos = pos
+        self.source = source
+        self.sink = sink
+        self.fig = Figure(figsize=(14, 10))
+        FigureCanvasAgg(self.fig)
+        axs = self.fig.subplots(2, 2)
+        arcs = list(dict.fromkeys((u, v) for u, v, _ in original_edges))
+        tails, heads = np.array(arcs, dtype=np.int64).reshape(-1, 2).T
+        shrink = shrink_for(xy)
+
+        # Top Left - Original Graph with Capacities
+        ax_orig = axs[0, 0]
+        draw_vertices(ax_orig, xy, 'lightblue')
+        Arrows(ax_orig, xy[tails], xy[heads], 'black', shrink)
+        edge_labels = {(u, v): f"{w:.0f}" for u, v, w in original_edges}
+        if show_labels(len(edge_labels)):
+            for arc, label in edge_labels.items():
+                arc_label(ax_orig, xy, arc, label, 'red')
+        note_hidden(ax_orig, arc=len(edge_labels))
+        ax_orig.set_title("Original Graph with Capacities")
+
+        # Top Right - Min Cut Coloring
+        ax_cut = axs[0, 1]
+        self.node_colors = self.cut_colors(None)
+        self.cut_nodes = draw_vertices(ax_cut, xy, self.node_colors)
+        Arrows(ax_cut, xy[tails], xy[heads], 'black', shrink)
+        ax_cut.set_title("Min s-t Cut Coloring")
+
+        # Bottom Left - Residual Graph with BFS; residual arcs run either way
+        residual_arcs = list(dict.fromkeys(arcs + [(v, u) for u, v in arcs]))
+        self.residual = ArcPanel(axs[1, 0], xy, 'skyblue', 'magenta', residual_arcs)
+        axs[1, 0].set_title("Residual Graph with BFS")
+
+        # Bottom Right - Flow Graph
+        self.flow_panel = ArcPanel(axs[1, 1], xy, 'black', 'green', arcs)
+        self.ax_flow = axs[1, 1]
+
+        self.fig.tight_layout()
+
+        self.final = False
+        self.path_arcs = set()
+        self.bottleneck = None
+        self.discovered = set()
+
+    def cut_colors(self, reachable):
+        node_colors = []
+        for i in range(len(self.pos)):
+            if reachable is not None:
+                node_colors.append('green' if reachable[i] else 'red')
+            elif i == self.source:
                 node_colors.append('blue')
-            elif i == sink:
+            elif i == self.sink:
                 node_colors.append('red')
             else:
                 node_colors.append('gray')
-    nx.draw(G_cut, pos, ax=ax_cut, node_color=node_colors, with_labels=True, arrows=True)
-    ax_cut.set_title("Min s-t Cut Coloring")
-
-    # Bottom Left - Residual Graph with BFS
-    ax_res = axs[1, 0]
-    G_res = nx.DiGraph()
-    G_res.add_nodes_from(range(len(pos)))
-    labels = {}
-    for u in range(len(capacity)):
-        for v in range(len(capacity)):
-            res_cap = capacity[u][v] - flow[u][v]
-            if res_cap > 0:
-                G_res.add_edge(u, v)
-                labels[(u, v)] = f"{res_cap:.0f}"
-    colors = []
-    for u, v in G_res.edges():
-        if path and (u, v) in zip(path, path[1:]):
-            if bottleneck and (u, v) == bottleneck:
-                colors.append('red')
-            else:
-                colors.append('lime')
-        elif (u, v) in discovered_edges:
-            colors.append('cyan')
+        return node_colors
+
+    # How the residual panel shows an arc, or None while it has no capacity
+    def residual_arc(self, arc, res_cap):
+        if res_cap <= 0:
+            return None
+        if arc in self.path_arcs:
+            color = 'red' if self.bottleneck and arc == self.bottleneck else 'lime'
+        elif arc in self.discovered:
+            color = 'cyan'
+        else:
+            color = 'blue'
+        return color, f"{res_cap:.0f}"
+
+    # changes (the SnapshotStore delta since the frame drawn before) limits
+    # the work to the arcs it names plus those whose highlight changed;
+    # None redraws everything from residual_arcs and flow_arcs
+    def update(self, residual_arcs, flow_arcs, path, bottleneck, reachable, discovered_edges, is_final, total_flow,
+               changes=None):
+        full = changes is None
+        if full or is_final != self.final:
+            node_colors = self.cut_colors(reachable if is_final else None)
+            if node_colors != self.node_colors:
+                self.cut_nodes.set_facecolor(node_colors)
+                self.node_colors = node_colors
+            self.final = is_final
+
+        path_arcs = set(zip(path, path[1:])) if path else set()
+        if full:
+            touched = residual_arcs
+            flows = flow_arcs
         else:
-            colors.append('blue')
-    nx.draw(G_res, pos, ax=ax_res, edge_color=colors, with_labels=True, node_color='skyblue', arrows=True)
-    nx.draw_networkx_edge_labels(G_res, pos, edge_labels=labels, ax=ax_res, font_color='magenta')
-    ax_res.set_title("Residual Graph with BFS")
-
-    # Bottom Right - Flow Graph
-    ax_flow = axs[1, 1]
-    G_flow = nx.DiGraph()
-    G_flow.add_nodes_from(range(len(pos)))
-    labels = {}
-    for u, v, _ in original_edges:
-        if flow[u][v] > 0:
-            G_flow.add_edge(u, v)
-            labels[(u, v)] = f"{flow[u][v]:.0f}"
-    nx.draw(G_flow, pos, ax=ax_flow, node_color='black', with_labels=True, arrows=True, edge_color='green')
-    nx.draw_networkx_edge_labels(G_flow, pos, edge_labels=labels, ax=ax_flow, font_color='green')
-    ax_flow.set_title(f"Flow Graph -> Max Flow = {total_flow:.1f}")
-
-    plt.tight_layout()
-    path = os.path.join(IMG_DIR, f"frame_{frame_idx:03d}.png")
-    plt.savefig(path)
-    plt.close()
+            touched = set(changes.get("residual_arcs", ())) | path_arcs | self.path_arcs
+            if discovered_edges is not self.discovered:
+                touched |= discovered_edges ^ self.discovered
+            flows = changes.get("flow_arcs", {})
+        self.path_arcs, self.bottleneck, self.discovered = path_arcs, bottleneck, discovered_edges
+        self.residual.update({arc: self.residual_arc(arc, residual_arcs.get(arc, 0)) for arc in touched}, full)
+
+        self.flow_panel.update({arc: ('green', f"{f:.0f}") if f > 0 else None for arc, f in flows.items()}, full)
+        self.ax_flow.set_title(f"Flow Graph -> Max Flow = {total_flow:.1f}")
+
+# Draw frame with all four subplots; residual_arcs and flow_arcs map (u, v) to
+# residual capacity and flow (arcs at 0 are not drawn), reachable is only
+# given on the final frame
+def draw_frame(pos, original_edges, residual_arcs, flow_arcs, path, bottleneck, reachable, discovered_edges, frame_idx, total_flow, source, sink,
+               changes=None, img_dir=IMG_DIR):
+    figure = persistent_figure(FordFulkersonFigure, pos, original_edges, source, sink)
+    figure.update(residual_arcs, flow_arcs, path, bottleneck, reachable, discovered_edges,
+                  reachable is not None, total_flow, changes)
+    return save_frame(figure.fig, os.path.join(img_dir, f"frame_{frame_idx:03d}.png"))
 
 # Compile images into video using ffmpeg
 def save_video():
     output_path = os.path.join(VID_DIR, VIDEO_NAME)
-    subprocess.run([
-        "ffmpeg", "-y", "-framerate", "0.5",
-        "-i", os.path.join(IMG_DIR, "frame_%03d.png"),
-        "-c:v", "libx264", "-pix_fmt", "yuv420p", output_path
-    ])
+    with phase("ffmpeg"):
+        subprocess.run([
+            "ffmpeg", "-y", "-framerate", "0.5",
+            "-i", os.path.join(IMG_DIR, "frame_%03d.png"),
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", output_path
+        ])
     print(f"🎞️  Video saved to: {output_path}")
 
+# Residual and flow arcs per vertex pair, updated in O(path length) per
+# augmentation so frames never rescan the network. Capacities of parallel
+# arcs are merged, which is how the residual panel draws them. augment
+# returns the entries it changed, with 0 for arcs that emptied.
+class ResidualTracker:
+    def __init__(self, graph):
+        csr = graph["csr"]
+        n = len(graph["vertices"])
+        tails = np.repeat(np.arange(n), np.diff(csr["offsets"])).tolist()
+        self.capacity = dict(zip(zip(tails, csr["targets"].tolist()), csr["weights"].tolist()))
+        self.net_flow = {}
+        self.residual_arcs = {arc: c for arc, c in self.capacity.items() if c > 0}
+        self.flow_arcs = {}
+
+    def augment(self, path, value):
+        residual_changes, flow_changes = {}, {}
+        for u, v in zip(path, path[1:]):
+            for arc, delta in (((u, v), value), ((v, u), -value)):
+                f = self.net_flow.get(arc, 0) + delta
+                self.net_flow[arc] = f
+                res_cap = self.capacity.get(arc, 0) - f
+                if res_cap > 0:
+                    self.residual_arcs[arc] = res_cap
+                else:
+                    self.residual_arcs.pop(arc, None)
+                residual_changes[arc] = max(res_cap, 0)
+                if arc in self.capacity:
+                    if f > 0:
+                        self.flow_arcs[arc] = f
+                    else:
+                        self.flow_arcs.pop(arc, None)
+                    flow_changes[arc] = max(f, 0)
+        return {"residual_arcs": residual_changes, "flow_arcs": flow_changes}
+
+# Push the bottleneck along one augmenting path, reporting it as
+# edmonds_karp does; returns the new total flow
+def _augment(network, path, path_arcs, discovered, total_flow, on_step, trace):
+    bottleneck_val, bottleneck = network.bottleneck(path_arcs)
+
+    if trace is not None:
+        for v in path:
+            trace.emit(PATH_VERTEX, v)
+        trace.emit(AUGMENT, bottleneck[0], bottleneck[1], bottleneck_val)
+    if on_step is not None:
+        on_step("found", path, bottleneck, bottleneck_val, discovered, total_flow)
+
+    network.push(path_arcs, bottleneck_val)
+    total_flow += bottleneck_val
+    if on_step is not None:
+        on_step("augmented", path, bottleneck, bottleneck_val, discovered, total_flow)
+    return total_flow
+
+def _report_cut(reach, trace):
+    if trace is not None:
+        for v, reachable in enumerate(reach):
+            if reachable:
+                trace.emit(REACHABLE, v)
+    return reach
+
+# Edmonds-Karp on a ResidualNetwork; on_step(stage, path, bottleneck, value, discovered, total_flow)
+# fires with stage "found" before each augmentation and "augmented" after it
+def edmonds_karp(network, source, sink, on_step=None, trace=None):
+    total_flow = 0
+    while True:
+        path, path_arcs, discovered = network.bfs(source, sink)
+        if trace is not None:
+            for u, v in discovered:
+                trace.emit(DISCOVER, u, v)
+        if not path:
+            break
+        total_flow = _augment(network, path, path_arcs, discovered, total_flow, on_step, trace)
+
+    return total_flow, _report_cut(network.reachable(source), trace)
+
+# Dinic on a ResidualNetwork, with the same callbacks and result as
+# edmonds_karp. Each phase builds the BFS level graph (a LEVEL_GRAPH event
+# and its arcs as DISCOVER events; on_step sees them as the discovered
+# arcs) and augments along it until it is blocked. There are at most n
+# phases, so the BFS runs far less often than once per augmentation.
+def dinic(network, source, sink, on_step=None, trace=None):
+    total_flow = 0
+    while True:
+        level, discovered = network.levels(source, sink)
+        if level[sink] < 0:
+            break
+        if trace is not None:
+            trace.emit(LEVEL_GRAPH, value=level[sink])
+            for u, v in discovered:
+                trace.emit(DISCOVER, u, v)
+        for path_arcs in network.blocking_paths(source, sink, level):
+            path = [source] + [network.head[a] for a in path_arcs]
+            total_flow = _augment(network, path, path_arcs, discovered, total_flow, on_step, trace)
+
+    # The last BFS was not cut short, so its levels are the source side
+    return total_flow, _report_cut([l >= 0 for l in level], trace)
+
+# Highest-label push-relabel on a ResidualNetwork. Phase one moves excess
+# towards the sink, always from an active vertex with the highest label
+# below n. Labels are reset to exact sink distances by a global relabel
+# (backward BFS from the sink) at the start and after every
+# GLOBAL_RELABEL_EVERY * n relabels. When a relabel empties a label
+# (the gap heuristic), every vertex above it is lifted to n at once.
+# The sink then holds the maximum flow value. Phase two sends the excess
+# still held by other vertices back to the source, only over reverse arcs
+# (cancelling flow that reached them), which turns the preflow into a flow.
+#
+# Pushes go to on_step as stage "push" (path [u, v]) and the end of each
+# discharge of a vertex (the initial saturation of the source arcs being
+# the source's) as "discharge" (path [u]), with the flow into the sink as
+# total_flow.
+class PushRelabel:
+    def __init__(self, network, source, sink, on_step=None, trace=None):
+        self.network = network
+        self.source = source
+        self.sink = sink
+        self.on_step = on_step
+        self.trace = trace
+        n = network.n
+        self.n = n
+        self.height = [0] * n
+        self.excess = [0] * n
+        self.current = network.offsets[:-1]
+        self.end = network.offsets[1:]
+        # Vertices per label and active vertices per label, for labels below n
+        self.count = [0] * n
+        self.buckets = [[] for _ in range(n)]
+        self.top = 0
+        # Phase two only uses reverse arcs (odd arc numbers)
+        self.arc_mask = 0
+
+    def push(self, a, amount):
+        network = self.network
+        u, v = network.tail[a], network.head[a]
+        network.residual[a] -= amount
+        network.residual[a ^ 1] += amount
+        self.excess[u] -= amount
+        self.excess[v] += amount
+        if self.trace is not None:
+            self.trace.emit(PUSH, u, v, amount)
+        if self.on_step is not None:
+            self.on_step("push", [u, v], None, amount, set(), self.excess[self.sink])
+
+    # Lowest label reachable over a residual arc, plus one
+    def relabel(self, u):
+        network = self.network
+        arcs, head, residual, height, mask = network.arcs, network.head, network.residual, self.height, self.arc_mask
+        new = min(height[head[a]] for a in arcs[network.offsets[u]:self.end[u]] if residual[a] > 0 and a & mask == mask) + 1
+        self.current[u] = network.offsets[u]
+        return new
+
+    def report_relabel(self, u):
+        if self.trace is None:
+            return
+        network = self.network
+        admissible = {(u, network.head[a]) for a in network.out_arcs(u)
+                      if network.residual[a] > 0 and a & self.arc_mask == self.arc_mask
+                      and self.height[network.head[a]] == self.height[u] - 1}
+        for arc in admissible:
+            self.trace.emit(DISCOVER, *arc)
+        self.trace.emit(RELABEL, u, value=self.height[u])
+
+    def discharged(self, u):
+        if self.trace is not None:
+            self.trace.emit(DISCHARGE, u)
+        if self.on_step is not None:
+            self.on_step("discharge", [u], None, 0, set(), self.excess[self.sink])
+
+    # Backward BFS over residual arcs, from the sink in phase one and from
+    # the source (offset by n) in phase two; vertices not reached get ceiling
+    def distances_to(self, target, base, ceiling):
+        network = self.network
+        height, head, residual, mask = self.height, network.head, network.residual, self.arc_mask
+        for v in range(self.n):
+            height[v] = ceiling
+        height[target] = base
+        queue = deque([target])
+        while queue:
+            v = queue.popleft()
+            for a in network.out_arcs(v):
+                u = head[a]
+                if height[u] == ceiling and residual[a ^ 1] > 0 and (a ^ 1) & mask == mask:
+                    height[u] = height[v] + 1
+                    queue.append(u)
+        self.current = network.offsets[:-1]
+
+    def global_relabel(self):
+        n = self.n
+        self.distances_to(self.sink, 0, n)
+        self.height[self.source] = n
+        self.count = [0] * n
+        self.buckets = [[] for _ in range(n)]
+        self.top = 0
+        for v, h in enumerate(self.height):
+            if h < n:
+                self.count[h] += 1
+                if self.excess[v] > 0 and v != self.sink:
+                    self.buckets[h].append(v)
+                    self.top = max(self.top, h)
+        if self.trace is not None:
+            self.trace.emit(GLOBAL_RELABEL, value=sum(self.count))
+
+    # Lift u and every vertex labeled above the emptied label to n
+    def gap(self, u, label):
+        n, height = self.n, self.height
+        for v in range(n):
+            if label < height[v] < n:
+                self.count[height[v]] -= 1
+                height[v] = n
+        height[u] = n
+        for h in range(label + 1, n):
+            self.buckets[h] = []
+        self.top = label
+        if self.trace is not None:
+            self.trace.emit(GAP, u, value=label)
+
+    def saturate_source(self):
+        network = self.network
+        for a in network.out_arcs(self.source):
+            if network.residual[a] > 0:
+                self.push(a, network.residual[a])
+
+    def first_phase(self):
+        n, source, sink = self.n, self.source, self.sink
+        network = self.network
+        arcs, head, residual = network.arcs, network.head, network.residual
+        excess, end = self.excess, self.end
+        self.height[source] = n
+        self.saturate_source()
+        self.discharged(source)
+        self.global_relabel()
+        relabels = 0
+        while self.top >= 0:
+            bucket = self.buckets[self.top]
+            if not bucket:
+                self.top -= 1
+                continue
+            u = bucket.pop()
+            # A global relabel replaces the current-arc list
+            height, current = self.height, self.current
+            while excess[u] > 0:
+                if current[u] == end[u]:
+                    old = height[u]
+                    self.count[old] -= 1
+                    if self.count[old] == 0:
+                        self.gap(u, old)
+                        break
+                    height[u] = self.relabel(u)
+                    relabels += 1
+                    self.report_relabel(u)
+                    if height[u] >= n:
+                        break
+                    self.count[height[u]] += 1
+                    self.top = height[u]
+                    continue
+                a = arcs[current[u]]
+                v = head[a]
+                if residual[a] > 0 and height[u] == height[v] + 1:
+                    if excess[v] == 0 and v != sink and v != source:
+                        self.buckets[height[v]].append(v)
+                    self.push(a, min(excess[u], residual[a]))
+                else:
+                    current[u] += 1
+            self.discharged(u)
+            if relabels >= GLOBAL_RELABEL_EVERY * n:
+                relabels = 0
+                self.global_relabel()
+
+    # Vertices above the lowest label no vertex holds cannot reach the sink
+    # and no residual arc leaves them, so they are the source side of a
+    # minimum cut (source labeled n, sink 0)
+    def cut(self):
+        labels = set(self.height)
+        gap = next(h for h in range(1, self.n + 1) if h not in labels)
+        return [h > gap for h in self.height]
+
+    def second_phase(self):
+        n, source, sink = self.n, self.source, self.sink
+        network = self.network
+        arcs, head, residual = network.arcs, network.head, network.residual
+        excess, end = self.excess, self.end
+        self.arc_mask = 1
+        self.distances_to(source, n, 2 * n)
+        height, current = self.height, self.current
+        active = deque(v for v in range(n) if excess[v] > 0 and v != source and v != sink)
+        while active:
+            u = active.popleft()
+            while excess[u] > 0:
+                if current[u] == end[u]:
+                    height[u] = self.relabel(u)
+                    self.report_relabel(u)
+                    continue
+                a = arcs[current[u]]
+                v = head[a]
+                if a & 1 and residual[a] > 0 and height[u] == height[v] + 1:
+                    if excess[v] == 0 and v != source and v != sink:
+                        active.append(v)
+                    self.push(a, min(excess[u], residual[a]))
+                else:
+                    current[u] += 1
+            self.discharged(u)
+
+    def run(self):
+        self.first_phase()
+        reach = self.cut()
+        self.second_phase()
+        return self.excess[self.sink], _report_cut(reach, self.trace)
+
+def push_relabel(network, source, sink, on_step=None, trace=None):
+    return PushRelabel(network, source, sink, on_step, trace).run()
+
+# Max-flow solvers that take a ResidualNetwork and report steps to on_step/trace
+MAX_FLOW_METHODS = {
+    "edmonds-karp": edmonds_karp,
+    "dinic": dinic,
+    "push-relabel": push_relabel,
+}
+
+# Records augmenting-path steps as SnapshotStore frames. Residual and flow
+# arcs are the state; the path, bottleneck, discovered arcs and flow value
+# are each frame's own arguments. Live runs pass step as on_step and
+# replays feed it the recorded events, so both produce the same frames.
+class FordFulkersonSnapshots:
+    def __init__(self, graph):
+        self.tracker = ResidualTracker(graph)
+        self.store = SnapshotStore(residual_arcs=self.tracker.residual_arcs, flow_arcs={})
+        self.record(None, None, None, set(), 0)
+        # Changes and arcs of the pushes since the last discharge, and the
+        # flow value of the last frame
+        self.pushes = {}
+        self.pushed = set()
+        self.total_flow = 0
+
+    def record(self, changes, path, bottleneck, discovered, total_flow, key_event=False, reach=None):
+        self.store.record(changes, key_event, path=path, bottleneck=bottleneck, reachable=reach,
+                          discovered_edges=discovered, total_flow=total_flow)
+        self.total_flow = total_flow
+
+    # Four frames per augmenting path, the fourth (the pushed flow) being
+    # the key event. Pushes are gathered into one frame per discharge that
+    # pushed anything, with the arcs pushed along drawn as discovered; it is
+    # a key event when flow reached the sink.
+    def step(self, stage, path, bottleneck, value, discovered, total_flow):
+        if stage == "found":
+            self.record(None, None, None, discovered, total_flow)
+            self.record(None, path, None, discovered, total_flow)
+            self.record(None, path, bottleneck, discovered, total_flow)
+        elif stage == "augmented":
+            self.record(self.tracker.augment(path, value), path, None, discovered, total_flow, key_event=True)
+        elif stage == "push":
+            for name, values in self.tracker.augment(path, value).items():
+                self.pushes.setdefault(name, {}).update(values)
+            self.pushed.add(tuple(path))
+        elif stage == "discharge" and self.pushed:
+            self.record(self.pushes, path, None, self.pushed, total_flow, key_event=total_flow != self.total_flow)
+            self.pushes, self.pushed = {}, set()
+
+    def finish(self, reach, total_flow):
+        self.record(None, None, None, set(), total_flow, reach=reach)
+        return self.store
+
+def _renderer(graph, source, sink, workers, video_path, img_dir):
+    original_edges = [(u, v, w) for u, v, w in graph["edges"]]
+    return FrameRenderer(draw_frame, static_kwargs={
+        "pos": graph["vertices"], "original_edges": original_edges,
+        "source": source, "sink": sink}, workers=workers, video_path=video_path, frame_key="frame_idx",
+        img_dir=img_dir)
+
+# Run a MAX_FLOW_METHODS solver once, recording its steps, then render the
+# frames a frame budget keeps
+def ford_fulkerson_with_visualization(graph, source, sink, workers=None, video_path=None, max_frames=FRAME_BUDGET,
+                                      method=MAX_FLOW_METHOD, img_dir=IMG_DIR):
+    network = ResidualNetwork.from_graph(graph)
+    snapshots = FordFulkersonSnapshots(graph)
+    with phase("algorithm"):
+        total_flow, reach = MAX_FLOW_METHODS[method](network, source, sink, on_step=snapshots.step, trace=counted())
+    store = snapshots.finish(reach, total_flow)
+
+    with _renderer(graph, source, sink, workers, video_path, img_dir) as renderer:
+        renderer.render_store(store, "frame_idx", store.sample(max_frames), "changes")
+    return total_flow, network.arc_flows(), reach
+
+# Run a max-flow method without rendering, logging its events to trace_path
+def record_trace(graph, trace_path, source, sink, method=MAX_FLOW_METHOD):
+    network = ResidualNetwork.from_graph(graph)
+    with TraceWriter(trace_path, "ford_fulkerson", n=len(graph["vertices"]), source=source, sink=sink,
+                     method=method) as trace:
+        return MAX_FLOW_METHODS[method](network, source, sink, trace=trace)
+
+# Render frames [start, stop) of a recorded run; same frames as a live run.
+# Dinic traces keep one level graph's arcs as discovered for a whole phase;
+# push-relabel traces are drawn one discharge at a time.
+def replay_trace(graph, trace_path, start=0, stop=None, workers=None, video_path=None, max_frames=FRAME_BUDGET,
+                 img_dir=IMG_DIR):
+    header, events = read_trace(trace_path)
+    source, sink = header["source"], header["sink"]
+    frames = FordFulkersonSnapshots(graph)
+
+    total_flow = 0
+    discovered, path, reach = set(), [], [False] * header["n"]
+    phased = False
+    for kind, u, v, value in iter_events(events):
+        if kind == LEVEL_GRAPH:
+            discovered, phased = set(), True
+        elif kind == DISCOVER:
+            discovered.add((u, v))
+        elif kind == PATH_VERTEX:
+            path.append(u)
+        elif kind == AUGMENT:
+            frames.step("found", path, (u, v), value, discovered, total_flow)
+            total_flow += value
+            frames.step("augmented", path, (u, v), value, discovered, total_flow)
+            path = []
+            if not phased:
+                discovered = set()
+        elif kind == PUSH:
+            if v == sink:
+                total_flow += value
+            frames.step("push", [u, v], None, value, set(), total_flow)
+        elif kind == RELABEL:
+            discovered = set()
+        elif kind == DISCHARGE:
+            frames.step("discharge", [u], None, 0, set(), total_flow)
+        elif kind == REACHABLE:
+            reach[u] = True
+
+    store = frames.finish(reach, total_flow)
+
+    with _renderer(graph, source, sink, workers, video_path, img_dir) as renderer:
+        renderer.render_store(store, "frame_idx", store.sample(max_frames, start, stop), "changes")
+    return total_flow, dict(frames.tracker.flow_arcs), reach
+
 # Main driver
-if __name__ == "__main__":
+# Batch mode: solve one graph file and optionally render it
+def solve_graph(path, args):
+    graph = load_graph(path, directed=True)
+    n = len(graph["vertices"])
+    source = vertex_argument(args.source, n, 0, "--source")
+    sink = vertex_argument(args.sink, n, n - 1, "--sink")
+    if source == sink:
+        raise ValueError("source and sink must be different vertices")
+
+    if args.render == "none":
+        network = ResidualNetwork.from_graph(graph)
+        with phase("algorithm"):
+            total_flow, reach = MAX_FLOW_METHODS[args.method](network, source, sink, trace=counted())
+        flows = network.arc_flows()
+    else:
+        img_dir, video_path = prepare_output(args, path)
+        total_flow, flows, reach = ford_fulkerson_with_visualization(
+            graph, source, sink, workers=args.workers, video_path=video_path, max_frames=frame_budget(args),
+            method=args.method, img_dir=img_dir)
+    return {"source": source, "sink": sink, "max_flow": total_flow, "flows": flows,
+            "source_side": [v for v, r in enumerate(reach) if r]}
+
+def interactive():
     setup_directories()
     graph = run_gui_and_load_graph()
     pos = graph["vertices"]
-    edges = graph["edges"]
-    original_edges = [(u, v, w) for u, v, w in edges]
-    n = len(pos)
-    capacity = [[0]*n for _ in range(n)]
-    flow = [[0]*n for _ in range(n)]
-    for u, v, w in edges:
-        capacity[u][v] = w
 
     source = 0
     sink = len(pos) - 1
@@ -174,47 +857,26 @@ if __name__ == "__main__":
         print(f"v{i}: ({x}, {y})")
     print(f"Source (s): v{source}, Sink (t): v{sink}")
 
-    frame = 0
-    total_flow = 0
+    video_path = os.path.join(VID_DIR, VIDEO_NAME) if STREAM_VIDEO else None
+    total_flow, _, _ = cached_result(default_cache(), run_key(__file__, ["graph.json"], method=MAX_FLOW_METHOD),
+                                     lambda: ford_fulkerson_with_visualization(graph, source, sink, video_path=video_path),
+                                     lambda: rendered_files(IMG_DIR, video_path), FRAME_BUDGET, video_path)
+    print(f"Max flow: {total_flow}")
+    if video_path is None:
+        save_video()
 
-    reach = get_reachable(capacity, flow, source)
-    final_frame_idx = -1
-    draw_frame(pos, capacity, flow, original_edges, None, None, reach, set(), frame, total_flow, source, sink, final_frame_idx)
-    frame += 1
+def main(argv=None):
+    parser = build_parser("Maximum flow (augmenting paths or push-relabel) with residual network frames.", sink=True)
+    parser.add_argument("--method", choices=tuple(MAX_FLOW_METHODS), default=MAX_FLOW_METHOD,
+                        help="one shortest augmenting path per BFS (edmonds-karp), "
+                             "a blocking flow per BFS level graph (dinic), "
+                             "or highest-label push-relabel (push-relabel)")
+    args = parser.parse_args(argv)
+    if not args.graphs:
+        with profile_run():
+            interactive()
+        return
+    sys.exit(run_batch(args, solve_graph))
 
-    while True:
-        path, discovered = bfs(capacity, flow, source, sink)
-        if not path:
-            break
-
-        reach = get_reachable(capacity, flow, source)
-        draw_frame(pos, capacity, flow, original_edges, None, None, reach, discovered, frame, total_flow, source, sink, -1)
-        frame += 1
-
-        draw_frame(pos, capacity, flow, original_edges, path, None, reach, discovered, frame, total_flow, source, sink, -1)
-        frame += 1
-
-        bottleneck_val = float('inf')
-        bottleneck = None
-        for i in range(len(path) - 1):
-            u, v = path[i], path[i+1]
-            if capacity[u][v] - flow[u][v] < bottleneck_val:
-                bottleneck_val = capacity[u][v] - flow[u][v]
-                bottleneck = (u, v)
-
-        draw_frame(pos, capacity, flow, original_edges, path, bottleneck, reach, discovered, frame, total_flow, source, sink, -1)
-        frame += 1
-
-        for i in range(len(path) - 1):
-            u, v = path[i], path[i+1]
-            flow[u][v] += bottleneck_val
-
-        total_flow += bottleneck_val
-        reach = get_reachable(capacity, flow, source)
-        draw_frame(pos, capacity, flow, original_edges, path, None, reach, discovered, frame, total_flow, source, sink, -1)
-        frame += 1
-
-    final_frame_idx = frame
-    reach = get_reachable(capacity, flow, source)
-    draw_frame(pos, capacity, flow, original_edges, None, None, reach, set(), frame, total_flow, source, sink, final_frame_idx)
-    save_video()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+import os
+import math
+import pickle
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from instrumentation import count, phase
+import result_cache
+
+# Number of render processes; 1 draws every frame inline in the solver loop
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", "1"))
+# Pipe raw frames into ffmpeg instead of writing PNGs to the image directory
+STREAM_VIDEO = os.environ.get("STREAM_VIDEO", "0") == "1"
+# Most frames a run may draw (0: no limit) when --max-frames is not given
+FRAME_BUDGET = int(os.environ.get("FRAME_BUDGET", "0")) or None
+# Frames per second of the videos
+VIDEO_FRAMERATE = 0.5
+
+_worker_draw = None
+_capture = False
+_figures = {}
+# CachedRun frames are reused from, and the cache key of the frame being drawn
+_cached = None
+_cache_key = None
+
+def _init_worker(draw_fn, static_args, static_kwargs, capture, cached):
+    global _worker_draw, _capture, _cached
+    import matplotlib
+    matplotlib.use("Agg")
+    _worker_draw = partial(draw_fn, *static_args, **static_kwargs)
+    _capture = capture
+    _cached = cached
+
+def _keyed_draw(draw, key, *args, **kwargs):
+    global _cache_key
+    _cache_key = key
+    try:
+        return draw(*args, **kwargs)
+    finally:
+        _cache_key = None
+
+def _render_payload(payload):
+    args, kwargs, key = pickle.loads(payload)
+    return [_keyed_draw(_worker_draw, key, *args, **kwargs)]
+
+def _render_run(payload):
+    state, run, frame_key, delta_key, number = pickle.loads(payload)
+    results = []
+    for i, (changes, args, key) in enumerate(run):
+        for name, values in changes.items():
+            state[name].update(values)
+        extra = {frame_key: number}
+        if delta_key is not None:
+            extra[delta_key] = changes if i else None
+        results.append(_keyed_draw(_worker_draw, key, **state, **args, **extra))
+        number += 1
+    return results
+
+def save_frame(fig, path):
+    """Write fig to path, or return its raw RGBA pixels when streaming video.
+
+    draw_frame implementations return this value so FrameRenderer can hand
+    captured frames to ffmpeg in frame order. Under a result_cache run, a
+    PNG drawn before from the same inputs is copied to path instead.
+    """
+    with phase("savefig"):
+        if not _capture:
+            if _cache_key is not None and _cached.restore_frame(_cache_key, path):
+                return None
+            fig.savefig(path)
+            if _cache_key is not None:
+                _cached.store_frame(_cache_key, path)
+            return None
+        fig.canvas.draw()
+        width, height = fig.canvas.get_width_height(physical=True)
+        return width, height, bytes(fig.canvas.buffer_rgba())
+
+def rendered_files(img_dir, video_path=None):
+    """Files a run wrote: its streamed video, or the frames in img_dir."""
+    if video_path is not None:
+        return [video_path]
+    return [os.path.join(img_dir, name) for name in sorted(os.listdir(img_dir))]
+
+def persistent_figure(figure_cls, *inputs):
+    """Return this process's figure_cls(*inputs), building it only once.
+
+    Scripts keep one figure per run and mutate its artists between frames.
+    The figure is rebuilt when called with different input objects (a new
+    graph), so batch runs never draw onto a stale layout.
+    """
+    cached = _figures.get(figure_cls)
+    if cached is None or len(cached[0]) != len(inputs) or \
+            not all(_same_input(a, b) for a, b in zip(cached[0], inputs)):
+        cached = (inputs, figure_cls(*inputs))
+        _figures[figure_cls] = cached
+    return cached[1]
+
+def _same_input(a, b):
+    if isinstance(a, (int, float, str)):
+        return a == b
+    return a is b
+
+class VideoStream:
+    """Encodes raw RGBA frames by writing them to an ffmpeg process's stdin.
+
+    ffmpeg is started on the first frame, once the canvas size is known.
+    Nothing touches disk except the output video, and there is no limit on
+    the number of frames.
+    """
+
+    def __init__(self, output_path, framerate=VIDEO_FRAMERATE):
+        self.output_path = output_path
+        self.framerate = framerate
+        self.proc = None
+        self.size = None
+
+    def write(self, frame):
+        width, height, data = frame
+        if self.proc is None:
+            self.size = (width, height)
+            self.proc = subprocess.Popen([
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-f", "rawvideo", "-pix_fmt", "rgba",
+                "-s", f"{width}x{height}", "-framerate", str(self.framerate),
+                "-i", "-",
+                "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                "-c:v", "libx264", "-pix_fmt", "yuv420p", self.output_path
+            ], stdin=subprocess.PIPE)
+        elif (width, height) != self.size:
+            raise ValueError(f"frame size changed from {self.size} to {(width, height)}")
+        with phase("ffmpeg"):
+            self.proc.stdin.write(data)
+
+    def close(self):
+        if self.proc is None:
+            return
+        with phase("ffmpeg"):
+            self.proc.stdin.close()
+            status = self.proc.wait()
+        if status != 0:
+            raise RuntimeError(f"ffmpeg exited with status {self.proc.returncode}")
+        self.proc = None
+        print(f"🎞️  Video saved to: {self.output_path}")
+
+    def abort(self):
+        """Stop ffmpeg without finishing the video."""
+        if self.proc is not None:
+            self.proc.kill()
+            self.proc.wait()
+            self.proc = None
+
+class FrameRenderer:
+    """Runs a script's draw_frame inline or across a pool of processes.
+
+    Arguments that stay the same for the whole run (the graph, positions,
+    capacities) go in static_args/static_kwargs and are shipped to each
+    worker once. Per-frame arguments are pickled at submit time, so the
+    caller may keep mutating its dicts after submitting. Frame numbers are
+    chosen by the caller, so output files are identical to a serial run.
+
+    render_store() draws the frames of a SnapshotStore instead; workers are
+    then sent one state copy per run of frames plus that run's deltas.
+
+    When video_path is given, frames are not written as PNGs; each
+    draw_frame returns its pixels and they are streamed to ffmpeg in
+    frame order through a VideoStream.
+
+    With img_dir, draw_fn is also called with img_dir=<folder>, the folder
+    to write its PNG frames to. It is shipped to the workers like the
+    static arguments rather than read from module state, which workers
+    started by spawn or forkserver would not share.
+
+    PNG frames drawn inside a result_cache.cached_run are cached under a
+    key of the run, the scalar static arguments (not img_dir) and the
+    frame's index in its SnapshotStore, and reused from there. Frames
+    handed to submit() are keyed on their own arguments except frame_key
+    (its number) instead.
+
+    Under a Profiler, inline draws are timed as "draw_frame" (savefig
+    included), waits on the pool as "render_wait", and every frame handed
+    on counts towards "frames".
+    """
+
+    def __init__(self, draw_fn, static_args=(), static_kwargs=None, workers=None,
+                 video_path=None, framerate=VIDEO_FRAMERATE, frame_key=None, img_dir=None):
+        global _capture, _cached
+        static_kwargs = static_kwargs or {}
+        self.static_inputs = [a for a in (*static_args, *static_kwargs.values()) if isinstance(a, (int, float, str))]
+        if img_dir is not None:
+            static_kwargs = dict(static_kwargs, img_dir=img_dir)
+        self.workers = RENDER_WORKERS if workers is None else workers
+        self.draw = partial(draw_fn, *static_args, **static_kwargs)
+        self.video = VideoStream(video_path, framerate) if video_path else None
+        _capture = self.video is not None
+        self.frame_key = frame_key
+        _cached = None if _capture else result_cache.active()
+        self.pool = None
+        self.pending = deque()
+        if self.workers > 1:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(draw_fn, static_args, static_kwargs, _capture, _cached),
+            )
+
+    def _cache_key(self, *inputs):
+        return None if _cached is None else _cached.frame_key(self.static_inputs, *inputs)
+
+    def submit(self, *args, **kwargs):
+        key = self._cache_key(args, {k: v for k, v in kwargs.items() if k != self.frame_key})
+        if self.pool is None:
+            with phase("draw_frame"):
+                frame = _keyed_draw(self.draw, key, *args, **kwargs)
+            self._emit([frame])
+            return
+        payload = pickle.dumps((args, kwargs, key), protocol=pickle.HIGHEST_PROTOCOL)
+        self._queue(_render_payload, payload)
+
+    def render_store(self, store, frame_key, indices=None, delta_key=None):
+        """Draw the frames of a SnapshotStore at indices (default all), numbered from 0.
+
+        Each frame calls draw_fn with the state dicts and the frame's
+        recorded arguments as keywords, plus frame_key=<number>. With
+        delta_key, draw_fn also gets delta_key=<changes since the frame this
+        process drew before it>, so its figure can redraw only those; it is
+        None for the first frame of a process's run, which has to be drawn
+        from the full state.
+        """
+        indices = range(len(store)) if indices is None else indices
+        if self.pool is None:
+            previous = None
+            for number, (i, (state, args)) in enumerate(zip(indices, store.frames(indices))):
+                extra = {frame_key: number}
+                if delta_key is not None:
+                    extra[delta_key] = None if previous is None else store.changes(previous + 1, i)
+                    previous = i
+                with phase("draw_frame"):
+                    frame = _keyed_draw(self.draw, self._cache_key(i), **state, **args, **extra)
+                self._emit([frame])
+            return
+        number = 0
+        for state, run in store.runs(indices, max_frames=math.ceil(len(indices) / (4 * self.workers))):
+            run = [(changes, args, self._cache_key(indices[number + i])) for i, (changes, args) in enumerate(run)]
+            payload = pickle.dumps((state, run, frame_key, delta_key, number), protocol=pickle.HIGHEST_PROTOCOL)
+            self._queue(_render_run, payload)
+            number += len(run)
+
+    def _queue(self, fn, payload):
+        # Bound the backlog so snapshots never pile up faster than they render
+        if len(self.pending) >= 4 * self.workers:
+            self._emit(self._result())
+        self.pending.append(self.pool.submit(fn, payload))
+
+    def _result(self):
+        with phase("render_wait"):
+            return self.pending.popleft().result()
+
+    def _emit(self, frames):
+        count("frames", len(frames))
+        if self.video is None:
+            return
+        for frame in frames:
+            if frame is not None:
+                self.video.write(frame)
+
+    def close(self):
+        global _capture, _cached
+        try:
+            while self.pending:
+                self._emit(self._result())
+            if self.video is not None:
+                self.video.close()
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+            _capture = False
+            _cached = None
+
+    def abort(self):
+        """Drop the frames not drawn yet and stop the workers and ffmpeg."""
+        global _capture, _cached
+        self.pending.clear()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+        if self.video is not None:
+            self.video.abort()
+        _capture = False
+        _cached = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
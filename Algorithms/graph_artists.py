@@ -0,0 +1,138 @@
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba, to_rgba_array
+
+# Bulk matplotlib drawing for the draw_frame figures. A panel draws all its
+# vertices as one scatter, its edges as one LineCollection and its arcs as
+# one Quiver, each with a color per element, so a frame costs a handful of
+# artists instead of several per edge. Text labels are the expensive part
+# left; panels only draw them while they fit under LABEL_LIMIT and leave a
+# note saying what was left out otherwise.
+
+# Most vertex (or edge) labels a panel draws; above it they are left out
+LABEL_LIMIT = 150
+# Transparent color for collection elements that are currently hidden
+HIDDEN = (0.0, 0.0, 0.0, 0.0)
+
+
+def points(vertices):
+    """(n, 2) float array of vertex positions."""
+    return np.asarray(vertices, dtype=float).reshape(-1, 2)
+
+
+def colors(values, n):
+    """(n, 4) RGBA array from one color or a color per element."""
+    if isinstance(values, (str, tuple)):
+        return np.tile(to_rgba(values), (n, 1))
+    return to_rgba_array(values).reshape(-1, 4) if len(values) else np.zeros((0, 4))
+
+
+def show_labels(count, limit=LABEL_LIMIT):
+    return count <= limit
+
+
+def note_hidden(ax, **counts):
+    """Corner note listing labels a panel left out, e.g. note_hidden(ax, vertex=5000)."""
+    hidden = [f"{count} {kind}" for kind, count in counts.items() if not show_labels(count)]
+    if hidden:
+        ax.text(0.01, 0.01, "labels hidden: " + ", ".join(hidden), transform=ax.transAxes,
+                fontsize=7, color='gray')
+
+
+def label_points(ax, xy, labels, dy=0.0, **kwargs):
+    """One text per point (offset by dy), or None when there are more than LABEL_LIMIT."""
+    if not show_labels(len(labels)):
+        return None
+    return [ax.text(x, y + dy, label, **kwargs) for (x, y), label in zip(xy.tolist(), labels)]
+
+
+class Segments:
+    """Straight line segments as one LineCollection, colored per segment."""
+
+    def __init__(self, ax, starts, ends, color, **kwargs):
+        self.collection = LineCollection(np.stack([points(starts), points(ends)], axis=1), **kwargs)
+        self.colors = colors(color, len(self.collection.get_segments()))
+        self.collection.set_color(self.colors)
+        ax.add_collection(self.collection)
+
+    def set_colors(self, values):
+        values = colors(values, len(self.colors))
+        if not np.array_equal(values, self.colors):
+            self.colors = values
+            self.collection.set_color(values)
+
+    def recolor(self, indices, color):
+        """Set the segments at indices to color, leaving the others as they are."""
+        if len(indices):
+            self.colors[indices] = to_rgba(color)
+            self.collection.set_color(self.colors)
+
+    def move(self, indices, starts, ends):
+        """Move the segments at indices, leaving the others as they are."""
+        paths = self.collection.get_paths()
+        for i, start, end in zip(indices, points(starts), points(ends)):
+            paths[i].vertices = np.array([start, end])
+        self.collection.stale = True
+
+    def set_positions(self, starts, ends, color):
+        self.collection.set_segments(np.stack([points(starts), points(ends)], axis=1))
+        self.colors = colors(color, len(points(starts)))
+        self.collection.set_color(self.colors)
+
+
+class Arrows:
+    """Straight arrows as one Quiver, colored per arrow.
+
+    Shafts and heads are sized in screen units like annotate arrows, and
+    both ends are pulled in by shrink (data units) so the head stays
+    visible next to the vertex dot.
+    """
+
+    def __init__(self, ax, starts, ends, color, shrink=0.0, width=0.003, zorder=1):
+        self.ax = ax
+        self.shrink = shrink
+        self.style = dict(angles='xy', scale_units='xy', scale=1, width=width,
+                          headwidth=4, headlength=5, headaxislength=4.5, zorder=zorder)
+        self.quiver = None
+        self.set_positions(starts, ends, color)
+
+    def _shrunk(self, starts, ends):
+        starts, ends = points(starts), points(ends)
+        delta = ends - starts
+        length = np.hypot(delta[:, 0], delta[:, 1])
+        cut = np.divide(np.minimum(self.shrink, length / 3), length, out=np.zeros_like(length), where=length > 0)
+        return starts + delta * cut[:, None], delta * (1 - 2 * cut)[:, None]
+
+    def set_positions(self, starts, ends, color):
+        self.starts, self.delta = self._shrunk(starts, ends)
+        self.colors = colors(color, len(self.starts))
+        if self.quiver is not None:
+            self.quiver.remove()
+            self.quiver = None
+        if len(self.starts):
+            self.quiver = self.ax.quiver(self.starts[:, 0], self.starts[:, 1], self.delta[:, 0], self.delta[:, 1],
+                                         color=self.colors, **self.style)
+
+    def move(self, indices, starts, ends):
+        """Move the arrows at indices, leaving the others as they are."""
+        if len(indices):
+            self.starts[indices], self.delta[indices] = self._shrunk(starts, ends)
+            self.quiver.set_offsets(self.starts)
+            self.quiver.set_UVC(self.delta[:, 0], self.delta[:, 1])
+
+    def set_colors(self, values):
+        values = colors(values, len(self.colors))
+        if not np.array_equal(values, self.colors):
+            self.colors = values
+            self.quiver.set_facecolor(values)
+
+    def recolor(self, indices, color):
+        """Set the arrows at indices to color, leaving the others as they are."""
+        if len(indices):
+            self.colors[indices] = to_rgba(color)
+            self.quiver.set_facecolor(self.colors)
+
+
+def shrink_for(xy, fraction=0.02):
+    """Data-unit distance matching a vertex dot, as a fraction of the drawing's extent."""
+    return fraction * (np.ptp(xy, axis=0).max() if len(xy) else 1.0)
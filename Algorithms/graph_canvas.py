@@ -0,0 +1,128 @@
+import numpy as np
+from analyze_graph import edge_arrays, load_graph
+
+# Shared pieces of the Tk graph editors: a grid index for finding the vertex
+# under a click, and drawing of whole graphs that stays responsive. Large
+# graphs are drawn a batch of canvas items per event-loop turn and without
+# text labels, which are what make Tk slow to draw and to redraw.
+
+# Above this many vertices, vertices are drawn as small dots without labels
+LABEL_LIMIT = 2000
+# Canvas items created per event-loop turn when drawing a whole graph
+DRAW_BATCH = 4000
+
+
+class SpatialGrid:
+    """Uniform grid of cell x cell buckets over the canvas points.
+
+    Points are numbered in the order they are added, like the editors'
+    vertex lists. A lookup only visits the buckets its radius touches, so
+    hit-testing a click costs the same on ten vertices or fifty thousand.
+    """
+
+    def __init__(self, cell=20):
+        self.cell = cell
+        self.buckets = {}
+        self.points = []
+
+    def __len__(self):
+        return len(self.points)
+
+    def add(self, x, y):
+        idx = len(self.points)
+        self.points.append((x, y))
+        self.buckets.setdefault((int(x // self.cell), int(y // self.cell)), []).append(idx)
+        return idx
+
+    def extend(self, points):
+        for x, y in points:
+            self.add(x, y)
+
+    def nearest(self, x, y, radius=10):
+        """Index of the closest point within radius of (x, y) (lowest index on ties), or None."""
+        best, best_d2 = None, radius ** 2
+        for cx in range(int((x - radius) // self.cell), int((x + radius) // self.cell) + 1):
+            for cy in range(int((y - radius) // self.cell), int((y + radius) // self.cell) + 1):
+                for idx in self.buckets.get((cx, cy), ()):
+                    px, py = self.points[idx]
+                    d2 = (px - x) ** 2 + (py - y) ** 2
+                    if d2 < best_d2 or (d2 == best_d2 and (best is None or idx < best)):
+                        best, best_d2 = idx, d2
+        return best
+
+
+def read_editable_graph(path):
+    """Vertices [(x, y)] and edges [(v1, v2, weight)] of a JSON or binary graph, as plain lists."""
+    graph = load_graph(path, directed=True)
+    vertices = [tuple(p) for p in np.asarray(graph["vertices"]).reshape(-1, 2).tolist()]
+    src, dst, weight = edge_arrays(graph["edges"])
+    return vertices, list(zip(src.tolist(), dst.tolist(), weight.tolist()))
+
+
+def draw_vertex(canvas, idx, x, y, fill, detailed, prefix="v"):
+    radius = 5 if detailed else 2
+    canvas.create_oval(x - radius, y - radius, x + radius, y + radius, fill=fill,
+                       outline='black' if detailed else fill)
+    if detailed:
+        canvas.create_text(x, y - 10, text=f"{prefix}{idx}", fill='black')
+
+
+def draw_edge(canvas, p1, p2, weight, fill, detailed):
+    x1, y1 = p1
+    x2, y2 = p2
+    canvas.create_line(x1, y1, x2, y2, fill=fill)
+    if detailed:
+        canvas.create_text((x1 + x2) // 2, (y1 + y2) // 2, text=str(weight), fill='red')
+
+
+def graph_items(canvas, vertices, edges, vertex_fill='black', edge_fill='blue'):
+    """Generator that draws the graph one canvas item group per step.
+
+    Edges listed in both directions are drawn once. Labels are left out
+    for graphs above LABEL_LIMIT vertices.
+    """
+    detailed = len(vertices) <= LABEL_LIMIT
+    vertices = np.asarray(vertices).reshape(-1, 2).tolist()
+    src, dst, weight = edge_arrays(edges)
+    drawn = set()
+    for v1, v2, w in zip(src.tolist(), dst.tolist(), weight.tolist()):
+        pair = (min(v1, v2), max(v1, v2))
+        if pair in drawn:
+            continue
+        drawn.add(pair)
+        draw_edge(canvas, vertices[v1], vertices[v2], w, edge_fill, detailed)
+        yield
+    for idx, (x, y) in enumerate(vertices):
+        draw_vertex(canvas, idx, x, y, vertex_fill, detailed)
+        yield
+
+
+def fit_scroll_region(canvas):
+    """Let the canvas scroll over everything drawn on it (graphs larger than the window)."""
+    bbox = canvas.bbox("all")
+    if bbox:
+        canvas.configure(scrollregion=(min(bbox[0], 0), min(bbox[1], 0), bbox[2] + 20, bbox[3] + 20))
+
+
+def bind_scrolling(canvas):
+    """Mouse wheel scrolls vertically, Shift + wheel horizontally."""
+    canvas.bind("<MouseWheel>", lambda e: canvas.yview_scroll(-1 if e.delta > 0 else 1, "units"))
+    canvas.bind("<Shift-MouseWheel>", lambda e: canvas.xview_scroll(-1 if e.delta > 0 else 1, "units"))
+    canvas.bind("<Button-4>", lambda e: canvas.yview_scroll(-1, "units"))
+    canvas.bind("<Button-5>", lambda e: canvas.yview_scroll(1, "units"))
+    canvas.bind("<Shift-Button-4>", lambda e: canvas.xview_scroll(-1, "units"))
+    canvas.bind("<Shift-Button-5>", lambda e: canvas.xview_scroll(1, "units"))
+
+
+def draw_in_batches(canvas, items, batch=DRAW_BATCH, done=None):
+    """Step the items generator batch steps per Tk event-loop turn, then call done()."""
+    def step():
+        count = 0
+        for _ in items:
+            count += 1
+            if count == batch:
+                canvas.after(1, step)
+                return
+        if done is not None:
+            done()
+    step()
@@ -2,14 +2,19 @@ import tkinter as tk
 from tkinter import simpledialog
 import json
 import sys
+from analyze_graph import write_binary_graph
+from graph_canvas import (LABEL_LIMIT, SpatialGrid, read_editable_graph, draw_vertex, draw_edge,
+                          graph_items, draw_in_batches, fit_scroll_region, bind_scrolling)
 
 # Default mode
 MODE = "undirected"
 if len(sys.argv) > 1 and sys.argv[1] in ["directed", "undirected"]:
     MODE = sys.argv[1]
+# Optional graph file to open for editing
+GRAPH_PATH = sys.argv[2] if len(sys.argv) > 2 else None
 
 class GraphGUI:
-    def __init__(self, root):
+    def __init__(self, root, path=None):
         self.root = root
         self.root.title(f"Graph Drawer ({MODE.title()})")
         self.canvas = tk.Canvas(root, bg='white', width=800, height=600)
@@ -17,16 +22,21 @@ class GraphGUI:
 
         self.vertices = []
         self.edges = []
+        self.index = SpatialGrid()
         self.mode = None
         self.edge_selection = []
 
         self.print_instructions()
 
         self.canvas.bind("<Button-1>", self.on_click)
+        bind_scrolling(self.canvas)
         for widget in [self.root, self.canvas]:
             widget.bind("<Key>", self.key_handler)
             widget.focus_set()
 
+        if path:
+            self.open_graph(path)
+
     def print_instructions(self):
         print(f"=== Graph Drawing Tool ({MODE.title()} Mode) ===")
         print("Instructions:")
@@ -34,6 +44,8 @@ class GraphGUI:
         print("  Press 'e' then click two vertices to connect them.")
         print("    → First click = tail, Second click = head")
         print("  Press 's' to save the graph as 'graph.json'.")
+        print("  Press 'b' to save the graph in binary form as 'graph.pfg'.")
+        print("  Press 'o' to open 'graph.json' for editing (or pass a file after the mode).")
         print("  Press 'g' to print current vertices and edges.")
         print("==========================================\n")
 
@@ -46,24 +58,39 @@ class GraphGUI:
             self.output_graph()
         elif event.char == 's':
             self.save_graph_to_file()
+        elif event.char == 'b':
+            self.save_graph_to_binary_file()
+        elif event.char == 'o':
+            self.open_graph("graph.json")
 
     def set_mode(self, mode):
         self.mode = mode
         if mode == 'e':
             self.edge_selection.clear()
 
+    def open_graph(self, path):
+        """Replace the drawing with the graph in path (JSON or binary) and keep editing it."""
+        self.vertices, self.edges = read_editable_graph(path)
+        self.index = SpatialGrid()
+        self.index.extend(self.vertices)
+        self.edge_selection.clear()
+        self.canvas.delete("all")
+        print(f"Opened {path}: {len(self.vertices)} vertices, {len(self.edges)} edges")
+        draw_in_batches(self.canvas, graph_items(self.canvas, self.vertices, self.edges),
+                        done=lambda: fit_scroll_region(self.canvas))
+
     def on_click(self, event):
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
         if self.mode == 'v':
-            self.add_vertex(event.x, event.y)
+            self.add_vertex(int(x), int(y))
         elif self.mode == 'e':
-            self.select_for_edge(event.x, event.y)
+            self.select_for_edge(x, y)
 
     def add_vertex(self, x, y):
-        radius = 5
         idx = len(self.vertices)
-        self.canvas.create_oval(x - radius, y - radius, x + radius, y + radius, fill='black')
-        self.canvas.create_text(x, y - 10, text=f"v{idx}", fill='black')
+        draw_vertex(self.canvas, idx, x, y, 'black', idx < LABEL_LIMIT)
         self.vertices.append((x, y))
+        self.index.add(x, y)
 
     def select_for_edge(self, x, y):
         v = self.get_vertex_near(x, y)
@@ -79,16 +106,11 @@ class GraphGUI:
                 self.edge_selection.clear()
 
     def draw_edge(self, v1_idx, v2_idx, weight):
-        x1, y1 = self.vertices[v1_idx]
-        x2, y2 = self.vertices[v2_idx]
-        self.canvas.create_line(x1, y1, x2, y2, fill='blue')
-        self.canvas.create_text((x1 + x2) // 2, (y1 + y2) // 2, text=str(weight), fill='red')
+        draw_edge(self.canvas, self.vertices[v1_idx], self.vertices[v2_idx], weight, 'blue',
+                  len(self.vertices) <= LABEL_LIMIT)
 
     def get_vertex_near(self, x, y, radius=10):
-        for idx, (vx, vy) in enumerate(self.vertices):
-            if (vx - x) ** 2 + (vy - y) ** 2 <= radius ** 2:
-                return idx
-        return None
+        return self.index.nearest(x, y, radius)
 
     def prompt_for_weight(self):
         weight_str = simpledialog.askstring("Edge Weight", "Enter weight (default 0):")
@@ -114,7 +136,11 @@ class GraphGUI:
             }, f, indent=2)
         print("Graph saved to graph.json")
 
+    def save_graph_to_binary_file(self):
+        write_binary_graph("graph.pfg", self.vertices, self.edges)
+        print("Graph saved to graph.pfg")
+
 if __name__ == "__main__":
     root = tk.Tk()
-    app = GraphGUI(root)
+    app = GraphGUI(root, GRAPH_PATH)
     root.mainloop()
@@ -0,0 +1,154 @@
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from event_trace import EVENT_NAMES, NO_VALUE
+
+# Where a run spends its time. Code marks phases (gui, load_graph,
+# algorithm, render, savefig, ffmpeg, ...) with `with phase(name):` and
+# bumps counters with count(); both do nothing unless a Profiler is
+# active, so the hooks stay in place at no cost. Algorithm counters come
+# from the same events the trace files record.
+#
+#   python djikstra's_algorithm.py graphs/ --profile report.json
+#   PROFILE_REPORT=report.json python djikstra's_algorithm.py
+
+# Report path for interactive runs (batch runs use --profile)
+PROFILE_REPORT = os.environ.get("PROFILE_REPORT")
+# Also record allocation peaks per phase with tracemalloc (slows runs down)
+PROFILE_MEMORY = os.environ.get("PROFILE_MEMORY", "0") == "1"
+
+_active = None
+_NO_PHASE = nullcontext()
+
+
+class Profiler:
+    """Per-phase wall/CPU time, optional tracemalloc peaks, and counters.
+
+    Phases with the same name accumulate; nested phases are timed on
+    their own and also inside their parent.
+    """
+
+    def __init__(self, memory=PROFILE_MEMORY):
+        self.memory = memory
+        self.phases = {}
+        self.counters = {}
+        self.stack = [0]
+        self.started = time.perf_counter()
+        self.started_cpu = time.process_time()
+
+    def __enter__(self):
+        global _active
+        self.previous = _active
+        _active = self
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.own_tracing = True
+        else:
+            self.own_tracing = False
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        self.wall = time.perf_counter() - self.started
+        self.cpu = time.process_time() - self.started_cpu
+        if self.memory:
+            self.peak = max(self.stack[0], tracemalloc.get_traced_memory()[1])
+        if self.own_tracing:
+            tracemalloc.stop()
+        _active = self.previous
+
+    @contextmanager
+    def phase(self, name):
+        if self.memory:
+            # Peaks seen so far by the enclosing phases, before resetting for this one
+            self.stack[-1] = max(self.stack[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self.stack.append(0)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            stats = self.phases.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0})
+            stats["calls"] += 1
+            stats["wall_s"] += time.perf_counter() - wall
+            stats["cpu_s"] += time.process_time() - cpu
+            if self.memory:
+                peak = max(self.stack.pop(), tracemalloc.get_traced_memory()[1])
+                stats["peak_bytes"] = max(stats.get("peak_bytes", 0), peak)
+                self.stack[-1] = max(self.stack[-1], peak)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def report(self, **meta):
+        """Machine-readable summary of the run, as a JSON-safe dict."""
+        report = dict(meta, wall_s=self.wall, cpu_s=self.cpu, phases=self.phases, counters=self.counters)
+        if self.memory:
+            report["peak_bytes"] = self.peak
+        return report
+
+
+class CountingTrace:
+    """Trace stand-in that counts events into the active Profiler and passes them on.
+
+    Besides one counter per event kind, scans and relaxations that improve
+    a label are counted as "improvements" (one heap push each in the
+    Dijkstra runs).
+    """
+
+    def __init__(self, profiler, inner=None):
+        self.profiler = profiler
+        self.inner = inner
+
+    def emit(self, kind, u=-1, v=-1, value=NO_VALUE):
+        counters = self.profiler.counters
+        name = EVENT_NAMES[kind]
+        counters[name] = counters.get(name, 0) + 1
+        if not math.isnan(value) and name in ("scan", "relax"):
+            counters["improvements"] = counters.get("improvements", 0) + 1
+        if self.inner is not None:
+            self.inner.emit(kind, u, v, value)
+
+
+def active():
+    return _active
+
+
+def phase(name):
+    """Context manager timing a phase of the active Profiler (no-op without one)."""
+    return _NO_PHASE if _active is None else _active.phase(name)
+
+
+def count(name, amount=1):
+    if _active is not None:
+        _active.count(name, amount)
+
+
+def counted(trace=None):
+    """Wrap trace so the active Profiler counts its events; trace itself when not profiling."""
+    return trace if _active is None else CountingTrace(_active, trace)
+
+
+def write_report(path, report):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Profile saved to: {path}")
+
+
+@contextmanager
+def profile_run(path=PROFILE_REPORT):
+    """Profile the enclosed interactive run and write its report to path (if set),
+    also when the run exits early."""
+    if not path:
+        yield None
+        return
+    profiler = Profiler()
+    try:
+        with profiler:
+            yield profiler
+    finally:
+        write_report(path, profiler.report(script=os.path.basename(sys.argv[0]), argv=sys.argv[1:]))
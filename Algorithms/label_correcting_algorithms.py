@@ -4,11 +4,20 @@ import time
 import json
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import subprocess
 import sys
-from matplotlib.patches import FancyArrowPatch
-from analyze_graph import load_graph
+import math
+from collections import deque
+from analyze_graph import load_graph, edge_arrays, edge_weight
+from event_trace import TraceWriter, read_trace, iter_events, SCAN, NEGATIVE_CYCLE, NO_VALUE
+from frame_renderer import FrameRenderer, STREAM_VIDEO, FRAME_BUDGET, persistent_figure, save_frame, rendered_files
+from batch_cli import build_parser, frame_budget, prepare_output, run_batch, vertex_argument
+from snapshot_store import SnapshotStore
+from graph_artists import HIDDEN, LABEL_LIMIT, Arrows, label_points, note_hidden, points, show_labels, shrink_for
+from instrumentation import counted, phase, profile_run
+from result_cache import cached_result, default_cache, run_key
 
 IMG_DIR = "../visualizationImages"
 VID_DIR = "../visualizationVideos"
@@ -22,151 +31,404 @@ def setup_directories():
 
 def run_gui_and_load_graph():
     print("Launching graph GUI... Close it after pressing 's' to save.")
-    subprocess.run(["python", "graph_generating_script.py", "directed"])
-    time.sleep(1)
+    with phase("gui"):
+        subprocess.run(["python", "graph_generating_script.py", "directed"])
+        time.sleep(1)
     return load_graph(directed=True)
 
-def draw_frame(graph, Pr, dd, current_edge, frame_number, relax_happened, all_arcs, arc_colors):
-    coords = graph["vertices"]
-    edges = graph["edges"]
-    adj = graph["adj_matrix"]
-
-    fig, axs = plt.subplots(2, 2, figsize=(14, 10))
-
-    for i, (x, y) in enumerate(coords):
-        axs[0, 0].scatter(x, y, color='black')
-        axs[0, 0].text(x, y - 10, f"v{i}", ha='center', fontsize=9)
-        if i == 0:
-            axs[0, 0].text(x, y + 10, "s", ha='center', fontsize=10, color='green')
-
-    for v1, v2, w in edges:
-        x1, y1 = coords[v1]
-        x2, y2 = coords[v2]
-        edge_color = 'green' if (v1, v2) == current_edge and relax_happened else (
-                      'red' if (v1, v2) == current_edge else 'blue')
-        axs[0, 0].annotate("",
-                          xy=(x2, y2), xycoords='data',
-                          xytext=(x1, y1), textcoords='data',
-                          arrowprops=dict(arrowstyle="->", color=edge_color, lw=2))
-        axs[0, 0].text((x1 + x2)/2, (y1 + y2)/2, str(w), color='red', fontsize=8)
-
-    axs[0, 0].set_title("Original Graph - Scan Arc")
-    axs[0, 0].invert_yaxis()
-    axs[0, 0].axis("equal")
-
-    for i, (x, y) in enumerate(coords):
-        axs[1, 0].scatter(x, y, color='black')
-        axs[1, 0].text(x, y - 10, f"v{i}", ha='center', fontsize=9)
-        if i == 0:
-            axs[1, 0].text(x, y + 10, "s", ha='center', fontsize=10, color='green')
-
-    for v, u in Pr.items():
-        if u is not None:
-            x1, y1 = coords[u]
-            x2, y2 = coords[v]
-            w = adj[u][v]
-            axs[1, 0].annotate("",
-                              xy=(x2, y2), xycoords='data',
-                              xytext=(x1, y1), textcoords='data',
-                              arrowprops=dict(arrowstyle="->", color='green', lw=2))
-            axs[1, 0].text((x1 + x2)/2, (y1 + y2)/2, str(w), color='red', fontsize=8)
-
-    axs[1, 0].set_title("Current Tree")
-    axs[1, 0].invert_yaxis()
-    axs[1, 0].axis("equal")
-
-    axs[0, 1].axis("off")
-    axs[0, 1].set_title("Distance Estimates")
-    for i, d in dd.items():
-        display = f"v{i}: {'inf' if d == float('inf') else round(d, 2)}"
-        axs[0, 1].text(0.1, 1 - i * 0.05, display, fontsize=12)
-
-    axs[1, 1].set_title("Arc Scan Pass")
-    axs[1, 1].set_xlim(0, 1)
-    axs[1, 1].set_ylim(0, len(all_arcs))
-    axs[1, 1].axis("off")
-
-    for i, (u, v) in enumerate(all_arcs):
-        x_start, y_start = 0.2, len(all_arcs) - i - 0.5
-        x_end = 0.8
-        color = arc_colors.get((u, v), 'gray')
-        arrow = FancyArrowPatch((x_start, y_start), (x_end, y_start),
-                                connectionstyle="arc3,rad=0.0",
-                                arrowstyle="->",
-                                color=color,
-                                lw=2)
-        axs[1, 1].add_patch(arrow)
-        axs[1, 1].text(0.05, y_start, f"v{u} → v{v}", fontsize=8, verticalalignment='center')
-
-    plt.tight_layout()
-    plt.savefig(os.path.join(IMG_DIR, f"frame_{frame_number:03d}.png"))
-    plt.close()
+class LabelCorrectingFigure:
+    """Four-panel label-correcting figure built once per graph and updated in place.
+
+    Arcs, tree arcs and scan-pass arrows are one Quiver each; vertex, weight
+    and distance labels are only drawn within LABEL_LIMIT.
+    """
+
+    def __init__(self, graph, all_arcs, source=0):
+        coords = points(graph["vertices"])
+        n = len(coords)
+        src, dst, _ = edge_arrays(graph["edges"])
+        self.coords = coords
+        self.csr = graph["csr"]
+        self.fig = Figure(figsize=(14, 10))
+        FigureCanvasAgg(self.fig)
+        axs = self.fig.subplots(2, 2)
+        self.axs = axs
+        self.shrink = shrink_for(coords)
+
+        for ax in (axs[0, 0], axs[1, 0]):
+            ax.scatter(coords[:, 0], coords[:, 1], color='black', zorder=2)
+            label_points(ax, coords, [f"v{i}" for i in range(n)], -10, ha='center', fontsize=9)
+            if n:
+                ax.text(coords[source, 0], coords[source, 1] + 10, "s", ha='center', fontsize=10, color='green')
+            note_hidden(ax, vertex=n)
+
+        self.edge_arrows = Arrows(axs[0, 0], coords[src], coords[dst], 'blue', self.shrink)
+        self.edge_index = {}
+        for i, edge in enumerate(zip(src.tolist(), dst.tolist())):
+            self.edge_index.setdefault(edge, []).append(i)
+        if show_labels(len(src)):
+            for v1, v2, w in graph["edges"]:
+                (x1, y1), (x2, y2) = coords[v1], coords[v2]
+                axs[0, 0].text((x1 + x2)/2, (y1 + y2)/2, str(w), color='red', fontsize=8)
+        note_hidden(axs[0, 0], edge=len(src))
+
+        axs[0, 0].set_title("Original Graph - Scan Arc")
+        axs[0, 0].invert_yaxis()
+        axs[0, 0].axis("equal")
+
+        # Vertex i's tree arrow comes from its parent; hidden while it has none
+        self.tree_arrows = Arrows(axs[1, 0], coords, coords, HIDDEN, self.shrink)
+        self.tree_labels = label_points(axs[1, 0], coords, [""] * n, color='red', fontsize=8)
+        axs[1, 0].set_title("Current Tree")
+        axs[1, 0].invert_yaxis()
+        axs[1, 0].axis("equal")
+
+        axs[0, 1].axis("off")
+        axs[0, 1].set_title("Distance Estimates")
+        self.dd_texts = [axs[0, 1].text(0.1, 1 - i * 0.05, "", fontsize=12) for i in range(min(n, LABEL_LIMIT))]
+        note_hidden(axs[0, 1], distance=n)
+
+        axs[1, 1].set_title("Arc Scan Pass")
+        axs[1, 1].set_xlim(0, 1)
+        axs[1, 1].set_ylim(0, len(all_arcs))
+        axs[1, 1].axis("off")
+
+        rows = len(all_arcs) - np.arange(len(all_arcs)) - 0.5
+        self.scan_arrows = Arrows(axs[1, 1], np.column_stack([np.full_like(rows, 0.2), rows]),
+                                  np.column_stack([np.full_like(rows, 0.8), rows]), 'gray')
+        self.scan_index = {arc: i for i, arc in enumerate(all_arcs)}
+        label_points(axs[1, 1], np.column_stack([np.full_like(rows, 0.05), rows]),
+                     [f"v{u} → v{v}" for u, v in all_arcs], fontsize=8, verticalalignment='center')
+        note_hidden(axs[1, 1], arc=len(all_arcs))
+
+        self.fig.tight_layout()
+
+        self.parent = np.full(n, -1)
+        self.current_edge = None
+
+    def update(self, Pr, dd, current_edge, relax_happened, arc_colors, changes=None):
+        """Show the frame's state. changes (the SnapshotStore delta since the
+        frame drawn before) limits the work to the arcs, parents and labels
+        it names; None redraws everything from Pr, dd and arc_colors."""
+        full = changes is None
+        if full:
+            self.edge_arrows.set_colors('blue')
+            self.scan_arrows.set_colors('gray')
+            self.parent[:] = -1
+            changes = {"Pr": Pr, "dd": dd, "arc_colors": arc_colors}
+        elif self.current_edge is not None:
+            self.edge_arrows.recolor(self.edge_index.get(self.current_edge, []), 'blue')
+        if current_edge is not None:
+            self.edge_arrows.recolor(self.edge_index.get(current_edge, []), 'green' if relax_happened else 'red')
+        self.current_edge = current_edge
+
+        moved = []
+        for v, u in changes.get("Pr", {}).items():
+            u = -1 if u is None else u
+            if u == self.parent[v] and not full:
+                continue
+            self.parent[v] = u
+            moved.append(v)
+            if self.tree_labels is None:
+                continue
+            text = self.tree_labels[v]
+            if u < 0:
+                text.set_text("")
+                continue
+            text.set_position((self.coords[u] + self.coords[v]) / 2)
+            text.set_text(str(edge_weight(self.csr, u, v)))
+        if moved:
+            moved = np.array(moved)
+            parents = self.parent[moved]
+            self.tree_arrows.move(moved, self.coords[np.where(parents >= 0, parents, moved)], self.coords[moved])
+            self.tree_arrows.recolor(moved[parents >= 0], 'green')
+            self.tree_arrows.recolor(moved[parents < 0], HIDDEN)
+
+        for i, d in changes.get("dd", {}).items():
+            if i < len(self.dd_texts):
+                self.dd_texts[i].set_text(f"v{i}: {'inf' if d == float('inf') else round(d, 2)}")
+
+        scanned = {}
+        for arc, color in changes.get("arc_colors", {}).items():
+            if arc in self.scan_index:
+                scanned.setdefault(color, []).append(self.scan_index[arc])
+        for color, indices in scanned.items():
+            self.scan_arrows.recolor(indices, color)
+
+def draw_frame(graph, Pr, dd, current_edge, frame_number, relax_happened, all_arcs, arc_colors, changes=None,
+               source=0, img_dir=IMG_DIR):
+    figure = persistent_figure(LabelCorrectingFigure, graph, all_arcs, source)
+    figure.update(Pr, dd, current_edge, relax_happened, arc_colors, changes)
+    return save_frame(figure.fig, os.path.join(img_dir, f"frame_{frame_number:03d}.png"))
 
 def save_video():
     output_path = os.path.join(VID_DIR, VIDEO_NAME)
-    subprocess.run([
-        "ffmpeg", "-y", "-framerate", "0.5",
-        "-i", os.path.join(IMG_DIR, "frame_%03d.png"),
-        "-c:v", "libx264", "-pix_fmt", "yuv420p", output_path
-    ])
+    with phase("ffmpeg"):
+        subprocess.run([
+            "ffmpeg", "-y", "-framerate", "0.5",
+            "-i", os.path.join(IMG_DIR, "frame_%03d.png"),
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", output_path
+        ])
     print(f"🎞️  Video saved to: {output_path}")
 
-def label_correcting_scan(graph):
-    coords = graph["vertices"]
-    adj = graph["adj_matrix"]
-    n = len(coords)
+def scan_arcs(graph):
+    """Nonzero-weight arcs in pass order (row-major) and their weights, from the CSR."""
+    csr = graph["csr"]
+    n = len(graph["vertices"])
+    tails = np.repeat(np.arange(n), np.diff(csr["offsets"]))
+    keep = csr["weights"] != 0
+    return list(zip(tails[keep].tolist(), csr["targets"][keep].tolist())), csr["weights"][keep].tolist()
 
-    dd = {i: float("inf") for i in range(n)}
-    Pr = {i: None for i in range(n)}
-    dd[0] = 0
-    frame_number = 0
+def label_correcting_passes(graph, source=0, on_scan=None, trace=None):
+    """Bellman-Ford style passes over every arc until no label improves.
 
-    all_arcs = [(u, v) for u in range(n) for v in range(n) if adj[u][v] != 0]
-    arc_colors = {}
+    on_scan(dd, Pr, (u, v), relax_happened) is called after every arc and
+    trace receives one SCAN event per arc. Returns (None, None) when a
+    negative-weight cycle is reachable.
+    """
+    all_arcs, weights = scan_arcs(graph)
+    n = len(graph["vertices"])
 
-    draw_frame(graph, Pr, dd, None, frame_number, False, all_arcs, arc_colors)
-    frame_number += 1
+    dd = {i: float("inf") for i in range(n)}
+    Pr = {i: None for i in range(n)}
+    dd[source] = 0
 
     for _ in range(n - 1):
         changed = False
-        for u, v in all_arcs:
+        for (u, v), w in zip(all_arcs, weights):
             relax_happened = False
-            if dd[u] + adj[u][v] < dd[v]:
-                dd[v] = dd[u] + adj[u][v]
+            if dd[u] + w < dd[v]:
+                dd[v] = dd[u] + w
                 Pr[v] = u
                 relax_happened = True
                 changed = True
-            arc_colors[(u, v)] = 'green' if relax_happened else 'red'
-            draw_frame(graph, Pr, dd, (u, v), frame_number, relax_happened, all_arcs, arc_colors)
-            frame_number += 1
+            if trace is not None:
+                trace.emit(SCAN, u, v, dd[v] if relax_happened else NO_VALUE)
+            if on_scan is not None:
+                on_scan(dd, Pr, (u, v), relax_happened)
         if not changed:
             break
 
-    for u, v in all_arcs:
-        if dd[u] + adj[u][v] < dd[v]:
+    for (u, v), w in zip(all_arcs, weights):
+        if dd[u] + w < dd[v]:
+            if trace is not None:
+                trace.emit(NEGATIVE_CYCLE)
             print("❌ Negative-weight cycle detected. Aborting.")
             return None, None
 
-    draw_frame(graph, Pr, dd, None, frame_number, False, all_arcs, arc_colors)
     return dd, Pr
 
-def main():
+def label_correcting_fifo(graph, source=0, on_scan=None, trace=None):
+    """FIFO (SPFA) label correcting: only rescan arcs out of improved vertices.
+
+    Takes the same callbacks as label_correcting_passes. A negative cycle is
+    reported as soon as some tree path would need n arcs.
+    """
+    csr = graph["csr"]
+    n = len(graph["vertices"])
+    offsets = csr["offsets"].tolist()
+    targets = csr["targets"].tolist()
+    weights = csr["weights"].tolist()
+
+    dd = {i: float("inf") for i in range(n)}
+    Pr = {i: None for i in range(n)}
+    dd[source] = 0
+    arcs_on_path = [0] * n
+    queued = [False] * n
+    queued[source] = True
+    queue = deque([source])
+
+    while queue:
+        u = queue.popleft()
+        queued[u] = False
+        for i in range(offsets[u], offsets[u + 1]):
+            w = weights[i]
+            if w == 0:
+                continue
+            v = targets[i]
+            relax_happened = dd[u] + w < dd[v]
+            if relax_happened:
+                dd[v] = dd[u] + w
+                Pr[v] = u
+                arcs_on_path[v] = arcs_on_path[u] + 1
+                if not queued[v]:
+                    queued[v] = True
+                    queue.append(v)
+            if trace is not None:
+                trace.emit(SCAN, u, v, dd[v] if relax_happened else NO_VALUE)
+            if on_scan is not None:
+                on_scan(dd, Pr, (u, v), relax_happened)
+            if arcs_on_path[v] >= n:
+                if trace is not None:
+                    trace.emit(NEGATIVE_CYCLE)
+                print("❌ Negative-weight cycle detected. Aborting.")
+                return None, None
+
+    return dd, Pr
+
+def label_correcting_vectorized(graph, source=0):
+    """Headless label correcting that relaxes every arc at once per pass with NumPy.
+
+    Each pass computes dd[u] + w for all arcs and keeps the best candidate
+    per head, so a pass costs a few array operations over the edge arrays.
+    Distances match the other modes; among equally short paths the chosen
+    parent may differ.
+    """
+    csr = graph["csr"]
+    n = len(graph["vertices"])
+    keep = csr["weights"] != 0
+    src = np.repeat(np.arange(n), np.diff(csr["offsets"]))[keep]
+    dst = csr["targets"][keep].astype(np.int64)
+    w = csr["weights"][keep]
+
+    dd = np.full(n, np.inf)
+    Pr = np.full(n, -1, dtype=np.int64)
+    dd[source] = 0
+
+    for _ in range(n - 1):
+        cand = dd[src] + w
+        better = cand < dd[dst]
+        if not better.any():
+            break
+        best = dd.copy()
+        np.minimum.at(best, dst[better], cand[better])
+        winners = better & (cand == best[dst])
+        Pr[dst[winners]] = src[winners]
+        dd = best
+
+    if (dd[src] + w < dd[dst]).any():
+        print("❌ Negative-weight cycle detected. Aborting.")
+        return None, None
+
+    return ({i: float(d) for i, d in enumerate(dd.tolist())},
+            {i: (p if p >= 0 else None) for i, p in enumerate(Pr.tolist())})
+
+# Modes that report every arc scan and can drive the visualizer
+LABEL_CORRECTING_MODES = {
+    "passes": label_correcting_passes,
+    "fifo": label_correcting_fifo,
+}
+
+class LabelCorrectingSnapshots:
+    """Trace stand-in that records SCAN events as SnapshotStore frames.
+
+    Live runs pass it to a mode function as trace= and replays feed it the
+    recorded events, so both produce the same frames.
+    """
+
+    def __init__(self, n, source=0):
+        self.store = SnapshotStore(Pr={i: None for i in range(n)},
+                                   dd={i: (0 if i == source else float("inf")) for i in range(n)},
+                                   arc_colors={})
+        self.store.record(current_edge=None, relax_happened=False)
+        self.negative_cycle = False
+
+    def emit(self, kind, u=-1, v=-1, value=NO_VALUE):
+        if kind == NEGATIVE_CYCLE:
+            self.negative_cycle = True
+        elif kind == SCAN:
+            relax_happened = not math.isnan(value)
+            changes = {"arc_colors": {(u, v): 'green' if relax_happened else 'red'}}
+            if relax_happened:
+                changes["dd"] = {v: value}
+                changes["Pr"] = {v: u}
+            self.store.record(changes, key_event=relax_happened, current_edge=(u, v), relax_happened=relax_happened)
+
+    def finish(self):
+        """Add the closing frame (none after a negative cycle) and return the store."""
+        if not self.negative_cycle:
+            self.store.record(key_event=True, current_edge=None, relax_happened=False)
+        return self.store
+
+def label_correcting_scan(graph, source=0, workers=None, video_path=None, mode="passes", max_frames=FRAME_BUDGET,
+                          img_dir=IMG_DIR):
+    snapshots = LabelCorrectingSnapshots(len(graph["vertices"]), source)
+    with phase("algorithm"):
+        dd, Pr = LABEL_CORRECTING_MODES[mode](graph, source=source, trace=counted(snapshots))
+
+    store = snapshots.finish()
+    with FrameRenderer(draw_frame, static_kwargs={"graph": graph, "all_arcs": scan_arcs(graph)[0], "source": source},
+                       workers=workers, video_path=video_path, img_dir=img_dir) as renderer:
+        renderer.render_store(store, "frame_number", store.sample(max_frames), "changes")
+    return dd, Pr
+
+def record_trace(graph, trace_path, source=0, mode="passes"):
+    """Run label correcting without rendering, logging its scans to trace_path."""
+    with TraceWriter(trace_path, "label_correcting", n=len(graph["vertices"]), source=source, mode=mode) as trace:
+        return LABEL_CORRECTING_MODES[mode](graph, source=source, trace=trace)
+
+def replay_trace(graph, trace_path, start=0, stop=None, workers=None, video_path=None, max_frames=FRAME_BUDGET,
+                 img_dir=IMG_DIR):
+    """Render frames [start, stop) of a recorded run; same frames as a live run."""
+    header, events = read_trace(trace_path)
+    snapshots = LabelCorrectingSnapshots(header["n"], header["source"])
+    for event in iter_events(events):
+        snapshots.emit(*event)
+    store = snapshots.finish()
+
+    with FrameRenderer(draw_frame, static_kwargs={"graph": graph, "all_arcs": scan_arcs(graph)[0],
+                                                  "source": header["source"]},
+                       workers=workers, video_path=video_path, img_dir=img_dir) as renderer:
+        renderer.render_store(store, "frame_number", store.sample(max_frames, start, stop), "changes")
+    if snapshots.negative_cycle:
+        return None, None
+    return store.current["dd"], store.current["Pr"]
+
+def solve_graph(path, args):
+    """Batch mode: solve one graph file and optionally render it."""
+    graph = load_graph(path, directed=True)
+    source = vertex_argument(args.source, len(graph["vertices"]), 0, "--source")
+
+    if args.render == "none" and args.mode == "vectorized":
+        with phase("algorithm"):
+            dd, Pr = label_correcting_vectorized(graph, source)
+    elif args.render == "none":
+        with phase("algorithm"):
+            dd, Pr = LABEL_CORRECTING_MODES[args.mode](graph, source=source, trace=counted())
+    else:
+        if args.mode not in LABEL_CORRECTING_MODES:
+            raise ValueError(f"--mode {args.mode} cannot be rendered; use --render none")
+        img_dir, video_path = prepare_output(args, path)
+        dd, Pr = label_correcting_scan(graph, source, workers=args.workers, video_path=video_path, mode=args.mode,
+                                       max_frames=frame_budget(args), img_dir=img_dir)
+    if dd is None:
+        return {"source": source, "negative_cycle": True}
+    return {"source": source, "negative_cycle": False, "distances": dd, "parents": Pr}
+
+def interactive():
     print("The first node placed will be considered node s")
     setup_directories()
     graph = run_gui_and_load_graph()
 
-    dd, Pr = label_correcting_scan(graph)
+    source = 0
+    video_path = os.path.join(VID_DIR, VIDEO_NAME) if STREAM_VIDEO else None
+    dd, Pr = cached_result(default_cache(), run_key(__file__, ["graph.json"], source=source),
+                           lambda: label_correcting_scan(graph, source, video_path=video_path),
+                           lambda: rendered_files(IMG_DIR, video_path), FRAME_BUDGET, video_path)
 
     if dd is None:
         sys.exit(1)
 
-    print("\n📊 Shortest distances from v0:")
+    print(f"\n📊 Shortest distances from v{source}:")
     for i in range(len(graph["vertices"])):
         d = dd[i]
         status = f"{d}" if d != float("inf") else "unreachable"
         print(f"v{i}: {status}")
 
-    save_video()
+    if video_path is None:
+        save_video()
+
+def main(argv=None):
+    parser = build_parser("Label-correcting shortest paths with negative-cycle detection.")
+    parser.add_argument("--mode", choices=("passes", "fifo", "vectorized"), default="passes",
+                        help="full passes over all arcs, a FIFO queue of improved vertices, "
+                             "or NumPy passes (vectorized needs --render none)")
+    args = parser.parse_args(argv)
+    if not args.graphs:
+        with profile_run():
+            interactive()
+        return
+    sys.exit(run_batch(args, solve_graph))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,169 @@
+import argparse
+import json
+import numpy as np
+from analyze_graph import edge_arrays, load_graph
+
+PRIMAL_GRAPH_PATH = "graph.json"
+DUAL_GRAPH_PATH = "dual_graph.json"
+
+# Builds dual_graph.json from the straight-line drawing in graph.json, with
+# no clicking. Half-edge 2i runs u -> v along primal edge i and 2i + 1 runs
+# back. Sorting the half-edges leaving each vertex by angle gives the
+# rotation system; following next() from any half-edge walks the face on
+# its left, so every face is one cycle of next().
+
+
+def _unique_edges(n, edges):
+    """One edge per vertex pair (the last one listed wins, as in build_csr); self-loops dropped."""
+    src, dst, weight = edge_arrays(edges)
+    lo, hi = np.minimum(src, dst), np.maximum(src, dst)
+    key = lo * n + hi
+    perm = np.lexsort((np.arange(len(key)), key))
+    last = np.ones(len(perm), dtype=bool)
+    last[:-1] = key[perm][1:] != key[perm][:-1]
+    perm = perm[last & (lo[perm] != hi[perm])]
+    return src[perm], dst[perm], weight[perm]
+
+
+def _face_labels(nxt):
+    """Label every half-edge with its face (cycle of nxt) by pointer jumping."""
+    label = np.arange(len(nxt))
+    jump = nxt.copy()
+    while True:
+        merged = np.minimum(label, label[jump])
+        if np.array_equal(merged, label):
+            break
+        label = merged
+        jump = jump[jump]
+    faces, face = np.unique(label, return_inverse=True)
+    return face, len(faces)
+
+
+def build_planar_dual(vertices, edges, source=0, sink=None):
+    """Dual of a connected plane graph, for the s-t cut between source and sink.
+
+    Each face of the drawing becomes a dual vertex at its centroid, and each
+    primal edge becomes a dual edge of the same length joining the faces on
+    its two sides. The outer face is split along source and sink into
+    s_hat and t_hat, as if an s-t edge were drawn outside the graph. Runs in
+    O(m log m).
+
+    Args:
+        vertices: (x, y) of every primal vertex
+        edges: (v1, v2, weight) primal edges; both directions may be listed
+        source, sink (int): Primal s and t (sink defaults to the last vertex);
+            both must lie on the outer face
+
+    Returns:
+        dict: Same layout as dual_graph.json, plus "dual_edge_to_primal"
+        (the primal edge [u, v] of each dual edge) and "oriented": every
+        dual edge and dual_to_primal_map key lists the face on the left of
+        u -> v first. dual_to_primal_map keeps one edge per pair of faces;
+        the list keeps them all.
+    """
+    pos = np.asarray(vertices, dtype=float).reshape(-1, 2)
+    n = len(pos)
+    sink = n - 1 if sink is None else sink
+    eu, ev, weight = _unique_edges(n, edges)
+    m = len(eu)
+    if m == 0:
+        raise ValueError("the primal graph has no edges")
+
+    tail = np.empty(2 * m, dtype=np.int64)
+    tail[0::2], tail[1::2] = eu, ev
+    head = np.empty(2 * m, dtype=np.int64)
+    head[0::2], head[1::2] = ev, eu
+    delta = pos[head] - pos[tail]
+    angle = np.arctan2(delta[:, 1], delta[:, 0])
+
+    # Rotation system: half-edges grouped by tail, counter-clockwise by angle
+    order = np.lexsort((angle, tail))
+    rank = np.empty(2 * m, dtype=np.int64)
+    rank[order] = np.arange(2 * m)
+    degree = np.bincount(tail, minlength=n)
+    start = np.cumsum(degree) - degree
+    # next(u -> v) is the half-edge just clockwise of v -> u around v
+    twin_rank = rank[np.arange(2 * m) ^ 1]
+    at = tail[order[twin_rank]]
+    prev_rank = np.where(twin_rank > start[at], twin_rank - 1, start[at] + degree[at] - 1)
+    nxt = order[prev_rank]
+
+    face, faces = _face_labels(nxt)
+    if np.count_nonzero(degree) - m + faces != 2:
+        raise ValueError("the graph must be connected and drawn without crossing edges")
+
+    # Signed area: inner faces are counter-clockwise (positive), the outer one is not
+    cross = pos[tail, 0] * pos[head, 1] - pos[head, 0] * pos[tail, 1]
+    area = np.bincount(face, weights=cross, minlength=faces) / 2
+    outer = int(np.argmin(area))
+
+    # Walk the outer boundary from source and cut it where it reaches sink;
+    # the stretch from source to sink borders s_hat, the rest t_hat
+    on_outer = np.flatnonzero(face == outer)
+    first = on_outer[tail[on_outer] == source]
+    if not len(first) or not np.any(tail[on_outer] == sink):
+        raise ValueError("source and sink must both lie on the outer face")
+    boundary = [int(first[0])]
+    while nxt[boundary[-1]] != boundary[0]:
+        boundary.append(int(nxt[boundary[-1]]))
+    boundary = np.array(boundary)
+    split = int(np.argmax(tail[boundary] == sink))
+
+    # Renumber: inner faces keep their order, then s_hat and t_hat
+    inner = np.flatnonzero(np.arange(faces) != outer)
+    index = np.empty(faces, dtype=np.int64)
+    index[inner] = np.arange(len(inner))
+    s_hat, t_hat = len(inner), len(inner) + 1
+    dual_of = index[face]
+    dual_of[boundary[:split]] = s_hat
+    dual_of[boundary[split:]] = t_hat
+
+    # Centroid of each inner face; vertex average for faces of zero area
+    sx = np.bincount(face, weights=(pos[tail, 0] + pos[head, 0]) * cross, minlength=faces)
+    sy = np.bincount(face, weights=(pos[tail, 1] + pos[head, 1]) * cross, minlength=faces)
+    count = np.bincount(face, minlength=faces)
+    mean = np.column_stack([np.bincount(face, weights=pos[tail, 0], minlength=faces),
+                            np.bincount(face, weights=pos[tail, 1], minlength=faces)]) / count[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        centroid = np.column_stack([sx, sy]) / (3 * area[:, None])
+    centroid = np.where(np.abs(area[:, None]) > 1e-12, centroid, mean)
+
+    # s_hat / t_hat sit just outside the middle of their stretch of boundary
+    span = np.ptp(pos, axis=0).max() or 1.0
+    outside = []
+    for part in (boundary[:split], boundary[split:]):
+        h = part[len(part) // 2]
+        mid = (pos[tail[h]] + pos[head[h]]) / 2
+        d = delta[h] / (np.hypot(*delta[h]) or 1.0)
+        outside.append(mid + np.array([-d[1], d[0]]) * 0.1 * span)
+
+    left, right = dual_of[0::2].tolist(), dual_of[1::2].tolist()
+    return {
+        "dual_vertices": np.vstack([centroid[inner], outside]).tolist(),
+        "dual_edges": [list(e) for e in zip(left, right, weight.tolist())],
+        "dual_to_primal_map": {f"{a},{b}": f"{u},{v}" for a, b, u, v in
+                               zip(left, right, eu.tolist(), ev.tolist())},
+        "s_hat": s_hat,
+        "t_hat": t_hat,
+        "dual_edge_to_primal": np.column_stack([eu, ev]).tolist(),
+        "oriented": True,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build dual_graph.json from the drawing in graph.json.")
+    parser.add_argument("graph", nargs="?", default=PRIMAL_GRAPH_PATH)
+    parser.add_argument("dual", nargs="?", default=DUAL_GRAPH_PATH)
+    parser.add_argument("--source", type=int, default=0, help="primal s (default 0)")
+    parser.add_argument("--sink", type=int, help="primal t (default: last vertex)")
+    args = parser.parse_args(argv)
+
+    graph = load_graph(args.graph, directed=False)
+    dual = build_planar_dual(graph["vertices"], graph["edges"], args.source, args.sink)
+    with open(args.dual, "w") as f:
+        json.dump(dual, f, indent=2)
+    print(f"✅ Dual graph saved to {args.dual}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,21 @@
 import os
+import sys
 import time
+import heapq
 import subprocess
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import json
-from analyze_graph import load_graph
+from analyze_graph import load_graph, edge_arrays
+from event_trace import TraceWriter, read_trace, iter_events, RELAX, CUT_EDGE, NO_VALUE
+from frame_renderer import FrameRenderer, STREAM_VIDEO, FRAME_BUDGET, persistent_figure, save_frame, rendered_files
+from batch_cli import build_parser, dual_path_for, frame_budget, prepare_output, run_batch
+from planar_dual import build_planar_dual
+from snapshot_store import SnapshotStore
+from graph_artists import Arrows, Segments, label_points, note_hidden, points, show_labels, shrink_for
+from instrumentation import counted, phase, profile_run
+from result_cache import cached_result, default_cache, run_key
 
 IMG_DIR = "../visualizationImages"
 VID_DIR = "../visualizationVideos"
@@ -17,37 +28,81 @@ def setup_directories():
         os.remove(os.path.join(IMG_DIR, f))
 
 def run_primal_graph_gui():
-    subprocess.run(["python", "graph_generating_script.py", "undirected"])
-    time.sleep(1)
+    with phase("gui"):
+        subprocess.run(["python", "graph_generating_script.py", "undirected"])
+        time.sleep(1)
 
 def run_dual_graph_overlay():
-    subprocess.run(["python", "dual_graph_overlay.py"])
-    time.sleep(1)
+    with phase("gui"):
+        subprocess.run(["python", "dual_graph_overlay.py"])
+        time.sleep(1)
 
 def load_dual_graph(path="dual_graph.json"):
-    with open(path, "r") as f:
+    with phase("load_graph"), open(path, "r") as f:
         return json.load(f)
 
-def dijkstra_dual_with_path(dual_vertices, dual_edges, s_hat, t_hat):
-    distances = {i: float('inf') for i in range(len(dual_vertices))}
-    parents = {i: None for i in range(len(dual_vertices))}
+def build_dual_graph(primal_graph, path="dual_graph.json"):
+    """Build the dual from the primal drawing and save it like the overlay does."""
+    with phase("build_dual"):
+        dual_graph = build_planar_dual(primal_graph["vertices"], primal_graph["edges"])
+    with open(path, "w") as f:
+        json.dump(dual_graph, f, indent=2)
+    print(f"✅ Dual graph saved to {path}")
+    return dual_graph
+
+def dual_adjacency(n, dual_edges):
+    """Adjacency lists of (neighbour, length) for the undirected dual edges, in edge order."""
+    adjacency = [[] for _ in range(n)]
+    for u, v, length in dual_edges:
+        adjacency[u].append((v, length))
+        adjacency[v].append((u, length))
+    return adjacency
+
+def cap_potentials(distances, t_hat):
+    """Cap every face potential at t_hat's, which covers the faces an early stop left unsettled."""
+    cap = distances[t_hat]
+    for v, d in distances.items():
+        if d > cap:
+            distances[v] = cap
+
+def dijkstra_dual_with_path(dual_vertices, dual_edges, s_hat, t_hat, trace=None):
+    """Binary-heap Dijkstra from s_hat over the dual, stopping once t_hat is settled.
+
+    Faces are settled in (distance, index) order and their edges scanned in
+    dual_edges order, so the relaxations match the original full scan up to
+    t_hat. Potentials are then capped at the cut value (see cap_potentials),
+    which still gives a feasible maximum flow.
+
+    Returns:
+        tuple: (distances, frames, min_cut_dual_edges); frames holds one
+        (face, new distance) change record per relaxation
+    """
+    n = len(dual_vertices)
+    adjacency = dual_adjacency(n, dual_edges)
+    distances = {i: float('inf') for i in range(n)}
+    parents = {i: None for i in range(n)}
     distances[s_hat] = 0
     visited = set()
     frames = []
+    heap = [(0, s_hat)]
 
-    while len(visited) < len(dual_vertices):
-        unvisited = [v for v in distances if v not in visited]
-        if not unvisited:
-            break
-        v = min(unvisited, key=lambda x: distances[x])
+    while heap:
+        d, v = heapq.heappop(heap)
+        if v in visited or d > distances[v]:
+            continue
         visited.add(v)
-        for u1, u2, length in dual_edges:
-            for u, w in [(u1, u2), (u2, u1)]:
-                if u == v and w not in visited:
-                    if distances[v] + length < distances[w]:
-                        distances[w] = distances[v] + length
-                        parents[w] = v
-                        frames.append((w, dict(distances)))
+        if v == t_hat:
+            break
+        for w, length in adjacency[v]:
+            if w not in visited and d + length < distances[w]:
+                distances[w] = d + length
+                parents[w] = v
+                heapq.heappush(heap, (distances[w], w))
+                frames.append((w, distances[w]))
+                if trace is not None:
+                    trace.emit(RELAX, v, w, distances[w])
+
+    cap_potentials(distances, t_hat)
 
     min_cut_dual_edges = []
     curr = t_hat
@@ -56,193 +111,408 @@ def dijkstra_dual_with_path(dual_vertices, dual_edges, s_hat, t_hat):
         min_cut_dual_edges.append((prev, curr))
         curr = prev
     min_cut_dual_edges.reverse()
+    if trace is not None:
+        for u, v in min_cut_dual_edges:
+            trace.emit(CUT_EDGE, u, v)
 
     return distances, frames, min_cut_dual_edges
 
-def get_primal_cut_edges(dual_to_primal_map, min_cut_dual_edges):
-    cut_edges = set()
-    for u, v in min_cut_dual_edges:
-        key1 = f"{u},{v}"
-        key2 = f"{v},{u}"
-        edge_str = dual_to_primal_map.get(key1) or dual_to_primal_map.get(key2)
-        if edge_str:
-            e = tuple(sorted(map(int, edge_str.split(','))))
-            cut_edges.add(e)
-    return cut_edges
+def dual_edge_arrays(primal_graph, dual_graph):
+    """Integer arrays describing every dual edge, built once and cached in dual_graph["arrays"].
+
+    Each entry i has faces left[i] / right[i] and the primal edge
+    tail[i] -> head[i] they separate, oriented so left[i] lies on its left.
+    Duals from build_planar_dual list that directly; for hand-made duals the
+    side is taken from the drawing, as the position of the first face of a
+    dual_to_primal_map key relative to its primal edge. keys / order sort
+    the face pairs (shortest parallel edge first) for cut lookups.
+    """
+    if "arrays" in dual_graph:
+        return dual_graph["arrays"]
+    if dual_graph.get("oriented"):
+        dual_edges = np.asarray(dual_graph["dual_edges"], dtype=float).reshape(-1, 3)
+        primal = np.asarray(dual_graph["dual_edge_to_primal"], dtype=np.int64).reshape(-1, 2)
+        left, right = dual_edges[:, 0].astype(np.int64), dual_edges[:, 1].astype(np.int64)
+        tail, head = primal[:, 0], primal[:, 1]
+        length = dual_edges[:, 2]
+    else:
+        mapping = dual_graph["dual_to_primal_map"]
+        faces = np.array([k.split(',') for k in mapping], dtype=np.int64).reshape(-1, 2)
+        primal = np.array([e.split(',') for e in mapping.values()], dtype=np.int64).reshape(-1, 2)
+        left, right = faces[:, 0], faces[:, 1]
+        pos = np.asarray(primal_graph["vertices"], dtype=float).reshape(-1, 2)
+        dual_pos = np.asarray(dual_graph["dual_vertices"], dtype=float).reshape(-1, 2)
+        # Left-hand normal of each primal edge against the vector from its midpoint to the face
+        p1, p2 = pos[primal[:, 0]], pos[primal[:, 1]]
+        normal = np.column_stack([p1[:, 1] - p2[:, 1], p2[:, 0] - p1[:, 0]])
+        on_left = np.einsum("ij,ij->i", normal, dual_pos[left] - (p1 + p2) / 2) > 0
+        tail = np.where(on_left, primal[:, 0], primal[:, 1])
+        head = np.where(on_left, primal[:, 1], primal[:, 0])
+        length = np.zeros(len(left))
+
+    key = np.minimum(left, right) * len(dual_graph["dual_vertices"]) + np.maximum(left, right)
+    order = np.lexsort((length, key))
+    dual_graph["arrays"] = {"left": left, "right": right, "tail": tail, "head": head,
+                            "keys": key[order], "order": order}
+    return dual_graph["arrays"]
+
+def get_primal_cut_edges(primal_graph, dual_graph, min_cut_dual_edges):
+    """Primal edges (as sorted vertex pairs) crossed by the min-cut dual path.
+
+    Where two faces share several edges, the shortest one is the one the
+    dual Dijkstra used.
+    """
+    if not len(min_cut_dual_edges):
+        return set()
+    arrays = dual_edge_arrays(primal_graph, dual_graph)
+    path = np.asarray(min_cut_dual_edges, dtype=np.int64)
+    query = np.minimum(path[:, 0], path[:, 1]) * len(dual_graph["dual_vertices"]) + np.maximum(path[:, 0], path[:, 1])
+    at = np.minimum(np.searchsorted(arrays["keys"], query), len(arrays["keys"]) - 1)
+    edges = arrays["order"][at[arrays["keys"][at] == query]]
+    tail, head = arrays["tail"][edges], arrays["head"][edges]
+    return set(zip(np.minimum(tail, head).tolist(), np.maximum(tail, head).tolist()))
+
+def potential_array(potentials, n):
+    """Face potentials as a float array; accepts the dicts dijkstra_dual_with_path returns."""
+    if isinstance(potentials, dict):
+        return np.fromiter(map(potentials.__getitem__, range(n)), dtype=float, count=n)
+    return np.asarray(potentials, dtype=float)
+
+def flow_arrays(primal_graph, dual_graph, potentials):
+    """Flow on every primal edge from the face potentials, for all edges at once.
+
+    Returns:
+        tuple: (tails, heads, values) arrays of the edges carrying positive flow
+    """
+    arrays = dual_edge_arrays(primal_graph, dual_graph)
+    phi = potential_array(potentials, len(dual_graph["dual_vertices"]))
+    with np.errstate(invalid="ignore"):
+        value = phi[arrays["right"]] - phi[arrays["left"]]
+        forward = value > 0
+        carrying = forward | (value < 0)
+    tails = np.where(forward, arrays["tail"], arrays["head"])[carrying]
+    heads = np.where(forward, arrays["head"], arrays["tail"])[carrying]
+    return tails, heads, np.abs(value[carrying])
 
 def compute_flow_with_geometry(primal_graph, dual_graph, potentials):
-    flow = {}
-    pos = primal_graph["vertices"]
-    dual_pos = dual_graph["dual_vertices"]
-
-    for dual_key, primal_edge_str in dual_graph["dual_to_primal_map"].items():
-        dual_u, dual_v = map(int, dual_key.split(','))
-        u, v = map(int, primal_edge_str.split(','))
-
-        phi_left = potentials[dual_u]
-        phi_right = potentials[dual_v]
-        flow_value = phi_right - phi_left
-
-        # Geometry: Determine which face is on which side
-        x1, y1 = pos[u]
-        x2, y2 = pos[v]
-        xd, yd = dual_pos[dual_u]
-        xc, yc = (x1 + x2) / 2, (y1 + y2) / 2  # center of primal edge
-
-        # Normal vector to edge (perpendicular, left-hand rule)
-        nx, ny = -(y2 - y1), (x2 - x1)
-
-        # Vector from edge center to dual face
-        vx, vy = xd - xc, yd - yc
-        dot_product = nx * vx + ny * vy
-
-        if dot_product > 0:
-            # dual_u (phi_left) is to the left of (u,v)
-            if flow_value > 0:
-                flow[(u, v)] = flow_value
-            elif flow_value < 0:
-                flow[(v, u)] = -flow_value
-        else:
-            # dual_u is to the right, flip
-            if flow_value > 0:
-                flow[(v, u)] = flow_value
-            elif flow_value < 0:
-                flow[(u, v)] = -flow_value
-
-    return flow
-
+    tails, heads, values = flow_arrays(primal_graph, dual_graph, potentials)
+    return dict(zip(zip(tails.tolist(), heads.tolist()), values.tolist()))
+
+def _vertex_label(i, n):
+    return 's' if i == 0 else ('t' if i == n - 1 else f"v{i}")
+
+def _potential(value):
+    return round(value, 2) if value != float('inf') else '∞'
+
+class PlanarFigure:
+    """Four-panel planar flow/cut figure built once and updated in place.
+
+    Each panel's vertices, edges and arrows are one collection apiece;
+    labels are only drawn for graphs within LABEL_LIMIT.
+    """
+
+    def __init__(self, primal_graph, dual_graph):
+        self.fig = Figure(figsize=(14, 10))
+        FigureCanvasAgg(self.fig)
+        axs = self.fig.subplots(2, 2)
+        pos = points(primal_graph["vertices"])
+        edges = primal_graph["edges"]
+        src, dst, _ = edge_arrays(edges)
+        dual_vertices = points(dual_graph["dual_vertices"])
+        dual_src, dual_dst, _ = edge_arrays(dual_graph["dual_edges"])
+        n = len(pos)
+        names = [_vertex_label(i, n) for i in range(n)]
+        self.pos = pos
+        self.dual_graph = dual_graph
+        self.shrink = shrink_for(pos)
+
+        def draw_vertices(ax):
+            ax.scatter(pos[:, 0], pos[:, 1], color='black', zorder=2)
+            label_points(ax, pos, names, -10, ha='center', fontsize=9)
+            note_hidden(ax, vertex=n, edge=len(src))
+
+        # Top Left: Primal Graph with Capacities Only
+        ax1 = axs[0, 0]
+        draw_vertices(ax1)
+        Segments(ax1, pos[src], pos[dst], 'blue')
+        if show_labels(len(src)):
+            for v1, v2, w in edges:
+                (x1, y1), (x2, y2) = pos[v1], pos[v2]
+                ax1.text((x1 + x2)/2, (y1 + y2)/2, f"{w}", color='red')
+        ax1.set_title("Original Graph (Capacities)")
+        ax1.invert_yaxis()
+        ax1.axis("equal")
+
+        # Top Right: Dual Graph with Potentials
+        ax2 = self.ax2 = axs[0, 1]
+        s_hat, t_hat = dual_graph["s_hat"], dual_graph["t_hat"]
+        ax2.scatter(dual_vertices[:, 0], dual_vertices[:, 1], zorder=2,
+                    color=['green' if i == s_hat else ('red' if i == t_hat else 'purple')
+                           for i in range(len(dual_vertices))])
+        self.dual_labels = label_points(ax2, dual_vertices, [self.dual_label(i, None) for i in range(len(dual_vertices))],
+                                        -10, ha='center', fontsize=9)
+        self.dual_lines = Segments(ax2, dual_vertices[dual_src], dual_vertices[dual_dst], 'gray')
+        self.dual_index = {}
+        for i, v in enumerate(dual_dst.tolist()):
+            self.dual_index.setdefault(v, []).append(i)
+        if show_labels(len(dual_src)):
+            for u, v, length in dual_graph["dual_edges"]:
+                (x1, y1), (x2, y2) = dual_graph["dual_vertices"][u], dual_graph["dual_vertices"][v]
+                ax2.text((x1 + x2)//2, (y1 + y2)//2, f"{length}", color='black')
+        self.min_cut_lines = Segments(ax2, [], [], 'red', linewidth=2)
+        note_hidden(ax2, face=len(dual_vertices), edge=len(dual_src))
+        ax2.set_title("Dual Graph (Potentials)")
+        ax2.invert_yaxis()
+        ax2.axis("equal")
+
+        # Bottom Left: Primal Graph with Cut Edges Highlighted & Face Potentials
+        ax3 = axs[1, 0]
+        draw_vertices(ax3)
+        self.primal_lines = Segments(ax3, pos[src], pos[dst], 'blue')
+        self.primal_index = {}
+        for i, (v1, v2) in enumerate(zip(src.tolist(), dst.tolist())):
+            self.primal_index.setdefault(tuple(sorted((v1, v2))), []).append(i)
+        self.face_labels = label_points(ax3, dual_vertices, [""] * len(dual_vertices),
+                                        ha='center', fontsize=9, color='purple')
+        ax3.set_title("Primal Graph Highlighted Min-Cut + Face Potentials")
+        ax3.invert_yaxis()
+        ax3.axis("equal")
+
+        # Bottom Right: Flow via Potentials (Single Direction Arrows)
+        ax4 = self.ax4 = axs[1, 1]
+        draw_vertices(ax4)
+        self.flow_arrows = Arrows(ax4, [], [], 'green', self.shrink)
+        self.flow_labeled = show_labels(len(src))
+        ax4.set_title("Flow via Potentials (Direction & Magnitude)")
+        ax4.invert_yaxis()
+        ax4.axis("equal")
+
+        self.fig.tight_layout(rect=[0, 0, 1, 0.95])
+
+        self.potentials = [None] * len(dual_vertices)
+        self.labelled = False
+        self.highlight_dual = None
+        self.min_cut = None
+        self.cut_edges = set()
+        self.flows = {}
+        self.flow_texts = {}
+
+    def dual_label(self, i, potential):
+        label = 's_hat' if i == self.dual_graph["s_hat"] else ('t_hat' if i == self.dual_graph["t_hat"] else f"f{i}")
+        if potential is not None:
+            label += f"\n{_potential(potential)}"
+        return label
+
+    def update(self, flows, potentials, highlight_dual, min_cut_dual_edges, cut_edges, changes=None):
+        """Show the frame's state. changes (the SnapshotStore delta since the
+        frame drawn before) limits the work to the faces, edges and flows it
+        names; None redraws everything from the state dicts."""
+        full = changes is None
+        if full:
+            changes = {"potentials": potentials, "flows": flows,
+                       "min_cut_dual_edges": min_cut_dual_edges, "cut_edges": cut_edges}
+
+        if self.dual_labels is not None:
+            # The first potentials turn every face label from a name into a name and ∞
+            faces = range(len(self.potentials)) if full or (potentials and not self.labelled) \
+                else changes.get("potentials", ())
+            for i in faces:
+                value = potentials.get(i, float('inf')) if potentials else None
+                if value != self.potentials[i]:
+                    self.dual_labels[i].set_text(self.dual_label(i, value))
+                    self.face_labels[i].set_text("" if value is None else f"φ(f{i}) = {_potential(value)}")
+                    self.potentials[i] = value
+            self.labelled = bool(potentials)
+
+        if highlight_dual != self.highlight_dual:
+            self.dual_lines.recolor(self.dual_index.get(self.highlight_dual, []), 'gray')
+            self.dual_lines.recolor(self.dual_index.get(highlight_dual, []), 'orange')
+            self.highlight_dual = highlight_dual
+
+        if "min_cut_dual_edges" in changes:
+            min_cut = list(min_cut_dual_edges)
+            if min_cut != self.min_cut:
+                dual_vertices = points(self.dual_graph["dual_vertices"])
+                ends = np.array(min_cut, dtype=np.int64).reshape(-1, 2)
+                self.min_cut_lines.set_positions(dual_vertices[ends[:, 0]], dual_vertices[ends[:, 1]], 'red')
+                self.min_cut = min_cut
+
+        if full:
+            for e in [e for e in self.cut_edges if e not in cut_edges]:
+                self.primal_lines.recolor(self.primal_index.get(e, []), 'blue')
+                self.cut_edges.discard(e)
+        for e in changes.get("cut_edges", ()):
+            if e not in self.cut_edges:
+                self.primal_lines.recolor(self.primal_index.get(e, []), 'red')
+                self.cut_edges.add(e)
+
+        if "flows" in changes and flows != self.flows:
+            ends = np.array(list(flows), dtype=np.int64).reshape(-1, 2)
+            self.flow_arrows.set_positions(self.pos[ends[:, 0]], self.pos[ends[:, 1]], 'green')
+            if self.flow_labeled:
+                for edge in [e for e in self.flow_texts if flows.get(e) != self.flows[e]]:
+                    self.flow_texts.pop(edge).remove()
+                for (u, v), flow_val in flows.items():
+                    if (u, v) in self.flow_texts:
+                        continue
+                    (x1, y1), (x2, y2) = self.pos[u], self.pos[v]
+                    self.flow_texts[(u, v)] = self.ax4.text((x1 + x2) / 2, (y1 + y2) / 2, f"{flow_val:.1f}",
+                                                            color='black', fontsize=9, ha='center', va='center',
+                                                            bbox=dict(facecolor='white', edgecolor='none', pad=1.0))
+            self.flows = dict(flows)
 
 def draw_frame(primal_graph, dual_graph, flows, frame_idx, potentials=None,
-               highlight_dual=None, min_cut_dual_edges=None, cut_edges=None):
-    fig, axs = plt.subplots(2, 2, figsize=(14, 10))
-    pos = primal_graph["vertices"]
-    edges = primal_graph["edges"]
-    dual_vertices = dual_graph["dual_vertices"]
-    dual_edges = dual_graph["dual_edges"]
-
-    # Top Left: Primal Graph with Capacities Only
-    ax1 = axs[0, 0]
-    for i, (x, y) in enumerate(pos):
-        label = 's' if i == 0 else ('t' if i == len(pos)-1 else f"v{i}")
-        ax1.scatter(x, y, color='black')
-        ax1.text(x, y - 10, label, ha='center', fontsize=9)
-    for v1, v2, w in edges:
-        x1, y1 = pos[v1]
-        x2, y2 = pos[v2]
-        ax1.plot([x1, x2], [y1, y2], color='blue')
-        ax1.text((x1 + x2)/2, (y1 + y2)/2, f"{w}", color='red')
-    ax1.set_title("Original Graph (Capacities)")
-    ax1.invert_yaxis()
-    ax1.axis("equal")
-
-    # Top Right: Dual Graph with Potentials
-    ax2 = axs[0, 1]
-    for i, (x, y) in enumerate(dual_vertices):
-        color = 'green' if i == dual_graph["s_hat"] else ('red' if i == dual_graph["t_hat"] else 'purple')
-        ax2.scatter(x, y, color=color)
-        label = 's_hat' if i == dual_graph["s_hat"] else ('t_hat' if i == dual_graph["t_hat"] else f"f{i}")
-        if potentials:
-            label += f"\n{round(potentials[i], 2) if potentials[i] != float('inf') else '∞'}"
-        ax2.text(x, y - 10, label, ha='center', fontsize=9)
-    for u, v, length in dual_edges:
-        x1, y1 = dual_vertices[u]
-        x2, y2 = dual_vertices[v]
-        edge_color = 'orange' if highlight_dual == v else 'gray'
-        ax2.plot([x1, x2], [y1, y2], color=edge_color)
-        ax2.text((x1 + x2)//2, (y1 + y2)//2, f"{length}", color='black')
-    if min_cut_dual_edges:
-        for u, v in min_cut_dual_edges:
-            x1, y1 = dual_vertices[u]
-            x2, y2 = dual_vertices[v]
-            ax2.plot([x1, x2], [y1, y2], color='red', linewidth=2)
-    ax2.set_title("Dual Graph (Potentials)")
-    ax2.invert_yaxis()
-    ax2.axis("equal")
-
-    # Bottom Left: Primal Graph with Cut Edges Highlighted & Face Potentials
-    ax3 = axs[1, 0]
-    for i, (x, y) in enumerate(pos):
-        label = 's' if i == 0 else ('t' if i == len(pos)-1 else f"v{i}")
-        ax3.scatter(x, y, color='black')
-        ax3.text(x, y - 10, label, ha='center', fontsize=9)
-    for v1, v2, _ in edges:
-        e = tuple(sorted((v1, v2)))
-        x1, y1 = pos[v1]
-        x2, y2 = pos[v2]
-        edge_color = 'red' if cut_edges and e in cut_edges else 'blue'
-        ax3.plot([x1, x2], [y1, y2], color=edge_color)
-    if potentials:
-        for i, (x, y) in enumerate(dual_vertices):
-            label = f"φ(f{i}) = {round(potentials[i], 2)}" if potentials[i] != float('inf') else f"φ(f{i}) = ∞"
-            ax3.text(x, y, label, ha='center', fontsize=9, color='purple')
-    ax3.set_title("Primal Graph Highlighted Min-Cut + Face Potentials")
-    ax3.invert_yaxis()
-    ax3.axis("equal")
-
-    # Bottom Right: Flow via Potentials (Single Direction Arrows)
-    ax4 = axs[1, 1]
-    for i, (x, y) in enumerate(pos):
-        label = 's' if i == 0 else ('t' if i == len(pos)-1 else f"v{i}")
-        ax4.scatter(x, y, color='black')
-        ax4.text(x, y - 10, label, ha='center', fontsize=9)
-
-    for (u, v), flow_val in flows.items():
-        x1, y1 = pos[u]
-        x2, y2 = pos[v]
-        ax4.annotate("",
-                     xy=(x2, y2), xycoords='data',
-                     xytext=(x1, y1), textcoords='data',
-                     arrowprops=dict(arrowstyle="->", color='green', lw=2))
-        ax4.text((x1 + x2) / 2, (y1 + y2) / 2, f"{flow_val:.1f}",
-                 color='black', fontsize=9, ha='center', va='center',
-                 bbox=dict(facecolor='white', edgecolor='none', pad=1.0))
-
-    ax4.set_title("Flow via Potentials (Direction & Magnitude)")
-    ax4.invert_yaxis()
-    ax4.axis("equal")
-
-    frame_path = os.path.join(IMG_DIR, f"frame_{frame_idx:03d}.png")
-    plt.tight_layout(rect=[0, 0, 1, 0.95])
-    plt.savefig(frame_path)
-    plt.close()
+               highlight_dual=None, min_cut_dual_edges=None, cut_edges=None, changes=None, img_dir=IMG_DIR):
+    figure = persistent_figure(PlanarFigure, primal_graph, dual_graph)
+    figure.update(flows, potentials or {}, highlight_dual, min_cut_dual_edges or {}, cut_edges or {}, changes)
+    return save_frame(figure.fig, os.path.join(img_dir, f"frame_{frame_idx:03d}.png"))
 
 def save_video():
     output_path = os.path.join(VID_DIR, VIDEO_NAME)
     input_path = os.path.join(IMG_DIR, "frame_%03d.png").replace("\\", "/")
     output_path = output_path.replace("\\", "/")
-    subprocess.run([
-        "ffmpeg", "-y", "-framerate", "0.5",
-        "-i", input_path,
-        "-c:v", "libx264", "-pix_fmt", "yuv420p", output_path
-    ])
+    with phase("ffmpeg"):
+        subprocess.run([
+            "ffmpeg", "-y", "-framerate", "0.5",
+            "-i", input_path,
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", output_path
+        ])
     print(f"🎞️  Video saved to: {output_path}")
 
-def main():
+class PlanarSnapshots:
+    """Trace stand-in that records RELAX events as SnapshotStore frames.
+
+    Live runs pass it to dijkstra_dual_with_path as trace= and replays feed
+    it the recorded events, so both produce the same frames. A frame budget
+    keeps first the relaxes that label a face for the first time or lower
+    t_hat's potential, then the final cut/flow frame.
+    """
+
+    def __init__(self, s_hat, t_hat):
+        self.s_hat = s_hat
+        self.t_hat = t_hat
+        self.labelled = {s_hat}
+        self.store = SnapshotStore(potentials={}, flows={}, min_cut_dual_edges={}, cut_edges={})
+        self.store.record()
+
+    def emit(self, kind, u=-1, v=-1, value=NO_VALUE):
+        if kind == RELAX:
+            key_event = v == self.t_hat or v not in self.labelled
+            self.labelled.add(v)
+            self.store.record({"potentials": {self.s_hat: 0, v: value}}, key_event=key_event, highlight_dual=v)
+
+    def finish(self, primal_graph, dual_graph, distances, min_cut_dual_edges):
+        """Add the final cut/flow frame and return the store."""
+        with phase("flow_cut"):
+            cut_edges = get_primal_cut_edges(primal_graph, dual_graph, min_cut_dual_edges)
+            flows = compute_flow_with_geometry(primal_graph, dual_graph, distances)
+        self.store.record({"potentials": distances, "flows": flows,
+                           "min_cut_dual_edges": dict.fromkeys(min_cut_dual_edges, True),
+                           "cut_edges": dict.fromkeys(cut_edges, True)}, key_event=True)
+        return self.store
+
+def record_trace(dual_graph, trace_path):
+    """Run the dual Dijkstra without rendering, logging its events to trace_path."""
+    with TraceWriter(trace_path, "planar_dual_dijkstra", n=len(dual_graph["dual_vertices"]),
+                     s_hat=dual_graph["s_hat"], t_hat=dual_graph["t_hat"]) as trace:
+        return dijkstra_dual_with_path(dual_graph["dual_vertices"], dual_graph["dual_edges"],
+                                       dual_graph["s_hat"], dual_graph["t_hat"], trace=trace)
+
+def replay_trace(primal_graph, dual_graph, trace_path, start=0, stop=None, workers=None, video_path=None,
+                 max_frames=FRAME_BUDGET, img_dir=IMG_DIR):
+    """Render frames [start, stop) of a recorded run; same frames as a live run."""
+    header, events = read_trace(trace_path)
+    distances = {i: float('inf') for i in range(header["n"])}
+    distances[header["s_hat"]] = 0
+    min_cut_dual_edges = []
+    snapshots = PlanarSnapshots(header["s_hat"], header["t_hat"])
+    for kind, u, v, value in iter_events(events):
+        if kind == RELAX:
+            distances[v] = value
+        elif kind == CUT_EDGE:
+            min_cut_dual_edges.append((u, v))
+        snapshots.emit(kind, u, v, value)
+    cap_potentials(distances, header["t_hat"])
+    store = snapshots.finish(primal_graph, dual_graph, distances, min_cut_dual_edges)
+
+    with FrameRenderer(draw_frame, static_args=(primal_graph, dual_graph),
+                       workers=workers, video_path=video_path, img_dir=img_dir) as renderer:
+        renderer.render_store(store, "frame_idx", store.sample(max_frames, start, stop), "changes")
+    return distances, min_cut_dual_edges
+
+def planar_flow_cut_with_visualization(primal_graph, dual_graph, workers=None, video_path=None,
+                                       max_frames=FRAME_BUDGET, img_dir=IMG_DIR):
+    """Render the dual Dijkstra run and the final cut/flow frame.
+
+    Returns:
+        tuple: (distances, min_cut_dual_edges, cut_edges, flows)
+    """
+    snapshots = PlanarSnapshots(dual_graph["s_hat"], dual_graph["t_hat"])
+    with phase("algorithm"):
+        distances, _, min_cut_dual_edges = dijkstra_dual_with_path(
+            dual_graph["dual_vertices"], dual_graph["dual_edges"], dual_graph["s_hat"], dual_graph["t_hat"],
+            trace=counted(snapshots))
+    store = snapshots.finish(primal_graph, dual_graph, distances, min_cut_dual_edges)
+
+    with FrameRenderer(draw_frame, static_args=(primal_graph, dual_graph),
+                       workers=workers, video_path=video_path, img_dir=img_dir) as renderer:
+        renderer.render_store(store, "frame_idx", store.sample(max_frames), "changes")
+    return distances, min_cut_dual_edges, set(store.current["cut_edges"]), store.current["flows"]
+
+def solve_graph(path, args):
+    """Batch mode: solve one primal/dual pair and optionally render it."""
+    primal_graph = load_graph(path, directed=False)
+    dual_path = args.dual or dual_path_for(path)
+    if os.path.exists(dual_path):
+        dual_graph = load_dual_graph(dual_path)
+    else:
+        with phase("build_dual"):
+            dual_graph = build_planar_dual(primal_graph["vertices"], primal_graph["edges"])
+
+    if args.render == "none":
+        with phase("algorithm"):
+            distances, _, min_cut_dual_edges = dijkstra_dual_with_path(
+                dual_graph["dual_vertices"], dual_graph["dual_edges"], dual_graph["s_hat"], dual_graph["t_hat"],
+                trace=counted())
+        with phase("flow_cut"):
+            cut_edges = get_primal_cut_edges(primal_graph, dual_graph, min_cut_dual_edges)
+            flows = compute_flow_with_geometry(primal_graph, dual_graph, distances)
+    else:
+        img_dir, video_path = prepare_output(args, path)
+        distances, _, cut_edges, flows = planar_flow_cut_with_visualization(
+            primal_graph, dual_graph, workers=args.workers, video_path=video_path, max_frames=frame_budget(args),
+            img_dir=img_dir)
+    return {"cut_value": distances[dual_graph["t_hat"]], "cut_edges": sorted(cut_edges), "flows": flows}
+
+def interactive():
     setup_directories()
     run_primal_graph_gui()
-    run_dual_graph_overlay()
 
     primal_graph = load_graph(directed=False)
-    dual_graph = load_dual_graph()
-
-    draw_frame(primal_graph, dual_graph, {}, 0)
-
-    distances, dijkstra_frames, min_cut_dual_edges = dijkstra_dual_with_path(
-        dual_graph["dual_vertices"], dual_graph["dual_edges"], dual_graph["s_hat"], dual_graph["t_hat"])
-
-    frame_idx = 1
-    for highlight_node, dist_snapshot in dijkstra_frames:
-        draw_frame(primal_graph, dual_graph, {}, frame_idx, potentials=dist_snapshot, highlight_dual=highlight_node)
-        frame_idx += 1
-
-    cut_edges = get_primal_cut_edges(dual_graph["dual_to_primal_map"], min_cut_dual_edges)
-
-    flows = compute_flow_with_geometry(primal_graph, dual_graph, distances)
-
-    draw_frame(primal_graph, dual_graph, flows, frame_idx, potentials=distances,
-               min_cut_dual_edges=min_cut_dual_edges, cut_edges=cut_edges)
-
-    save_video()
+    try:
+        dual_graph = build_dual_graph(primal_graph)
+    except ValueError as exc:
+        # Drawings with crossings or a disconnected graph still need the overlay
+        print(f"❌ Could not build the dual automatically: {exc}")
+        run_dual_graph_overlay()
+        dual_graph = load_dual_graph()
+
+    video_path = os.path.join(VID_DIR, VIDEO_NAME) if STREAM_VIDEO else None
+    cached_result(default_cache(), run_key(__file__, ["graph.json", "dual_graph.json"]),
+                  lambda: planar_flow_cut_with_visualization(primal_graph, dual_graph, video_path=video_path),
+                  lambda: rendered_files(IMG_DIR, video_path), FRAME_BUDGET, video_path)
+
+    if video_path is None:
+        save_video()
+
+def main(argv=None):
+    parser = build_parser("Planar s-t min cut and flow via shortest paths in the dual graph.", planar=True)
+    args = parser.parse_args(argv)
+    if not args.graphs:
+        with profile_run():
+            interactive()
+        return
+    sys.exit(run_batch(args, solve_graph))
 
 
 if __name__ == "__main__":
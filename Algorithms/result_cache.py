@@ -0,0 +1,218 @@
+import ast
+import hashlib
+import os
+import pickle
+import shutil
+from contextlib import contextmanager
+from instrumentation import count
+
+# Content-addressed cache of solver results and rendered frames. Files
+# (PNG frames, videos) are stored once under the SHA-256 of their bytes in
+# objects/; refs/ maps keys to small pickled values: a frame's object, or
+# a whole run's result and output files. Keys hash the graph file
+# contents, the source code of the script and of every module next to it
+# that it imports, and its parameters, so any change to those is simply a
+# different key. A frame is keyed on its run and its index among the
+# run's recorded frames, which fix everything it is drawn from.
+# Whatever was used least recently is evicted once the cache outgrows its
+# size limit.
+#
+# A repeated batch run restores its results and output files without
+# solving or drawing; one with another frame budget still reuses every
+# frame it draws again.
+
+CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "../visualizationCache")
+# Size limit in bytes; 0 turns caching off
+CACHE_BYTES = int(os.environ.get("RESULT_CACHE_BYTES", str(2 ** 30)))
+# Bump when the cache layout or the pickled values change
+CACHE_VERSION = 2
+
+_active = None
+
+
+def file_digest(path, chunk=2 ** 20):
+    """SHA-256 of a file's bytes."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def digest(*parts):
+    """Key for any picklable values."""
+    return hashlib.sha256(pickle.dumps(parts, protocol=4)).hexdigest()
+
+
+class ContentCache:
+    """Objects stored by content hash plus pickled refs, evicted least recently used first."""
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _path(self, kind, key):
+        return os.path.join(self.root, kind, key[:2], key)
+
+    def _write(self, path, write):
+        # Write beside the target and rename, so readers (and render
+        # processes writing the same entry) never see half a file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        write(tmp)
+        os.replace(tmp, path)
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def put_file(self, path):
+        """Store a copy of the file at path; returns its content key."""
+        key = file_digest(path)
+        target = self._path("objects", key)
+        if not self._touch(target):
+            self._write(target, lambda tmp: shutil.copyfile(path, tmp))
+        return key
+
+    def restore_file(self, key, path):
+        """Copy object key to path; False if it has been evicted."""
+        source = self._path("objects", key)
+        if not self._touch(source):
+            return False
+        shutil.copyfile(source, path)
+        return True
+
+    def put(self, key, value):
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._write(self._path("refs", key), write)
+
+    def get(self, key):
+        """Value stored under key, or None."""
+        path = self._path("refs", key)
+        if not self._touch(path):
+            return None
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def evict(self):
+        """Delete the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for kind in ("objects", "refs"):
+            for folder, _, names in os.walk(os.path.join(self.root, kind)):
+                for name in names:
+                    path = os.path.join(folder, name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+
+class CachedRun:
+    """The cache and key of the run in progress; frames are keyed under it."""
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+
+    def frame_key(self, *inputs):
+        return digest(self.key, *inputs)
+
+    def restore_frame(self, frame_key, path):
+        """Copy the cached image for frame_key to path; False on a miss."""
+        obj = self.cache.get(frame_key)
+        if obj is not None and self.cache.restore_file(obj, path):
+            count("frame_cache_hits")
+            return True
+        return False
+
+    def store_frame(self, frame_key, path):
+        self.cache.put(frame_key, self.cache.put_file(path))
+
+
+def default_cache():
+    """ContentCache at CACHE_DIR, or None when caching is off."""
+    return ContentCache() if CACHE_BYTES > 0 else None
+
+
+def source_files(script):
+    """The script and the modules in its folder it imports, directly or through each other."""
+    folder = os.path.dirname(os.path.abspath(script))
+    found, todo = set(), [os.path.abspath(script)]
+    while todo:
+        path = todo.pop()
+        if path in found:
+            continue
+        found.add(path)
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module = os.path.join(folder, name.split(".")[0] + ".py")
+                if os.path.exists(module):
+                    todo.append(module)
+    return sorted(found)
+
+
+def run_key(script, paths, **params):
+    """Key of one run: the code it runs, the contents of its input files and its parameters."""
+    code = [(os.path.basename(p), file_digest(p)) for p in source_files(script)]
+    files = [file_digest(p) if os.path.exists(p) else None for p in paths]
+    return digest(CACHE_VERSION, code, files, sorted(params.items()))
+
+
+def active():
+    """CachedRun of the run in progress, or None."""
+    return _active
+
+
+def cached_result(cache, key, run, outputs, *settings):
+    """run(), or the result it gave before for the same key and settings.
+
+    run() is called inside cached_run(cache, key), so its frames are cached
+    one by one as well. outputs() lists the files the run wrote; they are
+    stored with the result and copied back into place on a hit.
+    """
+    if cache is None:
+        return run()
+    result_key = digest(key, settings)
+    entry = cache.get(result_key)
+    if entry is not None and all(cache.restore_file(obj, path) for path, obj in entry["files"].items()):
+        print("♻️  Reused cached result")
+        return entry["result"]
+    with cached_run(cache, key):
+        result = run()
+        cache.put(result_key, {"result": result, "files": {path: cache.put_file(path) for path in outputs()}})
+    return result
+
+
+@contextmanager
+def cached_run(cache, key):
+    """Make key the active run, so FrameRenderer reuses and stores frames under it.
+
+    The cache is trimmed to its size limit when the run ends.
+    """
+    global _active
+    if cache is None:
+        yield None
+        return
+    previous, _active = _active, CachedRun(cache, key)
+    try:
+        yield _active
+    finally:
+        _active = previous
+        cache.evict()
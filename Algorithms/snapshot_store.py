@@ -0,0 +1,164 @@
+import bisect
+
+# Frame states for the visualizers, stored as deltas. A state is a dict of
+# named dicts (dd, Pr, arc colors, ...); every recorded frame keeps only the
+# entries that changed plus its own draw arguments (current arc,
+# highlighted vertex, ...). A full keyframe copy is taken whenever the
+# deltas since the last one hold as many entries as the state itself, so
+# memory stays linear in the number of changes while any frame is rebuilt
+# from one keyframe and at most a state's worth of deltas.
+#
+# With a frame budget only some frames are drawn. Each drawn frame shows
+# the state accumulated up to it, so the changes of skipped frames are
+# coalesced into the next drawn one rather than lost.
+
+_MISSING = object()
+
+
+def _spread(items, k):
+    """k items spaced evenly through items (k <= len(items))."""
+    return [items[(2 * j + 1) * len(items) // (2 * k)] for j in range(k)]
+
+
+def sample_frames(count, key_frames, budget=None, start=0, stop=None):
+    """Indices of the frames to draw out of frames [start, stop) of count.
+
+    Without a budget (or when the window fits in it) every frame is kept.
+    Otherwise the first and last frames are kept, then key frames
+    (settles, improvements, augmentations), spread evenly if there are too
+    many, and any room left is filled with evenly spaced other frames.
+
+    Args:
+        count (int): Number of frames in the run
+        key_frames (list): Sorted indices of the key frames
+        budget (int): Maximum number of frames to draw, or None
+    """
+    stop = count if stop is None else min(stop, count)
+    if budget is None or stop - start <= budget:
+        return list(range(start, stop))
+    if budget < 2:
+        return [stop - 1][:budget]
+    room = budget - 2
+    key = key_frames[bisect.bisect_right(key_frames, start):bisect.bisect_left(key_frames, stop - 1)]
+    if len(key) >= room:
+        chosen = _spread(key, room)
+    else:
+        taken = set(key)
+        others = [i for i in range(start + 1, stop - 1) if i not in taken]
+        chosen = key + _spread(others, room - len(key))
+    return sorted(chosen + [start, stop - 1])
+
+
+def _apply(state, changes):
+    for name, values in changes.items():
+        state[name].update(values)
+
+
+class SnapshotStore:
+    """Per-frame state deltas with periodic keyframes.
+
+    Build it with the initial state as keyword dicts, record() one delta
+    per frame, then read frames back with state(), frames() or runs(),
+    optionally limited to the indices sample() picks.
+    """
+
+    def __init__(self, **initial):
+        self.current = {name: dict(values) for name, values in initial.items()}
+        self.deltas = []
+        self.args = []
+        self.keyframes = [0]
+        self.keyframe_states = [self._copy(self.current)]
+        self.key_frames = []
+        self.pending = 0
+
+    def __len__(self):
+        return len(self.deltas)
+
+    @staticmethod
+    def _copy(state):
+        return {name: dict(values) for name, values in state.items()}
+
+    def record(self, changes=None, key_event=False, **args):
+        """Add a frame. changes maps state names to {key: value} entries;
+        entries equal to the current state are dropped. key_event marks
+        frames a frame budget should keep first. args are passed to the
+        draw function for this frame only."""
+        if self.pending >= max(1, sum(len(v) for v in self.current.values())):
+            self.keyframes.append(len(self.deltas))
+            self.keyframe_states.append(self._copy(self.current))
+            self.pending = 0
+        delta = {}
+        for name, values in (changes or {}).items():
+            current = self.current[name]
+            changed = {k: v for k, v in values.items() if current.get(k, _MISSING) != v}
+            if changed:
+                current.update(changed)
+                delta[name] = changed
+                self.pending += len(changed)
+        if key_event:
+            self.key_frames.append(len(self.deltas))
+        self.deltas.append(delta)
+        self.args.append(args)
+
+    def sample(self, budget=None, start=0, stop=None):
+        """Frame indices to draw from [start, stop) under budget; see sample_frames."""
+        return sample_frames(len(self), self.key_frames, budget, start, stop)
+
+    def _state_before(self, i):
+        return self._seek(None, 0, i)
+
+    def _seek(self, state, at, i):
+        """Bring state (the state before frame at, or None) to the state before frame i >= at."""
+        k = bisect.bisect_right(self.keyframes, i) - 1
+        if state is None or self.keyframes[k] > at:
+            state, at = self._copy(self.keyframe_states[k]), self.keyframes[k]
+        for delta in self.deltas[at:i]:
+            _apply(state, delta)
+        return state
+
+    def changes(self, at, i):
+        """Changes of frames [at, i] merged into one delta."""
+        merged = {}
+        for delta in self.deltas[at:i + 1]:
+            for name, values in delta.items():
+                merged.setdefault(name, {}).update(values)
+        return merged
+
+    def state(self, i):
+        """Full state of frame i, as fresh dicts."""
+        state = self._state_before(i)
+        _apply(state, self.deltas[i])
+        return state
+
+    def frames(self, indices=None):
+        """Yield (state, args) for the frames at sorted indices (default all).
+
+        The same state dicts are updated in place from frame to frame.
+        """
+        state, at = None, 0
+        for i in range(len(self)) if indices is None else indices:
+            state = self._seek(state, at, i)
+            _apply(state, self.deltas[i])
+            at = i + 1
+            yield state, self.args[i]
+
+    def runs(self, indices=None, max_frames=None):
+        """Split the frames at sorted indices (default all) into independent runs.
+
+        Yields (state before the run, [(changes, args), ...]), where changes
+        also carry those of any skipped frames since the previous one. A
+        run ends before a keyframe or after max_frames frames, so it can be
+        replayed elsewhere from one state copy and its own deltas.
+        """
+        indices = list(range(len(self)) if indices is None else indices)
+        j = 0
+        while j < len(indices):
+            first = indices[j]
+            k = bisect.bisect_right(self.keyframes, first)
+            boundary = self.keyframes[k] if k < len(self.keyframes) else len(self)
+            run, previous = [], first - 1
+            while j < len(indices) and not (run and (indices[j] >= boundary or len(run) == max_frames)):
+                run.append((self.changes(previous + 1, indices[j]), self.args[indices[j]]))
+                previous = indices[j]
+                j += 1
+            yield self._state_before(first), run
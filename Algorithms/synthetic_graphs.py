@@ -0,0 +1,108 @@
+import math
+import numpy as np
+from planar_dual import build_planar_dual
+
+# Generators for large test graphs in the same shape as graph.json (planar
+# families also get their dual_graph.json from build_planar_dual). Vertices
+# are an (n, 2) array of positions and edges an (m, 3) array of
+# (v1, v2, weight) rows, each undirected edge listed once; graph_from_data /
+# build_csr accept both directly.
+
+FAMILIES = ("grid", "geometric", "triangulation")
+
+
+def _weights(rng, m):
+    return rng.integers(1, 10, size=m).astype(float)
+
+
+def grid_graph(rows, cols, seed=0, triangulated=False):
+    """rows x cols lattice with jittered positions and integer weights 1-9.
+
+    Vertex i * cols + j sits near (j, i), so vertex 0 is the top-left corner
+    and vertex n - 1 the bottom-right one. With triangulated=True every cell
+    also gets the diagonal from its top-left to its bottom-right corner.
+    """
+    rng = np.random.default_rng(seed)
+    ii, jj = np.divmod(np.arange(rows * cols), cols)
+    vertices = np.column_stack([jj, ii]) + rng.uniform(-0.2, 0.2, size=(rows * cols, 2))
+
+    ids = np.arange(rows * cols).reshape(rows, cols)
+    pairs = [
+        (ids[:, :-1], ids[:, 1:]),      # horizontal
+        (ids[:-1, :], ids[1:, :]),      # vertical
+    ]
+    if triangulated:
+        pairs.append((ids[:-1, :-1], ids[1:, 1:]))
+    src = np.concatenate([a.ravel() for a, _ in pairs])
+    dst = np.concatenate([b.ravel() for _, b in pairs])
+    edges = np.column_stack([src, dst, _weights(rng, len(src))])
+    return {"vertices": vertices, "edges": edges}
+
+
+def _ragged_arange(starts, counts):
+    """Concatenation of range(s, s + c) for each start s and count c."""
+    total = int(counts.sum())
+    shift = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return shift + np.arange(total)
+
+
+def geometric_graph(n, degree=8, seed=0):
+    """Random geometric graph: n uniform points, edges between points closer than r.
+
+    Points fill a square of area n and r is chosen for the requested mean
+    degree. Pairs are found by bucketing points into r x r cells and only
+    comparing neighbouring cells, so generation is O(n) in memory and time.
+    Vertices are numbered in cell order, which keeps neighbours close in
+    memory.
+    """
+    rng = np.random.default_rng(seed)
+    side = math.sqrt(n)
+    radius = math.sqrt(degree / math.pi)
+    points = rng.uniform(0, side, size=(n, 2))
+
+    cx, cy = (np.floor(points / radius).astype(np.int64)).T
+    # One empty row and column of padding, so offsets never wrap into real cells
+    ncols, nrows = cx.max() + 2, cy.max() + 2
+    key = cx * nrows + cy
+    order = np.argsort(key, kind="stable")
+    points, key = points[order], key[order]
+    counts = np.bincount(key, minlength=ncols * nrows)
+    starts = np.cumsum(counts) - counts
+
+    src, dst = [], []
+    for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+        neighbour = key + dx * nrows + dy
+        valid = neighbour < len(counts)
+        i = np.nonzero(valid)[0]
+        cnt = counts[neighbour[valid]]
+        j = _ragged_arange(starts[neighbour[valid]], cnt)
+        i = np.repeat(i, cnt)
+        keep = np.sum((points[i] - points[j]) ** 2, axis=1) < radius ** 2
+        if dx == 0 and dy == 0:
+            keep &= i < j
+        src.append(i[keep])
+        dst.append(j[keep])
+
+    src, dst = np.concatenate(src), np.concatenate(dst)
+    edges = np.column_stack([src, dst, _weights(rng, len(src))])
+    return {"vertices": points, "edges": edges}
+
+
+def synthetic_graph(family, edges, seed=0):
+    """Graph of the given family with roughly the requested number of edges.
+
+    Returns:
+        tuple: (graph dict, dual dict or None). The dual is only built for
+        the planar families (grid and triangulation).
+    """
+    if family == "grid":
+        side = max(2, round(math.sqrt(edges / 2)))
+        primal = grid_graph(side, side, seed)
+        return primal, build_planar_dual(primal["vertices"], primal["edges"])
+    if family == "triangulation":
+        side = max(2, round(math.sqrt(edges / 3)))
+        primal = grid_graph(side, side, seed, triangulated=True)
+        return primal, build_planar_dual(primal["vertices"], primal["edges"])
+    if family == "geometric":
+        return geometric_graph(max(2, edges // 4), degree=8, seed=seed), None
+    raise ValueError(f"unknown graph family {family!r}")